@@ -0,0 +1,82 @@
+"""
+Measures the import time of the entry point modules with "python -X importtime" in a fresh interpreter and fails if a
+module is slower than its budget. Heavy libraries (pandas, geopandas, matplotlib, tweepy, textblob) are only imported
+inside the functions that use them, so this catches top-level imports that slip back in.
+
+Usage: python benchmarks/import_time.py [--budget MS] [--top N] [module ...]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# Modules that are imported at the start of every run and should stay light
+DEFAULT_MODULES = ['main_json', 'pipeline', 'json_io', 'dataset_handler', 'download_handler', 'history_search',
+                   'sentiment_analysis', 'user_analysis', 'tweet_mapper', 'geo_store']
+
+
+def import_times(module: str):
+    """
+    Imports a module in a new interpreter and parses the importtime output.
+
+    :param module: Module name
+    :return: List of (nesting depth, cumulative import time in microseconds, module) in import order
+    """
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Import of {module} failed:\n{result.stderr}")
+
+    times = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append((depth, int(cumulative), name.strip()))
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--budget', type=float, default=300.0, help="Maximal import time per module in ms")
+    parser.add_argument('--top', type=int, default=5, help="Number of slowest direct dependencies shown")
+    args = parser.parse_args()
+
+    failed = []
+    for module in args.modules:
+        times = import_times(module)
+        position = max(index for index, (depth, _, name) in enumerate(times) if depth == 0 and name == module)
+        total = times[position][1] / 1000
+
+        # Children are listed before their parent, the direct dependencies of the module are the preceding entries
+        # one level deeper (startup imports of the interpreter are left out)
+        dependencies = []
+        for depth, value, name in reversed(times[:position]):
+            if depth == 0:
+                break
+            if depth == 1:
+                dependencies.append((name, value))
+        dependencies.sort(key=lambda item: -item[1])
+
+        status = "ok" if total <= args.budget else "OVER BUDGET"
+        print(f"{module:<20} {total:8.1f} ms  {status}")
+        for name, value in dependencies[:args.top]:
+            print(f"    {name:<30} {value / 1000:8.1f} ms")
+
+        if total > args.budget:
+            failed.append(module)
+
+    if failed:
+        print(f"Modules over the budget of {args.budget} ms: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
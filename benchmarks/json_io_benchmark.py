@@ -0,0 +1,86 @@
+"""
+Compares the file size and read / write time of the old pretty printed JSON files with the json_io output modes.
+
+Usage: python benchmarks/json_io_benchmark.py [tweet_file ...]
+Without a file a synthetic Tweet dict with 100000 Tweets is used.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import json_io
+from synthetic_data import SyntheticCorpus
+
+
+def synthetic_tweets(number: int):
+    """
+    Creates a Tweet dict in the download format.
+
+    :param number: Number of Tweets
+    :return: Tweet dict
+    """
+
+    return {str(record["tweet.id"]): SyntheticCorpus.nested(record) for record in SyntheticCorpus().records(number)}
+
+
+def measure(function, *args):
+    """
+    Measures the run time of a function.
+
+    :return: Result and time in seconds
+    """
+
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def baseline_dump(data, path):
+    # Former output of all save methods
+    with open(path, 'w', encoding='utf-8') as out_file:
+        json.dump(data, out_file, ensure_ascii=False, indent=4, default=str)
+
+
+def baseline_load(path):
+    with open(path, 'r', encoding='utf-8') as in_file:
+        return json.load(in_file)
+
+
+def run(data, label: str):
+    """
+    Prints size, write and read time for every output mode.
+
+    :param data: Tweet dict
+    :param label: Name of the data set
+    """
+
+    print(f"\n{label}: {len(data)} Tweets (accelerated encoder: {json_io.orjson is not None})")
+    print(f"{'mode':<16}{'size [MB]':>12}{'write [s]':>12}{'read [s]':>12}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'baseline.json')
+        _, write_time = measure(baseline_dump, data, path)
+        _, read_time = measure(baseline_load, path)
+        print(f"{'indent=4 (old)':<16}{os.path.getsize(path) / 1e6:>12.2f}{write_time:>12.3f}{read_time:>12.3f}")
+
+        for mode in (json_io.PRETTY, json_io.COMPACT, json_io.NDJSON):
+            path = os.path.join(directory, 'tweets' + json_io.extension(mode))
+            _, write_time = measure(json_io.dump, data, path, mode)
+            _, read_time = measure(json_io.load, path)
+            print(f"{mode:<16}{os.path.getsize(path) / 1e6:>12.2f}{write_time:>12.3f}{read_time:>12.3f}")
+
+
+def main():
+    if len(sys.argv) > 1:
+        for tweet_file in sys.argv[1:]:
+            run(json_io.load(tweet_file), os.path.basename(tweet_file))
+    else:
+        run(synthetic_tweets(100000), "synthetic")
+
+
+if __name__ == '__main__':
+    main()
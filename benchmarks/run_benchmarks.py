@@ -0,0 +1,269 @@
+"""
+End-to-end benchmark of the processing stages on synthetic corpora of several sizes. Every stage is timed (best of
+several runs) and memory profiled (tracemalloc peak) in a separate run. Results can be stored as baseline and later
+runs are compared against it.
+
+Usage: python benchmarks/run_benchmarks.py [--scales 1000 10000 ...] [--stages ...] [--save-baseline]
+The generated corpora are kept in --data-dir, so every scale is only generated once.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import tracemalloc
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import json_io
+from synthetic_data import SyntheticCorpus
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+
+def corpus_files(data_dir: str, number: int, seed: int):
+    """
+    Generates the synthetic files of one scale if they do not exist yet.
+
+    :param data_dir: Directory for the generated files
+    :param number: Number of Tweets
+    :param seed: Seed of the generator
+    :return: Dict with the paths of the storage csv, storage directory, JSON, NDJSON, annotation csv, city keys and
+             lexicon
+    """
+
+    directory = os.path.join(data_dir, f"{number}_{seed}")
+    files = {"storage_dir": os.path.join(directory, 'storage'),
+             "storage_csv": os.path.join(directory, 'storage', 'tweets_synthetic.csv'),
+             "json": os.path.join(directory, 'tweets.json'), "ndjson": os.path.join(directory, 'tweets.ndjson'),
+             "annotation_csv": os.path.join(directory, 'annotation.csv'),
+             "city_keys": os.path.join(directory, 'city_keys.txt'), "lexicon": os.path.join(directory, 'lexicon.txt'),
+             "work_dir": os.path.join(directory, 'work')}
+
+    if not os.path.exists(os.path.join(directory, 'complete')):
+        print(f"Generating {number} Tweets in {directory}")
+        os.makedirs(files["storage_dir"], exist_ok=True)
+        corpus = SyntheticCorpus(seed=seed)
+        corpus.write_storage_csv(files["storage_csv"], number)
+        corpus.write_json(files["json"], number)
+        corpus.write_json(files["ndjson"], number)
+        corpus.write_annotation_csv(files["annotation_csv"], number)
+        corpus.write_city_keys(files["city_keys"])
+        open(os.path.join(directory, 'complete'), 'w').close()
+
+    if not os.path.exists(files["lexicon"]):
+        SyntheticCorpus.write_lexicon(files["lexicon"])
+    os.makedirs(files["work_dir"], exist_ok=True)
+
+    return files
+
+
+def stage_csv_to_json(files):
+    from dataset_handler import DatasetHandler
+
+    handler = DatasetHandler()
+    handler.get_csv(files["storage_csv"], '$')
+    handler.create_json()
+    handler.save_json(os.path.join(files["work_dir"], 'converted'))
+
+
+def stage_csv_to_ndjson(files):
+    from dataset_handler import DatasetHandler
+
+    DatasetHandler().csv_to_ndjson(files["storage_csv"], '$', os.path.join(files["work_dir"], 'converted'))
+
+
+def stage_merge(files):
+    from dataset_handler import DatasetHandler
+
+    DatasetHandler().merge_json([files["json"], files["ndjson"]], os.path.join(files["work_dir"], 'merged'))
+
+
+def stage_data_processing(files):
+    from data_processing import DataProcessing
+
+    processing = DataProcessing()
+    processing.load_city_key_data(files["city_keys"])
+    processing.create_df_with_storage_data(files["storage_dir"])
+    processing.create_short_tweet_df()
+
+
+def stage_sentiment(files):
+    from sentiment_analysis import SentimentAnalyser
+
+    analyser = SentimentAnalyser(files["ndjson"])
+    analyser.sentiment_analysis()
+    analyser.save_json(os.path.join(files["work_dir"], 'sentiment.ndjson'))
+
+
+def stage_sentiment_lexicon(files):
+    from sentiment_analysis import SentimentAnalyser
+
+    analyser = SentimentAnalyser(files["ndjson"], files["lexicon"])
+    analyser.sentiment_analysis()
+    analyser.save_json(os.path.join(files["work_dir"], 'sentiment_lexicon.ndjson'))
+
+
+def stage_extract_geo(files):
+    from tweet_mapper import TweetMapper
+
+    mapper = TweetMapper(os.devnull)
+    mapper.tweet_data = mapper.get_tweets(files["ndjson"])
+    mapper.extract_geo()
+
+
+def stage_user_database(files):
+    from user_analysis import Database
+
+    database = Database(os.path.join(files["work_dir"], 'database.json'))
+    database.database = {}
+    database.get_new_data(files["ndjson"])
+    database.update_database()
+    database.save_database()
+
+
+def stage_relation_graph(files):
+    import pandas as pd
+    from relation_graph import RelationGraph
+
+    df = pd.read_csv(files["annotation_csv"], sep='$', na_values=" NaN").fillna("NaN")
+    RelationGraph.from_dataframe(df).reduce(min_user_degree=2, top_tracks=50)
+
+
+def stage_route_cube(files):
+    import pandas as pd
+    from route_cube import RouteCube
+
+    df = pd.read_csv(files["annotation_csv"], sep='$', na_values=" NaN").fillna("NaN")
+    shutil.rmtree(os.path.join(files["work_dir"], 'cube'), ignore_errors=True)
+    cube = RouteCube(os.path.join(files["work_dir"], 'cube'))
+    cube.update(df)
+    cube.top_routes()
+
+
+STAGES = {"csv_to_json": stage_csv_to_json, "csv_to_ndjson": stage_csv_to_ndjson, "merge": stage_merge,
+          "data_processing": stage_data_processing, "sentiment": stage_sentiment,
+          "sentiment_lexicon": stage_sentiment_lexicon, "extract_geo": stage_extract_geo,
+          "user_database": stage_user_database, "relation_graph": stage_relation_graph,
+          "route_cube": stage_route_cube}
+
+
+def warm_up():
+    """
+    Imports the modules of all stages, so import times are not part of the first measurement.
+    """
+
+    import importlib
+
+    for module in ['pandas', 'numpy', 'dataset_handler', 'data_processing', 'tweet_mapper', 'user_analysis',
+                   'relation_graph', 'route_cube', 'textblob_de']:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+
+def measure(stage, files, repeat: int):
+    """
+    Runs a stage several times for the time and once more with tracemalloc for the memory peak.
+
+    :param stage: Stage function
+    :param files: Corpus files
+    :param repeat: Number of timed runs
+    :return: Best time in seconds and memory peak in MB
+    """
+
+    times = []
+    with open(os.devnull, 'w') as null, redirect_stdout(null):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stage(files)
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        stage(files)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return min(times), peak / 1e6
+
+
+def compare(results: dict, baselines: dict, tolerance: float):
+    """
+    Prints the ratio to the baseline for every result.
+
+    :param results: Dict "stage/scale" -> {"time": seconds, "memory": MB}
+    :param baselines: Stored results of the same format
+    :param tolerance: Allowed relative slow down, e.g. 0.2 for 20 %
+    :return: List of regressed keys
+    """
+
+    regressions = []
+    print(f"\n{'stage/scale':<30}{'time':>10}{'baseline':>10}{'ratio':>8}{'memory':>10}{'baseline':>10}{'ratio':>8}")
+    for key, result in results.items():
+        if key not in baselines:
+            continue
+        base = baselines[key]
+        time_ratio = result["time"] / base["time"] if base["time"] else float('nan')
+        memory_ratio = result["memory"] / base["memory"] if base["memory"] else float('nan')
+        flag = ""
+        if time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<30}{result['time']:>10.3f}{base['time']:>10.3f}{time_ratio:>8.2f}"
+              f"{result['memory']:>10.1f}{base['memory']:>10.1f}{memory_ratio:>8.2f}{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on synthetic Tweet corpora")
+    parser.add_argument('--scales', nargs='+', type=int, default=[1000, 10000, 100000])
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3, help="Number of timed runs per stage")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'tweet_benchmark_data'))
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline file")
+    parser.add_argument('--save-baseline', action='store_true', help="Stores the results as new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative slow down")
+    args = parser.parse_args()
+
+    print(f"Python {platform.python_version()} on {platform.machine()}, accelerated JSON: "
+          f"{json_io.orjson is not None}")
+    print(f"{'stage':<20}{'scale':>10}{'time [s]':>12}{'peak [MB]':>12}")
+
+    warm_up()
+
+    results = {}
+    for number in args.scales:
+        files = corpus_files(args.data_dir, number, args.seed)
+        for name in args.stages:
+            try:
+                run_time, memory = measure(STAGES[name], files, args.repeat)
+            except ImportError as error:
+                # Optional dependencies, e.g. textblob_de for the sentiment stage
+                print(f"{name:<20}{number:>10}  skipped ({error})")
+                continue
+            results[f"{name}/{number}"] = {"time": round(run_time, 4), "memory": round(memory, 2)}
+            print(f"{name:<20}{number:>10}{run_time:>12.3f}{memory:>12.1f}")
+
+        # Outputs of the stages are removed after each scale
+        shutil.rmtree(files["work_dir"], ignore_errors=True)
+
+    baselines = json_io.load(args.baseline) if os.path.exists(args.baseline) else {}
+    regressions = compare(results, baselines, args.tolerance)
+
+    if args.save_baseline:
+        baselines.update(results)
+        json_io.dump(baselines, args.baseline, json_io.PRETTY)
+        print("Baseline saved:", args.baseline)
+    elif regressions:
+        print(f"{len(regressions)} results are more than {args.tolerance:.0%} slower / larger than the baseline")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
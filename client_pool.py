@@ -0,0 +1,205 @@
+import re
+import time
+import threading
+import configparser
+import tweepy
+
+
+class TrackedClient(tweepy.Client):
+    """
+    tweepy client that records the rate limit headers of every response per route.
+    """
+
+    def __init__(self, name: str, bearer_token: str):
+        """
+        Constructor.
+
+        :param name: Name of the config section of the credentials
+        :param bearer_token: Bearer token
+        """
+
+        super().__init__(bearer_token=bearer_token)
+        self.name = name
+        self.lock = threading.Lock()
+        # Route key of the last request of each thread
+        self.local = threading.local()
+        # Route -> [remaining requests, reset time (unix time)]
+        self.limits = {}
+        self.requests = 0
+
+    @staticmethod
+    def route_key(method: str, route: str):
+        """
+        Normalizes a route, ids in the path are replaced, so that all users share the limit of an endpoint.
+
+        :param method: HTTP method
+        :param route: API route, e.g. /2/users/123/tweets
+        :return: Key, e.g. GET /2/users/:id/tweets
+        """
+
+        # The leading /2 is the API version
+        return method + " " + re.sub(r"(?<!^)/\d+", "/:id", route)
+
+    def update_limit(self, key: str, headers):
+        """
+        Stores the rate limit headers of a response.
+
+        :param key: Route key
+        :param headers: Response headers
+        """
+
+        if "x-rate-limit-remaining" in headers and "x-rate-limit-reset" in headers:
+            with self.lock:
+                self.limits[key] = [int(headers["x-rate-limit-remaining"]), int(headers["x-rate-limit-reset"])]
+
+    def request(self, method, route, params=None, json=None, user_auth=False):
+        key = self.route_key(method, route)
+        self.local.key = key
+        with self.lock:
+            self.requests += 1
+
+        try:
+            response = super().request(method, route, params=params, json=json, user_auth=user_auth)
+        except tweepy.TooManyRequests as error:
+            self.update_limit(key, error.response.headers)
+            with self.lock:
+                self.limits[key] = [0, error.reset_time or int(time.time()) + 60]
+            raise
+
+        self.update_limit(key, response.headers)
+
+        return response
+
+    def remaining(self, key: str):
+        """
+        Returns the remaining requests of a route, routes without known limit count as unlimited.
+
+        :param key: Route key
+        :return: Remaining requests
+        """
+
+        with self.lock:
+            limit = self.limits.get(key)
+            if limit is None or limit[1] <= time.time():
+                return float('inf')
+            return limit[0]
+
+    def reserve(self, key: str):
+        """
+        Counts a request that is about to be sent, so parallel requests are spread over the clients.
+
+        :param key: Route key
+        """
+
+        with self.lock:
+            if key in self.limits and self.limits[key][1] > time.time():
+                self.limits[key][0] -= 1
+
+
+class ClientPool:
+    """
+    Pool of clients for several credentials. Every client keeps its HTTP session (keep-alive connections) and its
+    rate limit windows. Each request is routed to the client with the most remaining requests for its endpoint.
+    Client methods can be called on the pool directly, e.g. pool.search_recent_tweets(...).
+    """
+
+    # Method name -> route key of the endpoints used by the handlers, others are learned from their first request
+    ROUTES = {"search_recent_tweets": "GET /2/tweets/search/recent", "get_recent_tweets_count":
+              "GET /2/tweets/counts/recent", "get_tweets": "GET /2/tweets", "get_users_tweets":
+              "GET /2/users/:id/tweets"}
+
+    shared_pools = {}
+    shared_lock = threading.Lock()
+
+    def __init__(self, tokens: dict):
+        """
+        Constructor.
+
+        :param tokens: Dict credential name -> bearer token
+        """
+
+        if not tokens:
+            raise ValueError("No bearer token given")
+
+        self.clients = [TrackedClient(name, token) for name, token in tokens.items()]
+        self.routes = dict(self.ROUTES)
+
+    @classmethod
+    def from_config(cls, config_file: str):
+        """
+        Creates a pool with the bearer tokens of all config sections whose name starts with "twitter", e.g.
+        [twitter], [twitter_2], ...
+
+        :param config_file: Path to config file
+        :return: ClientPool
+        """
+
+        config = configparser.RawConfigParser()
+        config.read(config_file)
+
+        return cls({section: config[section]["bearer_token"] for section in config.sections()
+                    if section.startswith("twitter") and config.has_option(section, "bearer_token")})
+
+    @classmethod
+    def shared(cls, config_file: str):
+        """
+        Returns the pool of a config file, all handlers of one process share the same clients.
+
+        :param config_file: Path to config file
+        :return: ClientPool
+        """
+
+        with cls.shared_lock:
+            if config_file not in cls.shared_pools:
+                cls.shared_pools[config_file] = cls.from_config(config_file)
+            return cls.shared_pools[config_file]
+
+    def select(self, key: str):
+        """
+        Chooses the client with the most remaining requests. If all clients are exhausted, waits for the first reset.
+
+        :param key: Route key
+        :return: TrackedClient
+        """
+
+        while True:
+            client = max(self.clients, key=lambda candidate: candidate.remaining(key))
+            if client.remaining(key) > 0:
+                client.reserve(key)
+                return client
+
+            reset = min(candidate.limits[key][1] for candidate in self.clients)
+            wait = max(reset - time.time(), 0) + 1
+            print(f"Rate limit of all {len(self.clients)} clients reached for {key}, waiting {wait:.0f} s")
+            time.sleep(wait)
+
+    def __getattr__(self, name: str):
+        method = getattr(tweepy.Client, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            while True:
+                client = self.select(self.routes.get(name, name))
+                try:
+                    response = getattr(client, name)(*args, **kwargs)
+                except tweepy.TooManyRequests:
+                    # The client is marked as exhausted, the request goes to the next client
+                    continue
+                finally:
+                    if name not in self.routes and getattr(client.local, "key", None):
+                        self.routes[name] = client.local.key
+                return response
+
+        # Paginator chooses the token parameter by the method name
+        call.__name__ = name
+
+        return call
+
+    def report(self):
+        """
+        Prints the number of requests and the known limits of every client.
+        """
+
+        for client in self.clients:
+            print(f"Client {client.name}: {client.requests} requests, limits {client.limits}")
@@ -1,6 +1,20 @@
 import pandas as pd
+import os
 import glob
+import hashlib
+import json_io
 from datetime import datetime
+from collections import OrderedDict
+from route_cube import RouteCube
+from text_tokens import Vocabulary, TokenizedTexts
+
+# Words in front of a city key that mark it as start or end of the travel
+START_KEYS = {"von", "Von", "aus", "Aus", "from", "From"}
+END_KEYS = {"nach", "Nach", "to", "To"}
+
+# Words that mark a Tweet as related to the Deutsche Bahn
+DB_KEYS = {"@DB_Bahn", "@DB_Info", "@DB_Presse", "bahn", "Bahn", "DeutscheBahn", "#DBNavigator", "#9EuroTicket",
+           "#9EuroTickets", "#NeunEuroTicket", "#NeunEuroTickets", "neun-euro-ticket", "neun-euro-tickets"}
 
 
 class DataProcessing:
@@ -18,6 +32,15 @@ class DataProcessing:
         self.tweet_df = pd.DataFrame([])
         self.history_tweet_df = pd.DataFrame([])
         self.city_key_dict = {}
+        # Token ids shared by all tokenized columns and key sets
+        self.vocabulary = Vocabulary()
+        self.city_key_ids = set()
+        self.start_key_ids = self.vocabulary.id_set(START_KEYS)
+        self.end_key_ids = self.vocabulary.id_set(END_KEYS)
+        # Least recently used memo of the city keys of user locations and place names, shared by both columns
+        self.city_memo = OrderedDict()
+        self.city_memo_size = 100000
+        self.city_memo_statistics = {"values": 0, "memo": 0, "extracted": 0}
         self.short_tweet_df = pd.DataFrame
         self.history_short_tweet_df = pd.DataFrame
         self.user_id_dict = {}
@@ -86,67 +109,148 @@ class DataProcessing:
             converted = line.strip().split()[0]
             self.city_key_dict[converted] = converted
 
+        self.city_key_ids = self.vocabulary.id_set(self.city_key_dict)
+        # Results of the former city keys are not valid anymore
+        self.city_memo.clear()
+
+    def tokenize(self, texts):
+        """
+        Splits and normalizes texts once (hashtags, dots and commas removed), all key searches work on the token ids.
+
+        :param texts: Iterable of texts, e.g. a dataframe column
+        :return: TokenizedTexts
+        """
+
+        return TokenizedTexts.from_texts(texts, self.vocabulary)
+
+    def city_key_extraction(self, token_ids):
+        """
+        Filters the city keys out of the tokens of a text. And checks if the city keys are used in combination with
+        other keywords, which might indicate an assignment as start or end position of the traveling.
+
+        :param token_ids: Token ids of a text
+        :return: start_keys_list, end_keys_list, isolated_keys_list
+        """
+
+        tokens = self.vocabulary.tokens
+
+        # Stores city key words that are found in combination with start / end key words and isolated city keys
+        start_keys_list = []
+        end_keys_list = []
+        isolated_keys_list = []
+
+        # Check for each word, if it is a key in the city key name dict
+        for position, token_id in enumerate(token_ids):
+            if token_id not in self.city_key_ids:
+                continue
+
+            # The previous word decides if the key is a start or end position key
+            previous_id = token_ids[position - 1] if position else None
+            if previous_id in self.start_key_ids:
+                start_keys_list.append(tokens[token_id])
+            elif previous_id in self.end_key_ids:
+                end_keys_list.append(tokens[token_id])
+            else:
+                isolated_keys_list.append(tokens[token_id])
+
+        return start_keys_list, end_keys_list, isolated_keys_list
+
     def text_city_key_extraction(self, tweet_text):
         """
         Filters for a given tweet text the keywords out. And checks if the city keys are used in combination with
         other keywords, which might indicate an assignment as start or end position of the traveling.
 
         :param tweet_text: stripped text of a tweet
-        :return: isolated_keys_list, start_keys_list, end_keys_list
+        :return: start_keys_list, end_keys_list, isolated_keys_list
         """
 
-        # Split tweet text, to search for words not substrings
-        tweet_text_split = tweet_text.split()
+        return self.city_key_extraction(self.tokenize([tweet_text]).ids(0))
 
-        # Remove all  hashtags, dots, commas in front of the words to enable key search
-        tweet_text_split = list(map(lambda x: x.replace("#", "").replace(".", "").replace(",", ""), tweet_text_split))
+    def city_key_fingerprint(self):
+        """
+        Returns a hash of the city keys, memo entries are only valid for the same city keys.
 
-        # Stores isolated city key words found in the tweet text
-        isolated_keys_list = []
+        :return: Hex digest
+        """
 
-        # Stores city key words that are found in combination with start key words in the tweet text
-        start_keys_list = []
-        # Stores city key words that are found in combination with end key words in the tweet text
-        end_keys_list = []
-        # saves the position of the current word in the text to check previous words as keys
-        current_list_position = 0
+        return hashlib.sha256("\n".join(sorted(self.city_key_dict)).encode('utf-8')).hexdigest()
 
-        # Check for each word, if it is a key in the city key name dict
-        for current_word in tweet_text_split:
+    def load_city_memo(self, memo_file: str):
+        """
+        Loads the memo of a previous run, so known user locations and place names are not processed again. The memo
+        is ignored if it was created with other city keys.
 
-            # Checks if word is a key
-            if current_word in self.city_key_dict:
+        :param memo_file: Path to memo file
+        """
 
-                previous_pos = tweet_text_split[current_list_position - 1]
+        if not os.path.exists(memo_file):
+            return
 
-                # Check if the key is a start position key
-                if ((previous_pos == "von") or (previous_pos == "Von")
-                    or (previous_pos == "aus") or (previous_pos == "Aus") or (previous_pos == "from") or
-                                                  (previous_pos == "From")) and current_list_position != 0:
-                    start_keys_list.append(current_word)
+        memo = json_io.load(memo_file)
+        if memo.get("city_keys") == self.city_key_fingerprint():
+            self.city_memo = OrderedDict((value, tuple(keys)) for value, keys in memo["entries"])
 
-                # Check if the key is an end position key
-                elif ((previous_pos == "nach") or (previous_pos == "Nach") or (previous_pos == "to") or
-                                                (previous_pos == "To")) and current_list_position != 0:
-                    end_keys_list.append(current_word)
+    def save_city_memo(self, memo_file: str):
+        """
+        Saves the memo for the next run.
 
-                # Isolated key found
-                else:
-                    isolated_keys_list.append(current_word)
+        :param memo_file: Path to memo file
+        """
 
-            current_list_position += 1
+        json_io.dump({"city_keys": self.city_key_fingerprint(), "entries": list(self.city_memo.items())}, memo_file,
+                     json_io.COMPACT)
 
-        return start_keys_list, end_keys_list, isolated_keys_list
+    def unique_city_key_extraction(self, values):
+        """
+        Runs the city key extraction once per distinct value of a column and maps the results back by code. Results
+        are kept in the memo, values that were seen before are not tokenized again.
 
-    def create_short_tweet_df(self):
+        :param values: Column with many repeated values, e.g. user locations
+        :return: List with start_keys_list, end_keys_list, isolated_keys_list per row
+        """
+
+        codes, uniques = pd.factorize(values)
+
+        results = []
+        pending = []
+        for code, value in enumerate(uniques):
+            keys = self.city_memo.get(value)
+            if keys is None:
+                pending.append(code)
+                results.append(None)
+            else:
+                self.city_memo.move_to_end(value)
+                results.append(keys)
+
+        # Extraction of the distinct values that are not in the memo
+        tokenized = self.tokenize(uniques[code] for code in pending)
+        for row, code in enumerate(pending):
+            results[code] = self.city_memo[uniques[code]] = self.city_key_extraction(tokenized.ids(row))
+        while len(self.city_memo) > self.city_memo_size:
+            self.city_memo.popitem(last=False)
+
+        self.city_memo_statistics["values"] += len(uniques)
+        self.city_memo_statistics["memo"] += len(uniques) - len(pending)
+        self.city_memo_statistics["extracted"] += len(pending)
+
+        # Missing values (code -1) have no city keys
+        results.append(([], [], []))
+
+        return [results[code] for code in codes]
+
+    def create_short_tweet_df(self, memo_file=None):
         """
         Write function which kicks out unessesary columns and add columns for city key storage
         The information of the geo location name should also be considered, when type is city
         The information of the enteties can be included, but i think they are based on the tweet text.
         English tweets should be excluded from the analysis.
         Account location as start.
+        :param memo_file: optional path to the city key memo, it is loaded before and saved after the extraction
         """
 
+        if memo_file is not None:
+            self.load_city_memo(memo_file)
+
         # Remove dots form column names, they are obstructive
         self.tweet_df.columns = self.tweet_df.columns.str.replace('.', '_')
 
@@ -155,38 +259,30 @@ class DataProcessing:
                                                   "tweet_like_count", "tweet_quote_count", "tweet_hashtags",
                                                   "user_name", "tweet_lang"], axis=1)
 
-        # New columns
-        self.short_tweet_df["hometowns"] = self.short_tweet_df.apply(lambda x: [], axis=1)
-        self.short_tweet_df["destinations"] = self.short_tweet_df.apply(lambda x: [], axis=1)
-        self.short_tweet_df["unassigned_locations"] = self.short_tweet_df.apply(lambda x: [], axis=1)
+        # Tweet texts are tokenized once, user locations and place names once per distinct value
+        texts = self.tokenize(self.short_tweet_df["tweet_text"])
+        location_keys = self.unique_city_key_extraction(self.short_tweet_df["user_location"])
+        place_keys = self.unique_city_key_extraction(self.short_tweet_df["place_name"])
 
-        # transfer user.location in hometowns with city key detection
-        self.short_tweet_df["hometowns"] = self.short_tweet_df.apply(
-            lambda name_list: name_list.hometowns + self.text_city_key_extraction(name_list.user_location)[2], axis=1)
+        # City name extraction from tweet texts (hometowns, travel destinations and city names without route
+        # assignment)
+        text_keys = [self.city_key_extraction(texts.ids(row)) for row in range(len(texts))]
 
+        # New columns
+        # transfer user.location in hometowns with city key detection
+        self.short_tweet_df["hometowns"] = [location[2] + keys[0] for location, keys in zip(location_keys, text_keys)]
+        self.short_tweet_df["destinations"] = [keys[1] for keys in text_keys]
         # Transfer tagged geo data in unassigned column with city key detection
-        self.short_tweet_df["unassigned_locations"] = self.short_tweet_df.apply(
-            lambda name_list: name_list.unassigned_locations + self.text_city_key_extraction(name_list.place_name)[2],
-            axis=1)
+        self.short_tweet_df["unassigned_locations"] = [place[2] + keys[2] for place, keys in zip(place_keys, text_keys)]
+
+        print("City key memo:", self.city_memo_statistics)
+        if memo_file is not None:
+            self.save_city_memo(memo_file)
 
         # Drop unnecessary geo columns
         self.short_tweet_df = self.short_tweet_df.drop(["place_name", "place_country_code", "place_id",
                                                         "place_geo", "place_place_type", "user_location"], axis=1)
 
-        # City name extraction from tweet texts
-        # For hometowns
-        self.short_tweet_df["hometowns"] = self.short_tweet_df.apply(
-            lambda name_list: name_list.hometowns + self.text_city_key_extraction(name_list.tweet_text)[0],
-            axis=1)
-        # For travel destinations
-        self.short_tweet_df["destinations"] = self.short_tweet_df.apply(
-            lambda name_list: name_list.destinations + self.text_city_key_extraction(name_list.tweet_text)[1],
-            axis=1)
-        # For city names without route assignment
-        self.short_tweet_df["unassigned_locations"] = self.short_tweet_df.apply(
-            lambda name_list: name_list.unassigned_locations + self.text_city_key_extraction(name_list.tweet_text)[2],
-            axis=1)
-
         """#print(self.short_tweet_df.head())
         print("Hometown count distribution: \n", self.short_tweet_df["hometowns"].value_counts())
         print("Destination count distribution: \n", self.short_tweet_df["destinations"].value_counts())
@@ -234,39 +330,14 @@ class DataProcessing:
 
         return user_id_list
 
-    @staticmethod
-    def db_key_extraction(tweet_text):
+    def db_key_extraction(self, tweet_text):
         """
         Function determines if a tweet text is related to the deutsch bahn
         :param tweet_text: trivial
         :return: db_related
         """
 
-        # True if tweet text is db related
-        db_related = False
-
-        # Split tweet text, to search for words not substrings
-        tweet_text_split = tweet_text.split()
-
-        # Remove all  hashtags, dots, commas in front of the words to enable key search
-        tweet_text_split = list(map(lambda x: x.replace("#", "").replace(".", "").replace(",", ""), tweet_text_split))
-
-        key_dict = {"@DB_Bahn": "@DB_Bahn", "@DB_Info": "@DB_Info", "@DB_Presse": "@DB_Presse", "bahn": "bahn",
-                    "Bahn": "Bahn", "DeutscheBahn": "DeutscheBahn", "#DBNavigator": "#DBNavigator",
-                    "#9EuroTicket": "#9EuroTicket", "#9EuroTickets": "#9EuroTickets",
-                    "#NeunEuroTicket": "#NeunEuroTicket", "#NeunEuroTickets": "#NeunEuroTickets",
-                    "neun-euro-ticket": "neun-euro-ticket", "neun-euro-tickets": "neun-euro-tickets",
-                    }
-
-        # Check for each word, if it is a key in the db key name dict
-        for current_word in tweet_text_split:
-
-            # Checks if word is a key
-            if current_word in key_dict:
-                db_related = True
-                break
-
-        return db_related
+        return self.tokenize([tweet_text]).contains_any(self.vocabulary.id_set(DB_KEYS))[0]
 
     def check_user_abundance_in_df(self, user_id):
         """
@@ -294,13 +365,9 @@ class DataProcessing:
         # Remove dots form column names, they are obstructive
         self.tweet_df.columns = self.tweet_df.columns.str.replace('.', '_')
 
-        # Add column for DB relation assessment
-        self.tweet_df["db_related"] = False
-
-        # Determine if the tweet texts are DB related
-        self.tweet_df["db_related"] = self.tweet_df.apply(lambda db_related:
-                                                          self.db_key_extraction(tweet_text=db_related.tweet_text,
-                                                                                 self=self), axis=1)
+        # Determine if the tweet texts are DB related, the texts are tokenized once
+        texts = self.tokenize(self.tweet_df["tweet_text"])
+        self.tweet_df["db_related"] = texts.contains_any(self.vocabulary.id_set(DB_KEYS))
 
         # Drop tweets that are not db related
         self.tweet_df = self.tweet_df[(self.tweet_df["db_related"] == True)]
@@ -454,6 +521,34 @@ class DataProcessing:
         print("Number of relevant users:", len(relevant_user_list))
         print(relevant_user_list)
 
+    def update_route_cube(self, cube_directory, min_route_count=None, sentiment_file=None):
+        """
+        Adds the tweets of the short_tweet_df to the route cube. If a threshold is given, the interesting routes are
+        taken from the cube instead of the hard-coded dict.
+        :param cube_directory: path to route cube directory
+        :param min_route_count: minimal number of tweets of an interesting route
+        :param sentiment_file: optional tweet JSON / NDJSON file of the sentiment analysis, the sentiments are joined
+                               by tweet id
+        :return: route cube
+        """
+
+        # Language and sentiment are not part of the short tweet df, they are joined by tweet id
+        tweet_ids = self.short_tweet_df["tweet_id"]
+        languages = self.tweet_df.drop_duplicates(subset="tweet_id").set_index("tweet_id")["tweet_lang"]
+        route_df = self.short_tweet_df.assign(tweet_lang=tweet_ids.map(languages))
+        if sentiment_file is not None:
+            sentiments = {tweet_id: tweet["Data"].get("Sentiment")
+                          for tweet_id, tweet in json_io.iter_tweets(sentiment_file)}
+            route_df["sentiment"] = tweet_ids.astype(str).map(sentiments)
+
+        cube = RouteCube(cube_directory)
+        print("New tweets in route cube:", cube.update(route_df))
+
+        if min_route_count is not None:
+            self.intersting_routes_dict = cube.routes_above(min_route_count)
+
+        return cube
+
 
 def main():
     # Read in storage files
@@ -1,5 +1,14 @@
-import json
-import pandas as pd
+import json_io
+from tweet_table import TweetTable
+
+# Mapping of the nested JSON keys to the storage csv columns
+DATA_COLUMNS = {'Id': 'tweet.id', 'Created_At': 'tweet.created_at', 'Text': 'tweet.text',
+                'Tweet_Source': 'tweet.source', 'Retweet_Count': 'tweet.retweet_count',
+                'Reply_Count': 'tweet.reply_count', 'Like_Count': 'tweet.like_count',
+                'Quote_Count': 'tweet.quote_count', 'Language': 'tweet.lang'}
+USER_COLUMNS = {'Id': 'user.id', 'Name': 'user.name', 'Location': 'user.location', 'Created_At': 'user.created_at'}
+GEO_COLUMNS = {'Id': 'place.id', 'Name': 'place.name', 'Country_Code': 'place.country_code', 'Geo': 'place.geo',
+               'Type': 'place.place_type'}
 
 
 class DatasetHandler:
@@ -13,7 +22,7 @@ class DatasetHandler:
         """
 
         self.csv_data = None
-        self.json_data = {}
+        self.json_data = TweetTable()
 
     def get_csv(self, csv_file: str, separator: str):
         """
@@ -23,39 +32,87 @@ class DatasetHandler:
         :param separator: Seperator for csv file
         """
 
+        import pandas as pd
+
         with open(csv_file, 'r', encoding='utf-8'):
             self.csv_data = pd.read_csv(csv_file, sep=separator)
 
     def create_json(self):
         """
-        Creates JSON dict from dataframe.
+        Creates the Tweet table from the dataframe.
+        """
+
+        self.json_data = self.create_table(self.csv_data)
+
+    @staticmethod
+    def create_table(data_frame):
+        """
+        Builds a columnar Tweet table directly from the dataframe columns, no Tweet dicts are created.
+
+        :param data_frame: Dataframe in storage csv format
+        :return: TweetTable
+        """
+
+        sections = {section: {key: data_frame[column].tolist() for key, column in columns.items()}
+                    for section, columns in (('Data', DATA_COLUMNS), ('User', USER_COLUMNS), ('Geo', GEO_COLUMNS))}
+        sections['Hashtags'] = data_frame['tweet.hashtags'].tolist()
+
+        return TweetTable.from_columns(data_frame['tweet.id'].tolist(), sections)
+
+    @staticmethod
+    def create_records(data_frame):
         """
+        Builds the nested Tweet objects column by column instead of row by row.
 
-        for index, row in self.csv_data.iterrows():
-            data = {'Id': row['tweet.id'], 'Created_At': row['tweet.created_at'], 'Text': row['tweet.text'],
-                    'Tweet_Source': row['tweet.source'], 'Retweet_Count': row['tweet.retweet_count'],
-                    'Reply_Count': row['tweet.reply_count'], 'Like_Count': row['tweet.like_count'],
-                    'Quote_Count': row['tweet.quote_count'], 'Language': row['tweet.lang']}
+        :param data_frame: Dataframe in storage csv format
+        :return: List of Tweet dicts
+        """
 
-            user = {'Id': row['user.id'], 'Name': row['user.name'], 'Location': row['user.location'],
-                    'Created_At': row['user.created_at']}
+        def sub_records(columns: dict):
+            # Converts the columns to python lists once and zips them to dicts
+            keys = list(columns.keys())
+            values = [data_frame[column].tolist() for column in columns.values()]
+            return [dict(zip(keys, row)) for row in zip(*values)]
 
-            geo = {'Id': row['place.id'], 'Name': row['place.name'], 'Country_Code': row['place.country_code'],
-                   'Geo': row['place.geo'], 'Type': row['place.place_type']}
+        data = sub_records(DATA_COLUMNS)
+        user = sub_records(USER_COLUMNS)
+        geo = sub_records(GEO_COLUMNS)
+        hashtags = data_frame['tweet.hashtags'].tolist()
 
-            hashtags = row['tweet.hashtags']
+        return [{'Data': d, 'User': u, 'Geo': g, 'Hashtags': h} for d, u, g, h in zip(data, user, geo, hashtags)]
 
-            self.json_data[row['tweet.id']] = {'Data': data, 'User': user, 'Geo': geo, 'Hashtags': hashtags}
+    def csv_to_ndjson(self, csv_file: str, separator: str, file_name: str, chunk_size=50000):
+        """
+        Converts a storage csv file chunk by chunk to a NDJSON file with one Tweet per line.
 
-    def save_json(self, name: str):
+        :param csv_file: Path to csv file
+        :param separator: Seperator for csv file
+        :param file_name: File name for new file
+        :param chunk_size: Number of rows converted at once
+        :return: Number of converted Tweets
+        """
+
+        import pandas as pd
+
+        count = 0
+        with open(file_name + '.ndjson', 'w', encoding='utf-8') as out_file:
+            for chunk in pd.read_csv(csv_file, sep=separator, chunksize=chunk_size):
+                records = self.create_records(chunk)
+                count += json_io.write_lines(records, out_file)
+
+        print("Number of converted Tweets:", count)
+
+        return count
+
+    def save_json(self, name: str, mode=None):
         """
         Saves dict as JSON object.
 
         :param name: File name
+        :param mode: Output mode of json_io (pretty, compact or ndjson)
         """
 
-        with open(name + '.json', 'w', encoding='utf-8') as out_file:
-            json.dump(self.json_data, out_file, indent=4)
+        json_io.dump(self.json_data, name + json_io.extension(mode), mode)
 
     def append_json(self, file1: str, file2: str, file_name: str):
         """
@@ -66,15 +123,70 @@ class DatasetHandler:
         :param file_name: File name for new file
         """
 
-        with open(file1, 'r', encoding='utf-8') as in_file1:
-            json1 = json.load(in_file1)
+        self.merge_json([file1, file2], file_name)
+
+    @staticmethod
+    def normalize_none(tweet: dict):
+        """
+        Replaces the "None" strings of the Geo and User object with None.
+
+        :param tweet: Tweet dict
+        :return: Normalized Tweet dict
+        """
+
+        for part in ('Geo', 'User'):
+            values = tweet.get(part)
+            if isinstance(values, dict):
+                for key, value in values.items():
+                    if value == 'None':
+                        values[key] = None
+
+        return tweet
+
+    def merge_json(self, tweet_files: list, file_name: str, output_format='json'):
+        """
+        Merges any number of JSON / NDJSON Tweet files. If a Tweet id occurs more than once, the Tweet of the last file
+        wins.
+
+        :param tweet_files: List of JSON / NDJSON files
+        :param file_name: File name for new file, the file ending of the output format is added
+        :param output_format: 'json' for one JSON object, 'ndjson' for one Tweet per line
+        :return: Number of Tweets in the merged file
+        """
+
+        mode = json_io.NDJSON if output_format == 'ndjson' else json_io.COMPACT
+
+        return self.merge_json_file(tweet_files, file_name + json_io.extension(mode), mode)
+
+    def merge_json_file(self, tweet_files: list, out_file: str, mode=None):
+        """
+        Merges any number of JSON / NDJSON Tweet files into exactly the given file. The files are streamed twice, only
+        the id index is held in memory.
+
+        :param tweet_files: List of JSON / NDJSON files
+        :param out_file: Path to merged file
+        :param mode: Output mode, default NDJSON for NDJSON file endings and COMPACT otherwise
+        :return: Number of Tweets in the merged file
+        """
+
+        mode = mode or (json_io.NDJSON if json_io.is_ndjson(out_file) else json_io.COMPACT)
+
+        # First pass: Find the position of the last occurrence for every Tweet id
+        index = {}
+        for source, tweet_file in enumerate(tweet_files):
+            for position, (tweet_id, _) in enumerate(json_io.iter_tweets(tweet_file)):
+                index[tweet_id] = (source, position)
 
-        with open(file2, 'r', encoding='utf-8') as in_file2:
-            json2 = json.load(in_file2)
+        print("Number of Tweets after merge:", len(index))
 
-        self.json_data = {**json1, **json2}
+        def winners():
+            # Second pass: Yields the last occurrence of every Tweet id
+            for source, tweet_file in enumerate(tweet_files):
+                for position, (tweet_id, tweet) in enumerate(json_io.iter_tweets(tweet_file)):
+                    if index[tweet_id] == (source, position):
+                        yield tweet_id, self.normalize_none(tweet)
 
-        self.save_json("Combined")
+        return json_io.dump_items(winners(), out_file, mode)
 
     @staticmethod
     def remove_none(json_file):
@@ -84,13 +196,11 @@ class DatasetHandler:
         :param json_file: Path to Geo Tweet data
         """
 
-        with open(json_file, 'r', encoding='utf-8') as in_file:
-            json_data = json.load(in_file)
+        json_data = json_io.load(json_file)
 
-            for entry in json_data.keys():
-                for value in json_data[entry]['Geo'].keys():
-                    if json_data[entry]['Geo'][value] == 'None':
-                        json_data[entry]['Geo'][value] = None
+        for entry in json_data.keys():
+            for value in json_data[entry]['Geo'].keys():
+                if json_data[entry]['Geo'][value] == 'None':
+                    json_data[entry]['Geo'][value] = None
 
-        with open(json_file, 'w', encoding='utf-8') as out_file:
-            json.dump(json_data, out_file, indent=4, ensure_ascii=False)
+        json_io.dump(json_data, json_file, json_io.NDJSON if json_io.is_ndjson(json_file) else None)
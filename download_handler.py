@@ -1,9 +1,17 @@
-import tweepy
-import json
+import queue
+import json_io
+import threading
 import configparser
-import pandas as pd
-from tweepy.parsers import JSONParser
 from datetime import datetime
+from typing import TYPE_CHECKING
+from tweet_records import TweetRecords
+from concurrent.futures import ThreadPoolExecutor
+from query_planner import QueryPlanner, put
+from hydration_cache import HydrationCache, BATCH_SIZE, TWEET_FIELDS, USER_FIELDS, PLACE_FIELDS, \
+    EXPANSIONS
+
+if TYPE_CHECKING:
+    import tweepy
 
 
 class DownloadHandler:
@@ -21,11 +29,23 @@ class DownloadHandler:
         self.access_token = None
         self.access_token_secret = None
         self.bearer_token = None
+        self.config_file = None
         self.api = None
         # Attributes
         self.available = False
+        self.daily_counts = []
+        # Query -> daily counts of check_available, used to plan the search shards
+        self.query_counts = {}
+        self.search_shards = 4
+        self.search_workers = 4
+        self.hydration_cache_file = None
+        self.hydration_max_age = 24.0
+        self.hydration_cache = None
+        self.hydration_workers = 4
+        self.queue_size = 8
         self.tweet_ids = []
         self.tweet_batches = []
+        self.query_matches = {}
         self.tweet_data = {}
 
     def read_config_file(self, path_to_file: str):
@@ -35,6 +55,7 @@ class DownloadHandler:
         :param path_to_file: Path to config file --> contains authentication keys
         """
 
+        self.config_file = path_to_file
         config = configparser.RawConfigParser()
         config.read(path_to_file)
 
@@ -44,12 +65,21 @@ class DownloadHandler:
         self.access_token = config["twitter"]["access_token"]
         self.access_token_secret = config["twitter"]["access_token_secret"]
         self.bearer_token = config["twitter"]["bearer_token"]
+        self.search_shards = config["twitter"].getint("search_shards", fallback=self.search_shards)
+        self.search_workers = config["twitter"].getint("search_workers", fallback=self.search_workers)
+        # Optional local cache of hydrated Tweets
+        self.hydration_cache_file = config["twitter"].get("hydration_cache", fallback=None)
+        self.hydration_max_age = config["twitter"].getfloat("hydration_max_age_hours",
+                                                            fallback=self.hydration_max_age)
+        self.hydration_workers = config["twitter"].getint("hydration_workers", fallback=self.hydration_workers)
 
     def create_api_interface(self):
         """
         Uses authentication details to create an API interface.
         """
 
+        import tweepy
+
         # Authentication
         authentication = tweepy.OAuthHandler(self.api_key, self.api_key_secret)
         authentication.set_access_token(self.access_token, self.access_token_secret)
@@ -57,7 +87,7 @@ class DownloadHandler:
         # Create API interface
         self.api = tweepy.API(authentication, parser=tweepy.parsers.JSONParser())
 
-    def check_available(self, client: tweepy.client, query: str):
+    def check_available(self, client: 'tweepy.Client', query: str):
         """
         Checks if new tweets are available.
 
@@ -67,10 +97,12 @@ class DownloadHandler:
 
         # Finds all available tweets for the last 7 days
         available_tweets = client.get_recent_tweets_count(query=query, granularity="day")
+        self.daily_counts = available_tweets.data or []
+        self.query_counts[query] = self.daily_counts
 
         # Adds all day count values up to one week count value
         week_count = 0
-        for daily_count in available_tweets.data:
+        for daily_count in self.daily_counts:
             week_count += daily_count["tweet_count"]
 
         # Checks for tweet availability
@@ -81,40 +113,134 @@ class DownloadHandler:
             print("There are no Tweets available...")
             self.available = False
 
-    def remove_duplicates(self, response):
+    def hydrate(self, client: 'tweepy.Client', tweet_ids: list):
         """
-        Removes the duplicate Tweets that were pulled from Twitter.
+        Hydrates Tweet ids in batches of 100. If a hydration cache is configured, only the Tweets that are not cached
+        or outdated are requested.
 
-        :param response: Contains all Tweets pulled from Twitter
+        :param client: Contains the client used for Twitter access
+        :param tweet_ids: Tweet ids
+        :return: Generator of get_tweets responses
         """
 
-        # Extract Tweet ids
-        self.tweet_ids = []
-        for tweet in response:
-            self.tweet_ids.append(tweet.id)
+        if self.hydration_cache_file is None:
+            for start in range(0, len(tweet_ids), BATCH_SIZE):
+                yield client.get_tweets(ids=tweet_ids[start:start + BATCH_SIZE], tweet_fields=TWEET_FIELDS,
+                                        user_fields=USER_FIELDS, place_fields=PLACE_FIELDS, expansions=EXPANSIONS)
+            return
 
-        # Removes duplicates by putting the Tweets into a set.
-        # --> Only unique values
-        print("Number of Tweets before deduplication:", len(self.tweet_ids))
-        self.tweet_ids = [*{*self.tweet_ids}]
-        print("Number of Tweets after deduplication:", len(self.tweet_ids))
+        yield from self.open_hydration_cache().hydrate(client, tweet_ids)
 
-    def create_batches(self):
+    def open_hydration_cache(self):
         """
-        Creates batches of size 100 as input for the tweepy.get_tweets() function.
+        Opens the configured hydration cache once.
+
+        :return: HydrationCache or None if no cache is configured
         """
 
-        # Iterating through all Tweets.
-        # --> Constructing batches of size 100
-        batch = []
-        for i in range(1, len(self.tweet_ids) + 1):
-            batch.append(self.tweet_ids[i - 1])
-            if i % 100 == 0:
-                self.tweet_batches.append(batch)
-                batch = []
+        if self.hydration_cache is None and self.hydration_cache_file is not None:
+            self.hydration_cache = HydrationCache(self.hydration_cache_file, self.hydration_max_age)
+
+        return self.hydration_cache
 
-        # Append last batch < 100
-        self.tweet_batches.append(batch)
+    def search_and_hydrate(self, client: 'tweepy.Client', query, limit: int, handle):
+        """
+        Searches and hydrates Tweets as pipeline: the search pages are deduplicated and cut into batches of 100 ids,
+        which hydration workers request while the search is still running. The batch queue is bounded, so the search
+        waits if the hydration falls behind.
+        Several named queries share the deduplication and hydration stage, a Tweet that matches more than one query is
+        hydrated only once. The matching query names of every Tweet are stored in query_matches.
+
+        :param client: Contains the client used for Twitter access
+        :param query: Search query or dict query name -> search query
+        :param limit: Maximal number of Tweets per query
+        :param handle: Function that is called with every hydrated response (one call at a time)
+        :return: Number of unique Tweet ids
+        """
+
+        queries = query if isinstance(query, dict) else {None: query}
+        batches = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        handle_lock = threading.Lock()
+        self.open_hydration_cache()
+        self.tweet_ids = []
+        self.tweet_batches = []
+        self.query_matches = {}
+
+        def produce():
+            batch = []
+            try:
+                # The queries run one after another, each query searches its shards in parallel
+                for name, text in queries.items():
+                    planner = QueryPlanner(client, shards=self.search_shards, workers=self.search_workers)
+                    found, new = 0, 0
+                    for page in planner.iter_pages(text, limit, self.query_counts.get(text)):
+                        for tweet in page:
+                            matches = self.query_matches.get(tweet.id)
+                            # Remove duplicate Tweets of the same query
+                            if found >= limit or (matches is not None and name in matches):
+                                continue
+                            found += 1
+
+                            # Tweets of earlier queries are only tagged, not hydrated again
+                            if matches is not None:
+                                matches.append(name)
+                                continue
+                            self.query_matches[tweet.id] = [name]
+                            self.tweet_ids.append(tweet.id)
+                            batch.append(tweet.id)
+                            new += 1
+
+                            if len(batch) == BATCH_SIZE:
+                                self.tweet_batches.append(batch)
+                                put(batches, batch, stop)
+                                batch = []
+
+                        if found >= limit or stop.is_set():
+                            break
+
+                    if name is not None:
+                        print(f"Query {name}: {found} Tweets, {found - new} already found by other queries")
+                    if stop.is_set():
+                        break
+
+                # Last batch < 100
+                if batch:
+                    self.tweet_batches.append(batch)
+                    put(batches, batch, stop)
+            finally:
+                for _ in range(self.hydration_workers):
+                    put(batches, None, stop)
+
+        def consume():
+            try:
+                while not stop.is_set():
+                    try:
+                        batch = batches.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    if batch is None:
+                        return
+                    for response in self.hydrate(client, batch):
+                        if response.data:
+                            with handle_lock:
+                                handle(response)
+            except Exception:
+                # Stops the search and the other workers
+                stop.set()
+                raise
+
+        with ThreadPoolExecutor(max_workers=self.hydration_workers + 1) as pool:
+            producer = pool.submit(produce)
+            consumers = [pool.submit(consume) for _ in range(self.hydration_workers)]
+            for future in [producer] + consumers:
+                future.result()
+
+        print("Number of unique Tweets:", len(self.tweet_ids))
+        if self.hydration_cache is not None:
+            self.hydration_cache.report()
+
+        return len(self.tweet_ids)
 
     def get_tweets_json(self, query: str, batch_size: int):
         """
@@ -124,91 +250,132 @@ class DownloadHandler:
         :param batch_size: Number of Tweets that are pulled from Twitter
         """
 
-        # Create client with bearer token as authentication
-        client = tweepy.Client(bearer_token=self.bearer_token)
+        # Shared client pool with all bearer tokens
+        client = self.get_client()
 
         # Check for available Tweets
         self.check_available(client, query)
 
         # If Tweets are available
         if self.available:
-            # Retrieve Tweets for given query
-            response = tweepy.Paginator(client.search_recent_tweets, query=query, max_results=100). \
-                flatten(limit=batch_size)
-
-            # Remove duplicate Tweets
-            self.remove_duplicates(response)
-            # Create batches for further processing
-            self.create_batches()
-
-            # Information that needs to be extracted from the Tweets
-            tweet_fields = ["id", "created_at", "text", "source", "public_metrics", "entities", "lang", "geo"]
-            user_fields = ["id", "name", "location", "created_at"]
-            place_fields = ["place_type", "geo", "id", "name", "country_code"]
-            expansions = ["author_id", "geo.place_id"]
-            # Get Tweets from Twitter by searching for their ID
-            for batch in self.tweet_batches:
-                response = client.get_tweets(ids=batch, tweet_fields=tweet_fields, user_fields=user_fields,
-                                             place_fields=place_fields, expansions=expansions)
-
-                # Create JSON object
-                for tweet in response.data:
-                    self.tweet_data[tweet.id] = {}
-
-                    # Tweet data object: Contains useful information about the Tweet itself
-                    tweet_data = {"Id": tweet.id, "Created_At": tweet.created_at,
-                                  "Text": tweet.text.strip().replace("\n", " "), "Tweet_Source": tweet.source,
-                                  "Retweet_Count": tweet.public_metrics["retweet_count"],
-                                  "Reply_Count": tweet.public_metrics["reply_count"],
-                                  "Like_Count": tweet.public_metrics["like_count"],
-                                  "Quote_Count": tweet.public_metrics["quote_count"], "Language": tweet.lang}
-                    self.tweet_data[tweet.id]["Data"] = tweet_data
-
-                    # Tweet user object: Contains useful information about the user that posted the Tweet
-                    tweet_user = {}
-                    for user in response.includes["users"]:
-                        if tweet.author_id == user.id:
-                            tweet_user["Id"] = user.id
-                            tweet_user["Name"] = user.name
-                            tweet_user["Location"] = user.location
-                            tweet_user["Created_At"] = user.created_at
-                    self.tweet_data[tweet.id]["User"] = tweet_user
-
-                    # Tweet place object: Contains useful information about the location the Tweet was posted on
-                    tweet_place = {}
-                    if tweet.geo:
-                        for place in response.includes["places"]:
-                            if tweet.geo["place_id"] == place.id:
-                                tweet_place["Id"] = place.id
-                                tweet_place["Name"] = place.name
-                                tweet_place["Country_Code"] = place.country_code
-                                tweet_place["Geo"] = place.geo
-                                tweet_place["Type"] = place.place_type
-                    else:
-                        tweet_place["Id"] = None
-                        tweet_place["Name"] = None
-                        tweet_place["Country_Code"] = None
-                        tweet_place["Geo"] = None
-                        tweet_place["Type"] = None
-                    self.tweet_data[tweet.id]["Geo"] = tweet_place
-
-                    # Collects the Hashtags from each Tweet
-                    if tweet.entities and "hashtags" in tweet.entities:
-                        tweet_hashtags = tweet.entities["hashtags"]
-                        self.tweet_data[tweet.id]["Hashtags"] = tweet_hashtags
-                    else:
-                        self.tweet_data[tweet.id]["Hashtags"] = None
+            # Search and hydrate the Tweets for given query, duplicates are removed on the way
+            self.search_and_hydrate(client, query, batch_size, self.add_json_response)
         else:
             print("No data can be extracted from Twitter - Try it again later...")
 
-    def save_tweets_json(self):
+    def get_tweets_json_queries(self, queries: dict, batch_size: int):
+        """
+        Method to download the recent tweets of several named queries in one run. Every Tweet is hydrated once and
+        tagged with the names of all queries it matched ("Queries").
+
+        :param queries: Dict query name -> query with keywords that are searched for
+        :param batch_size: Number of Tweets that are pulled from Twitter per query
+        """
+
+        # Shared client pool with all bearer tokens
+        client = self.get_client()
+
+        # Only queries with available Tweets are searched
+        available = {}
+        for name, query in queries.items():
+            print("Query", name)
+            self.check_available(client, query)
+            if self.available:
+                available[name] = query
+
+        self.available = bool(available)
+        if not self.available:
+            print("No data can be extracted from Twitter - Try it again later...")
+            return
+
+        # Search and hydrate the Tweets of all queries, duplicates across the queries are removed on the way
+        self.search_and_hydrate(client, available, batch_size, self.add_json_response)
+
+        for tweet_id, tweet in self.tweet_data.items():
+            tweet["Queries"] = self.query_matches.get(tweet_id, [])
+
+    def add_json_response(self, response):
+        """
+        Adds the Tweets of a hydrated response to the JSON dict.
+
+        :param response: Response of tweepy.get_tweets()
+        """
+
+        # Create JSON object
+        for tweet in response.data:
+            self.tweet_data[tweet.id] = {}
+
+            # Tweet data object: Contains useful information about the Tweet itself
+            tweet_data = {"Id": tweet.id, "Created_At": tweet.created_at,
+                          "Text": tweet.text.strip().replace("\n", " "), "Tweet_Source": tweet.source,
+                          "Retweet_Count": tweet.public_metrics["retweet_count"],
+                          "Reply_Count": tweet.public_metrics["reply_count"],
+                          "Like_Count": tweet.public_metrics["like_count"],
+                          "Quote_Count": tweet.public_metrics["quote_count"], "Language": tweet.lang}
+            self.tweet_data[tweet.id]["Data"] = tweet_data
+
+            # Tweet user object: Contains useful information about the user that posted the Tweet
+            tweet_user = {}
+            for user in response.includes["users"]:
+                if tweet.author_id == user.id:
+                    tweet_user["Id"] = user.id
+                    tweet_user["Name"] = user.name
+                    tweet_user["Location"] = user.location
+                    tweet_user["Created_At"] = user.created_at
+            self.tweet_data[tweet.id]["User"] = tweet_user
+
+            # Tweet place object: Contains useful information about the location the Tweet was posted on
+            tweet_place = {}
+            if tweet.geo:
+                for place in response.includes["places"]:
+                    if tweet.geo["place_id"] == place.id:
+                        tweet_place["Id"] = place.id
+                        tweet_place["Name"] = place.name
+                        tweet_place["Country_Code"] = place.country_code
+                        tweet_place["Geo"] = place.geo
+                        tweet_place["Type"] = place.place_type
+            else:
+                tweet_place["Id"] = None
+                tweet_place["Name"] = None
+                tweet_place["Country_Code"] = None
+                tweet_place["Geo"] = None
+                tweet_place["Type"] = None
+            self.tweet_data[tweet.id]["Geo"] = tweet_place
+
+            # Collects the Hashtags from each Tweet
+            if tweet.entities and "hashtags" in tweet.entities:
+                tweet_hashtags = tweet.entities["hashtags"]
+                self.tweet_data[tweet.id]["Hashtags"] = tweet_hashtags
+            else:
+                self.tweet_data[tweet.id]["Hashtags"] = None
+
+    def save_tweets_json(self, mode=None, file_name=None):
         """
         Method to store Tweets in a JSON file.
+
+        :param mode: Output mode of json_io (pretty, compact or ndjson)
+        :param file_name: Optional path to output file, default is a file with timestamp in Data/
         """
 
-        time = datetime.now().strftime("%d-%m-%Y_%H-%M")
-        with open('Data/tweets_' + time + '.json', 'w', encoding='utf-8') as out_file:
-            json.dump(self.tweet_data, out_file, ensure_ascii=False, indent=4, default=str)
+        if file_name is None:
+            time = datetime.now().strftime("%d-%m-%Y_%H-%M")
+            file_name = 'Data/tweets_' + time + json_io.extension(mode)
+        json_io.dump(self.tweet_data, file_name, mode)
+
+    def get_client(self):
+        """
+        Returns the client pool that is shared by all handlers with the same config file. Requests are spread over the
+        bearer tokens of all [twitter...] sections.
+
+        :return: ClientPool
+        """
+
+        from client_pool import ClientPool
+
+        if self.config_file is not None:
+            return ClientPool.shared(self.config_file)
+
+        return ClientPool({"twitter": self.bearer_token})
 
     @staticmethod
     def verbose_function(data_object, print_type: str):
@@ -253,11 +420,11 @@ class DownloadHandler:
         :param verbose: Contains information if process is printed
         :param check_available_data: Contains information if it needs to be checked for new data
         :param tweet_batch_size: Number of Tweets that are pulled from Twitter
-        :return: All pulled Tweets in csv format
+        :return: All pulled Tweets as TweetRecords
         """
 
-        # Start client
-        client = tweepy.Client(bearer_token=self.bearer_token)
+        # Shared client pool with all bearer tokens
+        client = self.get_client()
 
         if check_available_data:
             # Check how many tweets are available
@@ -270,51 +437,11 @@ class DownloadHandler:
             print("Tweets in the last 7 days:", week_count)
             exit()
 
-        # Retrieve tweets for given query
-        response_basic = tweepy.Paginator(client.search_recent_tweets, query=query, max_results=100).\
-            flatten(limit=tweet_batch_size)
-
-        # Extract tweet.ids
-        tweet_ids = []
-        for tweet in response_basic:
-            tweet_ids.append(tweet.id)
-
-        print("len before duplicate drop:", len(tweet_ids))
-        # Filter out duplicates
-        tweet_ids = list(set(tweet_ids))
-        print("len after duplicate drop:", len(tweet_ids))
-
-        # Create batches:
-        batch_list = []
-        for step in range(0, len(tweet_ids), 100):
-            batch_list.append([step, step + 100])
-
-        # replace last element, to adapt batch size (if there is at least one element)
-        if batch_list:
-
-            # Chase that one batch is left
-            if (len(tweet_ids)) % 100 != 0:
-                # Replace last element
-                batch_list.pop(-1)
-                batch_list.append([batch_list[-1][1], batch_list[-1][1] + (len(tweet_ids) % 100)])
-
-        # Only one query, which is smaller than 100 Tweets
-        else:
-            batch_list.append([0, len(tweet_ids)])
-
-        # Iterate through the tweet ids
-        tweet_data = []  # Stores data of all tweets
-        for current_batch in batch_list:
-            # Hydrating the tweet.id with additional information
-            response = client.get_tweets(ids=tweet_ids[current_batch[0]:current_batch[1]],
-                                         tweet_fields=["id", "created_at", "text", "source", "public_metrics",
-                                                       "entities", "lang", "geo"],
-                                         user_fields=["id", "name", "location", "created_at"],
-                                         place_fields=["place_type", "geo", "id", "name", "country_code"],
-                                         expansions=["author_id", "geo.place_id"])
+        tweet_data = TweetRecords()  # Stores data of all tweets in typed column buffers
 
+        def add_response(response):
             # Define dictionary with  users in list from the includes object
-            users = {u["id"]: u for u in response.includes["users"]}
+            users = {u["id"]: u for u in response.includes.get("users", [])}
 
             # There has to be at least one tweet with geo info
             # Dict out of list of places from includes object
@@ -322,66 +449,42 @@ class DownloadHandler:
             if "places" in response.includes:
                 places = {p["id"]: p for p in response.includes["places"]}
 
-            # Extract data
-            for tweet in response.data:
-
-                # Checks if hashtags data is available:
-                if tweet.entities and "hashtags" in tweet.entities:
-                    hashtag_data = tweet.entities["hashtags"]
-                else:
-                    hashtag_data = None
-
-                # Create list with data of current tweet
-                current_tweet_data = [tweet.id, tweet.created_at, tweet.text.strip().replace("\n", " "), tweet.source,
-                                      tweet.public_metrics["retweet_count"], tweet.public_metrics["reply_count"],
-                                      tweet.public_metrics["like_count"], tweet.public_metrics["quote_count"],
-                                      hashtag_data, tweet.lang]
-                # Extract tweet data
-                if verbose:
-                    self.verbose_function(data_object=tweet, print_type="general")
+            # Extract data of the whole batch column by column
+            start = len(tweet_data)
+            tweet_data.add_batch(response.data, users, places)
 
-                if users[tweet.author_id]:  # Extract user data
-                    user = users[tweet.author_id]
-
-                    # Append user data to current tweet data
-                    current_tweet_data += [user.id, user.name, user.location, user.created_at]
-
-                    if verbose:
-                        self.verbose_function(data_object=user, print_type="user")
-
-                if tweet.geo:  # Not all tweets have geo data
-                    if places[tweet.geo["place_id"]]:
-                        place = places[tweet.geo["place_id"]]
-
-                        current_tweet_data += [place.id, place.name, place.country_code, place.geo, place.place_type]
-
-                        if verbose:
-                            self.verbose_function(data_object=place, print_type="place")
-
-                # Append empty element when there is no geo data
-                else:
-                    current_tweet_data += [None, None, None, None, None]
-
-                # Format elements to list and replace potential false separators
-                current_tweet_data = list(map(lambda x: x.replace("$", "€"), list(map(str, current_tweet_data))))
+            if verbose:
+                for row, tweet in enumerate(response.data, start):
+                    self.verbose_function(data_object=tweet, print_type="general")
+                    if tweet.author_id in users:
+                        self.verbose_function(data_object=users[tweet.author_id], print_type="user")
+                    if tweet.geo and places and tweet.geo["place_id"] in places:
+                        self.verbose_function(data_object=places[tweet.geo["place_id"]], print_type="place")
+                    print([tweet_data.value(column, row) for column in tweet_data.columns])
 
-                if verbose:
-                    print(current_tweet_data)
-                # Append formatted tweet data to final list
-                tweet_data.append(current_tweet_data)
+        # Search the tweets for given query and hydrate the tweet.ids in batches of 100 while the search is running
+        self.search_and_hydrate(client, query, tweet_batch_size, add_response)
 
         return tweet_data
 
     @staticmethod
-    def save_tweets_csv(tweets, columns: list[str]):
+    def save_tweets_csv(tweets, columns=None):
         """
         Method to store input tweets in a csv file.
 
-        :param tweets: All pulled Tweets
-        :param columns: All column names for the data frame
+        :param tweets: All pulled Tweets as TweetRecords or list of rows
+        :param columns: All column names for the data frame, default are the columns of the records
         """
 
-        data_frame = pd.DataFrame(tweets, columns=columns)
-
         time = datetime.now().strftime("%d-%m-%Y_%H-%M")
-        data_frame.to_csv("Data/tweets_" + time + ".csv", sep="$")
+        file_name = "Data/tweets_" + time + ".csv"
+
+        # Typed records are only converted to text here
+        if isinstance(tweets, TweetRecords):
+            tweets.write_csv(file_name, "$", header=columns)
+            return
+
+        import pandas as pd
+
+        data_frame = pd.DataFrame(tweets, columns=columns)
+        data_frame.to_csv(file_name, sep="$")
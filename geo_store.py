@@ -0,0 +1,201 @@
+import os
+import glob
+import time
+import json_io
+
+
+class GeoTweetStore:
+    """
+    Append friendly storage for Geo Tweets. The Tweets are stored as NDJSON segments in one directory per country code:
+
+        <store>/<Country_Code>/segment_<time>.ndjson
+
+    Appending writes a new segment. If a Tweet id is stored more than once, the newest segment wins.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Constructor.
+
+        :param directory: Path to store directory, created by the first write
+        """
+
+        self.directory = directory
+
+    def check_exists(self):
+        """
+        Raises an error if the store does not exist, so a mistyped path is not read as empty store.
+        """
+
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"Geo Tweet store does not exist: {self.directory}")
+
+    @staticmethod
+    def is_store(path: str):
+        """
+        Checks if a path is a store directory. Existing directories and paths without JSON file ending are stores,
+        JSON / NDJSON files are plain Tweet files.
+
+        :param path: Path to store directory or Tweet file
+        :return: True for store directories
+        """
+
+        return os.path.isdir(path) or not path.endswith(('.json',) + json_io.NDJSON_EXTENSIONS)
+
+    @staticmethod
+    def partition_name(tweet: dict):
+        """
+        Returns the partition of a Tweet.
+
+        :param tweet: Tweet dict
+        :return: Country code, 'XX' for Tweets without country code
+        """
+
+        return tweet['Geo'].get('Country_Code') or 'XX'
+
+    def partitions(self):
+        """
+        Returns all country codes in the store.
+
+        :return: Sorted list of country codes, empty if the store was not written yet
+        """
+
+        if not os.path.isdir(self.directory):
+            return []
+
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def segments(self, country_code: str):
+        """
+        Returns the segment files of a partition, oldest first.
+
+        :param country_code: Country code
+        :return: List of segment paths
+        """
+
+        return sorted(glob.glob(os.path.join(self.directory, country_code, 'segment_*.ndjson')))
+
+    def write_segment(self, country_code: str, tweets: list):
+        """
+        Writes Tweets to a new segment file.
+
+        :param country_code: Country code
+        :param tweets: List of Tweet dicts
+        :return: Path to segment
+        """
+
+        os.makedirs(os.path.join(self.directory, country_code), exist_ok=True)
+        path = os.path.join(self.directory, country_code, f'segment_{time.time_ns()}.ndjson')
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as out_file:
+            json_io.write_lines(tweets, out_file)
+        os.replace(tmp_path, path)
+
+        return path
+
+    def append(self, tweets: dict):
+        """
+        Appends Tweets to the store. Only the new Tweets are written.
+
+        :param tweets: Dict tweet_id -> Tweet
+        :return: Number of appended Tweets
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        partitions = {}
+        for tweet in tweets.values():
+            partitions.setdefault(self.partition_name(tweet), []).append(tweet)
+
+        for country_code, partition in partitions.items():
+            self.write_segment(country_code, partition)
+
+        return len(tweets)
+
+    def iter_tweets(self, country_code=None):
+        """
+        Streams the Tweets of the store without duplicates. Segments are read newest first, so only the id set is
+        held in memory.
+
+        :param country_code: Optional country code, only this partition is read
+        :return: Generator of (tweet_id, tweet) tuples
+        """
+
+        self.check_exists()
+
+        seen = set()
+        partitions = [country_code] if country_code else self.partitions()
+        for partition in partitions:
+            for segment in reversed(self.segments(partition)):
+                for tweet in json_io.iter_ndjson(segment):
+                    tweet_id = json_io.tweet_key(tweet)
+                    if tweet_id not in seen:
+                        seen.add(tweet_id)
+                        yield tweet_id, tweet
+
+    def load(self, country_code=None):
+        """
+        Loads the Tweets of the store.
+
+        :param country_code: Optional country code
+        :return: Dict tweet_id -> Tweet
+        """
+
+        return dict(self.iter_tweets(country_code))
+
+    def compact(self):
+        """
+        Rewrites every partition to a single segment without duplicates.
+        """
+
+        for partition in self.partitions():
+            old_segments = self.segments(partition)
+            if len(old_segments) < 2:
+                continue
+
+            self.write_segment(partition, [tweet for _, tweet in self.iter_tweets(partition)])
+            for segment in old_segments:
+                os.remove(segment)
+
+    def replace(self, tweets: dict):
+        """
+        Replaces the content of the store with the given Tweets.
+
+        :param tweets: Dict tweet_id -> Tweet
+        """
+
+        self.rewrite(tweets.items())
+
+    def rewrite(self, items, chunk_size=100000):
+        """
+        Replaces the content of the store with a stream of Tweets, e.g. an enriched version of iter_tweets().
+        Tweets are written in segments of chunk_size, the old segments are removed at the end.
+
+        :param items: Iterable of (tweet_id, tweet) tuples
+        :param chunk_size: Maximal number of Tweets per written segment
+        :return: Number of written Tweets
+        """
+
+        old_segments = [segment for partition in self.partitions() for segment in self.segments(partition)]
+        os.makedirs(self.directory, exist_ok=True)
+
+        count = 0
+        partitions = {}
+        for _, tweet in items:
+            partition = partitions.setdefault(self.partition_name(tweet), [])
+            partition.append(tweet)
+            count += 1
+            if len(partition) >= chunk_size:
+                self.write_segment(self.partition_name(tweet), partition)
+                partition.clear()
+
+        for country_code, partition in partitions.items():
+            if partition:
+                self.write_segment(country_code, partition)
+
+        for segment in old_segments:
+            os.remove(segment)
+
+        return count
@@ -0,0 +1,267 @@
+import os
+import csv
+import time
+import threading
+import unicodedata
+import json_io
+from concurrent.futures import ThreadPoolExecutor
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderServiceError
+from geopy.extra.rate_limiter import RateLimiter
+
+# Result of a lookup that failed because of the service (timeout, server or connection error), it is not cached
+LOOKUP_FAILED = object()
+
+
+def normalize_place(name: str):
+    """
+    Normalizes a place name for cache and gazetteer lookups.
+
+    :param name: Place name
+    :return: Unicode normalized, case folded name with single spaces
+    """
+
+    return " ".join(unicodedata.normalize('NFC', name).casefold().split())
+
+
+class GeocodeCache:
+    """
+    Persistent cache for geocoding results. Misses are stored as negative entries that expire after a given time.
+    """
+
+    def __init__(self, cache_file: str, negative_ttl=7 * 24 * 3600):
+        """
+        Constructor.
+
+        :param cache_file: Path to cache file, created on first save
+        :param negative_ttl: Seconds until a place without result is looked up again
+        """
+
+        self.cache_file = cache_file
+        self.negative_ttl = negative_ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        if os.path.exists(cache_file):
+            self.entries = json_io.load(cache_file)
+
+    def get(self, place: str):
+        """
+        Looks up a place in the cache.
+
+        :param place: Place name
+        :return: Tuple (found, coordinates), coordinates are None for negative entries
+        """
+
+        entry = self.entries.get(normalize_place(place))
+        if entry is None:
+            return False, None
+
+        if entry['Latitude'] is None:
+            # Expired negative entries are treated as unknown
+            if time.time() - entry['Time'] > self.negative_ttl:
+                return False, None
+            return True, None
+
+        return True, {"Latitude": entry['Latitude'], "Longitude": entry['Longitude']}
+
+    def put(self, place: str, coordinates):
+        """
+        Stores a result in the cache.
+
+        :param place: Place name
+        :param coordinates: Dict with latitude / longitude or None for a miss
+        """
+
+        if coordinates is None:
+            entry = {"Latitude": None, "Longitude": None, "Time": time.time()}
+        else:
+            entry = {"Latitude": coordinates['Latitude'], "Longitude": coordinates['Longitude'], "Time": time.time()}
+
+        with self.lock:
+            self.entries[normalize_place(place)] = entry
+
+    def save(self):
+        """
+        Writes the cache file.
+        """
+
+        with self.lock:
+            json_io.dump(self.entries, self.cache_file, json_io.COMPACT)
+
+
+class Gazetteer:
+    """
+    Offline place name lookup from a local file.
+    Supported are GeoNames dumps (e.g. DE.txt) and tab separated files with the columns name, latitude, longitude.
+    """
+
+    def __init__(self, gazetteer_file: str):
+        """
+        Constructor.
+
+        :param gazetteer_file: Path to gazetteer file
+        """
+
+        self.places = {}
+        # Number of rows that could not be parsed, e.g. header rows
+        self.skipped = 0
+        self.load(gazetteer_file)
+
+    def load(self, gazetteer_file: str):
+        """
+        Reads the gazetteer file. If a name occurs more than once, the place with the highest population is kept.
+
+        :param gazetteer_file: Path to gazetteer file
+        """
+
+        population = {}
+        with open(gazetteer_file, 'r', encoding='utf-8') as in_file:
+            for row in csv.reader(in_file, delimiter='\t', quoting=csv.QUOTE_NONE):
+                try:
+                    if len(row) >= 15:
+                        # GeoNames format, only populated places
+                        if row[6] != 'P':
+                            continue
+                        names = {row[1], row[2], *row[3].split(',')}
+                        latitude, longitude, size = float(row[4]), float(row[5]), int(row[14] or 0)
+                    elif len(row) >= 3:
+                        names = {row[0]}
+                        latitude, longitude, size = float(row[1]), float(row[2]), 0
+                    else:
+                        continue
+                except ValueError:
+                    # Header rows or rows of other formats
+                    self.skipped += 1
+                    continue
+
+                for name in names:
+                    if not name:
+                        continue
+                    key = normalize_place(name)
+                    if key not in self.places or size > population[key]:
+                        self.places[key] = {"Latitude": latitude, "Longitude": longitude}
+                        population[key] = size
+
+        if self.skipped:
+            print(f"Gazetteer {gazetteer_file}: skipped {self.skipped} rows that could not be parsed")
+
+    def lookup(self, place: str):
+        """
+        Looks up a place.
+
+        :param place: Place name
+        :return: Dict with latitude / longitude or None
+        """
+
+        return self.places.get(normalize_place(place))
+
+
+class Geocoder:
+    """
+    Resolves place names with cache, local gazetteer and a shared rate limited Nominatim client.
+    """
+
+    def __init__(self, user_agent: str, cache: GeocodeCache, gazetteer=None, min_delay=1.0, max_retries=2,
+                 workers=2):
+        """
+        Constructor.
+
+        :param user_agent: User agent for Nominatim
+        :param cache: Geocoding cache
+        :param gazetteer: Optional local gazetteer
+        :param min_delay: Minimal seconds between two Nominatim requests (usage policy: 1 request per second)
+        :param max_retries: Number of retries for failed requests
+        :param workers: Number of concurrent requests
+        """
+
+        self.cache = cache
+        self.gazetteer = gazetteer
+        self.workers = workers
+        self.client = Nominatim(user_agent=user_agent, timeout=10)
+        self.remote_geocode = RateLimiter(self.client.geocode, min_delay_seconds=min_delay, max_retries=max_retries,
+                                          swallow_exceptions=False)
+        self.statistics = {"cache": 0, "gazetteer": 0, "remote": 0, "not_found": 0, "failed": 0}
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Creates a geocoder from the [nominatim] section of the config file.
+
+        :param config: Parsed config file
+        :return: Geocoder
+        """
+
+        section = config["nominatim"]
+        cache = GeocodeCache(section.get("cache_file", "Data/geocode_cache.json"),
+                             float(section.get("negative_ttl_days", 7)) * 24 * 3600)
+        gazetteer = Gazetteer(section["gazetteer"]) if section.get("gazetteer") else None
+
+        return cls(section["user_agent"], cache, gazetteer, workers=int(section.get("workers", 2)))
+
+    def remote_lookup(self, place: str, country_codes: str):
+        """
+        Looks up a place with Nominatim.
+
+        :param place: Place name
+        :param country_codes: Country codes the search is limited to
+        :return: Dict with latitude / longitude, None if the place is unknown or LOOKUP_FAILED
+        """
+
+        try:
+            location = self.remote_geocode(place, country_codes=country_codes)
+        except GeocoderServiceError as error:
+            # Timeouts and unavailable service (GeocoderTimedOut is a GeocoderServiceError) are no negative result
+            print(f"Geocoding of {place} failed: {error}")
+            return LOOKUP_FAILED
+        if location is None:
+            return None
+
+        return {"Latitude": location.latitude, "Longitude": location.longitude}
+
+    def geocode_many(self, places, country_codes='de'):
+        """
+        Resolves place names. Cached and gazetteer places are answered directly, the remaining places are requested
+        concurrently from Nominatim. The cache is saved at the end. Places whose request failed are not cached, so they
+        are requested again on the next run.
+
+        :param places: Iterable of place names
+        :param country_codes: Country codes the search is limited to
+        :return: Dict place name -> coordinates or None
+        """
+
+        results = {}
+        pending = []
+        for place in places:
+            found, coordinates = self.cache.get(place)
+            if found:
+                self.statistics["cache"] += 1
+                results[place] = coordinates
+                continue
+
+            coordinates = self.gazetteer.lookup(place) if self.gazetteer else None
+            if coordinates is not None:
+                self.statistics["gazetteer"] += 1
+                self.cache.put(place, coordinates)
+                results[place] = coordinates
+            else:
+                pending.append(place)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for place, coordinates in zip(pending, pool.map(lambda p: self.remote_lookup(p, country_codes),
+                                                                pending)):
+                    self.statistics["remote"] += 1
+                    if coordinates is LOOKUP_FAILED:
+                        self.statistics["failed"] += 1
+                        results[place] = None
+                        continue
+                    if coordinates is None:
+                        self.statistics["not_found"] += 1
+                    self.cache.put(place, coordinates)
+                    results[place] = coordinates
+
+        self.cache.save()
+        print("Geocoding:", self.statistics)
+
+        return results
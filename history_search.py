@@ -1,5 +1,5 @@
-import tweepy
 import configparser
+from tweet_records import TweetRecords, HISTORY_COLUMNS
 
 
 class HistorySearcher:
@@ -18,6 +18,7 @@ class HistorySearcher:
         self.access_token = None
         self.access_token_secret = None
         self.bearer_token = None
+        self.config_file = None
         self.api = None
         # Attributes
         self.available = False
@@ -32,6 +33,7 @@ class HistorySearcher:
         :param path_to_file: Path to config file --> contains authentication keys
         """
 
+        self.config_file = path_to_file
         config = configparser.RawConfigParser()
         config.read(path_to_file)
 
@@ -42,6 +44,21 @@ class HistorySearcher:
         self.access_token_secret = config["twitter"]["access_token_secret"]
         self.bearer_token = config["twitter"]["bearer_token"]
 
+    def get_client(self):
+        """
+        Returns the client pool that is shared by all handlers with the same config file. Requests are spread over the
+        bearer tokens of all [twitter...] sections.
+
+        :return: ClientPool
+        """
+
+        from client_pool import ClientPool
+
+        if self.config_file is not None:
+            return ClientPool.shared(self.config_file)
+
+        return ClientPool({"twitter": self.bearer_token})
+
     @staticmethod
     def verbose_function(data_object, print_type: str):
         """
@@ -85,14 +102,14 @@ class HistorySearcher:
         :param user_id_list: List with the user_id's
         :param verbose: Detailed info in terminal when true
         :param max_results: Maximum tweets puller per user, current cap 100
-        :return: Tweet_data
+        :return: Tweet_data as TweetRecords
         """
 
-        # Start client
-        client = tweepy.Client(bearer_token=self.bearer_token)
+        # Shared client pool with all bearer tokens
+        client = self.get_client()
 
         # Iterate through the tweet ids
-        tweet_data = []  # Stores data of all tweets
+        tweet_data = TweetRecords()  # Stores data of all tweets in typed column buffers
 
         for user_id in user_id_list:
             response = client.get_users_tweets(id=user_id, exclude="retweets", max_results=max_results,
@@ -119,56 +136,18 @@ class HistorySearcher:
             if "places" in response.includes:
                 places = {p["id"]: p for p in response.includes["places"]}
 
-            # Extract data
-            for tweet in response.data:
-
-                # Checks if hashtags data is available:
-                if tweet.entities and "hashtags" in tweet.entities:
-                    hashtag_data = tweet.entities["hashtags"]
-                else:
-                    hashtag_data = None
-
-                # Create list with data of current tweet
-                current_tweet_data = [tweet.id, tweet.created_at, tweet.text.strip().replace("\n", " "), tweet.source,
-                                      tweet.public_metrics["retweet_count"], tweet.public_metrics["reply_count"],
-                                      tweet.public_metrics["like_count"], tweet.public_metrics["quote_count"],
-                                      hashtag_data, tweet.lang]
-                # Extract tweet data
-                if verbose:
-                    self.verbose_function(data_object=tweet, print_type="general")
-
-                if users[tweet.author_id]:  # Extract user data
-                    user = users[tweet.author_id]
-
-                    # Append user data to current tweet data
-                    current_tweet_data += [user.id, user.name, user.location, user.created_at]
+            # Extract data of the whole response column by column
+            start = len(tweet_data)
+            tweet_data.add_batch(response.data, users, places)
 
-                    if verbose:
-                        self.verbose_function(data_object=user, print_type="user")
-
-                else:
-                    current_tweet_data += ["None", "None", "None", "None"]
-
-                if tweet.geo:  # Not all tweets have geo data
-                    if places[tweet.geo["place_id"]]:
-                        place = places[tweet.geo["place_id"]]
-
-                        current_tweet_data += [place.id, place.name, place.country_code, place.geo, place.place_type]
-
-                        if verbose:
-                            self.verbose_function(data_object=place, print_type="place")
-
-                # Append empty element when there is no geo data
-                else:
-                    current_tweet_data += [None, None, None, None, None]
-
-                # Format elements to list and replace potential false separators
-                current_tweet_data = list(map(lambda x: x.replace("$", "€"), list(map(str, current_tweet_data))))
-
-                if verbose:
-                    print(current_tweet_data)
-                # Append formatted tweet data to final list
-                tweet_data.append(current_tweet_data)
+            if verbose:
+                for row, tweet in enumerate(response.data, start):
+                    self.verbose_function(data_object=tweet, print_type="general")
+                    if users and tweet.author_id in users:
+                        self.verbose_function(data_object=users[tweet.author_id], print_type="user")
+                    if tweet.geo and places and tweet.geo["place_id"] in places:
+                        self.verbose_function(data_object=places[tweet.geo["place_id"]], print_type="place")
+                    print([tweet_data.value(column, row) for column in tweet_data.columns])
 
         print("User history tweets pulled:", len(tweet_data))
 
@@ -181,14 +160,16 @@ class HistorySearcher:
 
         :param user_id_list: List with the user_id's
         :param max_results: maximum tweets puller per user, current cap 3200
-        :return: tweet_data
+        :return: tweet_data as TweetRecords
         """
 
-        # Start client
-        client = tweepy.Client(bearer_token=self.bearer_token)
+        import tweepy
+
+        # Shared client pool with all bearer tokens
+        client = self.get_client()
 
         # Iterate through the tweet ids
-        tweet_data = []  # Stores data of all tweets
+        tweet_data = TweetRecords(HISTORY_COLUMNS)  # Stores data of all tweets in typed column buffers
         count = 0
         for user_id in user_id_list:
 
@@ -206,15 +187,9 @@ class HistorySearcher:
             # Extract data
             for tweet in paginator_response:
 
-                # Create list with data of current tweet
-                current_tweet_data = [tweet.id, tweet.created_at, tweet.text.strip().replace("\n", " "), user_id]
-
-                # Format elements to list and replace potential false separators
-                current_tweet_data = list(map(lambda x: x.replace("$", "€"), list(map(str, current_tweet_data))))
-
-                # Append formatted tweet data to final list
+                # Append tweet data with native types, the text conversion happens when the records are saved
                 # Tweet_id, tweet_Created_at, tweet_text, user_id
-                tweet_data.append(current_tweet_data)
+                tweet_data.append(tweet.id, tweet.created_at, tweet.text.strip().replace("\n", " "), user_id)
 
         print("User history tweets pulled:", len(tweet_data))
 
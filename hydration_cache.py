@@ -0,0 +1,183 @@
+import math
+import time
+import sqlite3
+import threading
+import json_io
+
+# Maximal number of ids per get_tweets request
+BATCH_SIZE = 100
+
+# Fields requested when Tweets are hydrated
+TWEET_FIELDS = ["id", "created_at", "text", "source", "public_metrics", "entities", "lang", "geo", "author_id"]
+USER_FIELDS = ["id", "name", "location", "created_at"]
+PLACE_FIELDS = ["place_type", "geo", "id", "name", "country_code"]
+EXPANSIONS = ["author_id", "geo.place_id"]
+
+
+class HydrationCache:
+    """
+    Local SQLite cache of hydrated Tweet, user and place payloads keyed by id. Entries older than max_age hours are
+    hydrated again, so public metrics stay reasonably fresh.
+    """
+
+    def __init__(self, cache_file: str, max_age=24.0):
+        """
+        Constructor.
+
+        :param cache_file: Path to SQLite file, created if it does not exist
+        :param max_age: Hours until a cached Tweet is hydrated again
+        """
+
+        self.cache_file = cache_file
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.statistics = {"hits": 0, "misses": 0, "requests": 0, "saved_requests": 0}
+
+        self.connection = sqlite3.connect(cache_file, check_same_thread=False)
+        with self.connection:
+            for table, key_type in (("tweets", "INTEGER"), ("users", "INTEGER"), ("places", "TEXT")):
+                self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                                        f"(id {key_type} PRIMARY KEY, payload TEXT, fetched REAL)")
+
+    def lookup(self, table: str, ids: list, oldest: float):
+        """
+        Reads fresh payloads of one table.
+
+        :param table: tweets, users or places
+        :param ids: Ids
+        :param oldest: Minimal fetch time (unix time)
+        :return: Dict id -> payload
+        """
+
+        payloads = {}
+        # SQLite limits the number of parameters of one statement
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self.connection.execute(f"SELECT id, payload FROM {table} WHERE fetched >= ? AND id IN "
+                                           f"({','.join('?' * len(chunk))})", [oldest] + chunk).fetchall()
+            payloads.update((key, json_io.loads(payload)) for key, payload in rows)
+
+        return payloads
+
+    def get(self, tweet_ids: list):
+        """
+        Returns the cached and fresh Tweets with their user and place.
+
+        :param tweet_ids: Tweet ids
+        :return: Dict tweet id -> (tweet payload, user payload, place payload or None)
+        """
+
+        oldest = time.time() - self.max_age * 3600
+        with self.lock:
+            tweets = self.lookup("tweets", list(tweet_ids), oldest)
+            users = self.lookup("users", list({int(tweet["author_id"]) for tweet in tweets.values()
+                                               if "author_id" in tweet}), oldest)
+            places = self.lookup("places", list({tweet["geo"]["place_id"] for tweet in tweets.values()
+                                                 if tweet.get("geo", {}).get("place_id")}), oldest)
+
+        entries = {}
+        for tweet_id, tweet in tweets.items():
+            # The API returns ids as strings
+            user = users.get(int(tweet["author_id"])) if "author_id" in tweet else None
+            place_id = tweet.get("geo", {}).get("place_id")
+            # A Tweet is only a hit if its user and place are cached as well
+            if user is None or (place_id and place_id not in places):
+                continue
+            entries[tweet_id] = (tweet, user, places.get(place_id))
+
+        return entries
+
+    def put(self, response):
+        """
+        Stores the Tweets, users and places of a get_tweets response.
+
+        :param response: tweepy response
+        """
+
+        now = time.time()
+        tweets = [(tweet.id, json_io.dumps(tweet.data), now) for tweet in response.data or []]
+        users = [(user.id, json_io.dumps(user.data), now) for user in response.includes.get("users", [])]
+        places = [(place.id, json_io.dumps(place.data), now) for place in response.includes.get("places", [])]
+
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO tweets VALUES (?, ?, ?)", tweets)
+            self.connection.executemany("INSERT OR REPLACE INTO users VALUES (?, ?, ?)", users)
+            self.connection.executemany("INSERT OR REPLACE INTO places VALUES (?, ?, ?)", places)
+
+    @staticmethod
+    def response(entries: list):
+        """
+        Builds a response object like tweepy.Client.get_tweets from cached payloads.
+
+        :param entries: List of (tweet payload, user payload, place payload or None)
+        :return: tweepy.Response
+        """
+
+        import tweepy
+
+        users = {user["id"]: user for _, user, _ in entries}
+        places = {place["id"]: place for _, _, place in entries if place is not None}
+
+        includes = {"users": [tweepy.User(user) for user in users.values()]}
+        if places:
+            includes["places"] = [tweepy.Place(place) for place in places.values()]
+
+        return tweepy.Response([tweepy.Tweet(tweet) for tweet, _, _ in entries], includes, [], {})
+
+    def hydrate(self, client, tweet_ids: list):
+        """
+        Hydrates Tweets. Cached Tweets are served from the cache, only the misses are requested in batches of 100.
+
+        :param client: tweepy client
+        :param tweet_ids: Tweet ids
+        :return: Generator of tweepy responses with at most 100 Tweets
+        """
+
+        tweet_ids = list(tweet_ids)
+        cached = self.get(tweet_ids)
+        misses = [tweet_id for tweet_id in tweet_ids if tweet_id not in cached]
+        requests = math.ceil(len(misses) / BATCH_SIZE)
+
+        with self.lock:
+            self.statistics["hits"] += len(cached)
+            self.statistics["misses"] += len(misses)
+            self.statistics["requests"] += requests
+            self.statistics["saved_requests"] += math.ceil(len(tweet_ids) / BATCH_SIZE) - requests
+
+        hits = [cached[tweet_id] for tweet_id in tweet_ids if tweet_id in cached]
+        for start in range(0, len(hits), BATCH_SIZE):
+            yield self.response(hits[start:start + BATCH_SIZE])
+
+        for start in range(0, len(misses), BATCH_SIZE):
+            response = client.get_tweets(ids=misses[start:start + BATCH_SIZE], tweet_fields=TWEET_FIELDS,
+                                         user_fields=USER_FIELDS, place_fields=PLACE_FIELDS, expansions=EXPANSIONS)
+            if response.data:
+                self.put(response)
+            yield response
+
+    def hit_rate(self):
+        """
+        Returns the share of Tweets that were served from the cache.
+
+        :return: Hit rate between 0 and 1
+        """
+
+        total = self.statistics["hits"] + self.statistics["misses"]
+
+        return self.statistics["hits"] / total if total else 0.0
+
+    def report(self):
+        """
+        Prints the cache statistics of the run.
+        """
+
+        print(f"Hydration cache: {self.statistics['hits']} hits, {self.statistics['misses']} misses "
+              f"(hit rate {self.hit_rate():.1%}), {self.statistics['requests']} requests, "
+              f"{self.statistics['saved_requests']} requests saved")
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+
+        self.connection.close()
@@ -0,0 +1,349 @@
+import os
+import json
+import math
+from collections.abc import Mapping
+from datetime import date, datetime
+
+# Optional accelerated encoder / decoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Output modes
+PRETTY = 'pretty'
+COMPACT = 'compact'
+NDJSON = 'ndjson'
+
+# Mode used if no mode is handed over
+DEFAULT_MODE = COMPACT
+
+# File endings that are read line by line
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+
+def default(obj):
+    """
+    Converts objects that are not JSON serializable.
+
+    :param obj: Object that should be serialized
+    :return: Serializable representation
+    """
+
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, set):
+        return list(obj)
+    # Views of a TweetTable
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    # Numpy scalars
+    if hasattr(obj, 'item'):
+        return obj.item()
+
+    return str(obj)
+
+
+def sanitize(obj):
+    """
+    Replaces NaN and infinite floats with None, the way orjson writes them, so both backends write the same JSON.
+
+    :param obj: Object that should be serialized
+    :return: Object without non-finite floats
+    """
+
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, Mapping):
+        return {key: sanitize(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [sanitize(value) for value in obj]
+
+    return obj
+
+
+def extension(mode=None):
+    """
+    Returns the file ending fitting to the output mode.
+
+    :param mode: Output mode
+    :return: File ending
+    """
+
+    return '.ndjson' if (mode or DEFAULT_MODE) == NDJSON else '.json'
+
+
+def is_ndjson(path: str):
+    """
+    Checks if a file is stored as NDJSON.
+
+    :param path: Path to file
+    :return: True for NDJSON files
+    """
+
+    return path.endswith(NDJSON_EXTENSIONS)
+
+
+def tweet_key(tweet: dict):
+    """
+    Returns the key of a Tweet object in a JSON Tweet dict.
+
+    :param tweet: Tweet dict
+    :return: Tweet id as string
+    """
+
+    return str(tweet['Data']['Id'])
+
+
+def dumps(obj, mode=None):
+    """
+    Serializes an object to a JSON string.
+
+    :param obj: Object
+    :param mode: PRETTY or COMPACT
+    :return: JSON string
+    """
+
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if (mode or DEFAULT_MODE) == PRETTY:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option).decode('utf-8')
+
+    # Same layout as orjson: two spaces indent in pretty mode, NaN is written as null
+    options = {'indent': 2} if (mode or DEFAULT_MODE) == PRETTY else {'separators': (',', ':')}
+    try:
+        return json.dumps(obj, ensure_ascii=False, allow_nan=False, default=default, **options)
+    except ValueError:
+        return json.dumps(sanitize(obj), ensure_ascii=False, allow_nan=False, default=default, **options)
+
+
+def loads(text):
+    """
+    Parses a JSON string.
+
+    :param text: JSON string or bytes
+    :return: Parsed object
+    """
+
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson rejects NaN, which older files written by json.dump contain for empty CSV cells
+            pass
+
+    return json.loads(text)
+
+
+def dump(obj, path: str, mode=None):
+    """
+    Writes an object to a file. In NDJSON mode the values of a dict (or the items of a list) are written one per line.
+    The file is written to a temporary file first and replaced at the end.
+
+    :param obj: Object
+    :param path: Path to output file
+    :param mode: PRETTY, COMPACT or NDJSON
+    """
+
+    from tweet_table import TweetTable
+
+    # Columnar tables are written Tweet by Tweet
+    if isinstance(obj, TweetTable):
+        dump_items(obj.records(), path, mode)
+        return
+
+    mode = mode or DEFAULT_MODE
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'w', encoding='utf-8') as out_file:
+        if mode == NDJSON:
+            records = obj.values() if isinstance(obj, dict) else obj
+            write_lines(records, out_file)
+        else:
+            out_file.write(dumps(obj, mode))
+
+    os.replace(tmp_path, path)
+
+
+def dump_items(items, path: str, mode=None):
+    """
+    Writes (key, value) pairs one after another, so the object never has to be held in memory. The file has the same
+    layout as dump() of a dict with these items. In NDJSON mode only the values are written.
+
+    :param items: Iterable of (key, value) tuples
+    :param path: Path to output file
+    :param mode: PRETTY, COMPACT or NDJSON
+    :return: Number of written items
+    """
+
+    mode = mode or DEFAULT_MODE
+    tmp_path = path + '.tmp'
+
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as out_file:
+        if mode == NDJSON:
+            count = write_lines((value for _, value in items), out_file)
+        elif mode == PRETTY:
+            # Every item is indented by one level like the members of a pretty printed dict
+            out_file.write('{')
+            for key, value in items:
+                out_file.write((',\n  ' if count else '\n  ') + dumps(str(key), mode) + ': ' +
+                               dumps(value, mode).replace('\n', '\n  '))
+                count += 1
+            out_file.write('\n}' if count else '}')
+        else:
+            out_file.write('{')
+            for key, value in items:
+                out_file.write((',' if count else '') + dumps(str(key), mode) + ':' + dumps(value, mode))
+                count += 1
+            out_file.write('}')
+
+    os.replace(tmp_path, path)
+
+    return count
+
+
+def write_lines(records, out_file):
+    """
+    Writes records as NDJSON lines to an open file.
+
+    :param records: Iterable of records
+    :param out_file: Opened text file
+    :return: Number of written lines
+    """
+
+    count = 0
+    for record in records:
+        out_file.write(dumps(record, COMPACT))
+        out_file.write('\n')
+        count += 1
+
+    return count
+
+
+def load(path: str, key=tweet_key):
+    """
+    Reads a JSON or NDJSON file. NDJSON lines are collected in a dict keyed by the key function.
+
+    :param path: Path to file
+    :param key: Function that returns the key of a NDJSON record
+    :return: Parsed object
+    """
+
+    if is_ndjson(path):
+        return {key(record): record for record in iter_ndjson(path)}
+
+    with open(path, 'rb') as in_file:
+        return loads(in_file.read())
+
+
+def iter_ndjson(path: str):
+    """
+    Streams the records of a NDJSON file.
+
+    :param path: Path to NDJSON file
+    :return: Generator of records
+    """
+
+    with open(path, 'r', encoding='utf-8') as in_file:
+        for line in in_file:
+            if line.strip():
+                yield loads(line)
+
+
+def iter_object(path: str, chunk_size=1 << 20):
+    """
+    Streams the key value pairs of a JSON object file without loading the whole file.
+
+    :param path: Path to JSON file with one top level object
+    :param chunk_size: Number of characters read at once
+    :return: Generator of (key, value) tuples
+    """
+
+    decoder = json.JSONDecoder()
+
+    with open(path, 'r', encoding='utf-8') as in_file:
+        buffer = ''
+        position = 0
+        eof = False
+
+        def next_token(pos):
+            # Skips whitespace and returns the position of the next character
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                pos += 1
+            return pos
+
+        def decode(pos):
+            # Decodes one value, values reaching the end of the buffer might be truncated
+            value, end = decoder.raw_decode(buffer, pos)
+            if end >= len(buffer) and not eof:
+                raise ValueError
+            return value, end
+
+        state = 'start'
+        while True:
+            position = next_token(position)
+
+            # Refill buffer if it is exhausted
+            if position >= len(buffer) and not eof:
+                chunk = in_file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            if state == 'start':
+                if position >= len(buffer):
+                    return
+                if buffer[position] != '{':
+                    raise json.JSONDecodeError('Expecting object', buffer, position)
+                position += 1
+                state = 'key'
+            elif state == 'key':
+                if position < len(buffer) and buffer[position] == '}':
+                    return
+                try:
+                    key, end = decode(position)
+                    end = next_token(end)
+                    if end >= len(buffer) or buffer[end] != ':':
+                        raise ValueError
+                    value, end = decode(next_token(end + 1))
+                except ValueError:
+                    # Truncated value --> read next chunk and retry
+                    if eof:
+                        raise
+                    chunk = in_file.read(chunk_size)
+                    eof = not chunk
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+
+                yield key, value
+
+                position = next_token(end)
+                state = 'separator'
+            elif state == 'separator':
+                if position >= len(buffer):
+                    raise json.JSONDecodeError('Unterminated object', buffer, position)
+                if buffer[position] == ',':
+                    position += 1
+                    state = 'key'
+                elif buffer[position] == '}':
+                    return
+                else:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, position)
+
+
+def iter_tweets(path: str):
+    """
+    Streams the Tweets of a JSON or NDJSON Tweet file.
+
+    :param path: Path to Tweet file
+    :return: Generator of (tweet_id, tweet) tuples
+    """
+
+    if is_ndjson(path):
+        return ((tweet_key(tweet), tweet) for tweet in iter_ndjson(path))
+
+    return iter_object(path)
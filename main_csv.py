@@ -73,6 +73,9 @@ def main():
     # Extract relevant user ids for history search
     tweet_processing.extract_individual_user_ids()
 
+    # Add the tweets to the route cube, the interesting routes are taken from the cube
+    tweet_processing.update_route_cube("Data/route_cube", min_route_count=5)
+
     # Determine overrepresented city combinations
     tweet_processing.check_overrepresented_city_combination()
     #"""
@@ -1,8 +1,15 @@
+import os
+import argparse
+import configparser
+import json_io
+from datetime import date
+from pipeline import Pipeline, Stage
 from download_handler import DownloadHandler
 from sentiment_analysis import SentimentAnalyser
 from user_analysis import Database
 from tweet_mapper import TweetMapper
 from dataset_handler import DatasetHandler
+from data_processing import DataProcessing
 
 
 def download_tweets_json(config_file: str, query: str):
@@ -13,8 +20,16 @@ def download_tweets_json(config_file: str, query: str):
     download_handler.save_tweets_json()
 
 
-def sentiment_analysis(tweet_data: str):
-    analyser = SentimentAnalyser(tweet_data)
+def download_tweets_json_queries(config_file: str, queries: dict):
+    download_handler = DownloadHandler()
+    download_handler.read_config_file(config_file)
+    download_handler.create_api_interface()
+    download_handler.get_tweets_json_queries(queries, 12000)
+    download_handler.save_tweets_json()
+
+
+def sentiment_analysis(tweet_data: str, lexicon_file=None):
+    analyser = SentimentAnalyser(tweet_data, lexicon_file)
     analyser.sentiment_analysis()
     analyser.save_json()
 
@@ -26,6 +41,14 @@ def create_user_database(database_file: str, new_data: str):
     database.save_database()
 
 
+def update_route_cube(storage_dir: str, city_keys: str, cube_directory: str, sentiment_file=None, city_memo=None):
+    processing = DataProcessing()
+    processing.load_city_key_data(city_keys)
+    processing.create_df_with_storage_data(storage_dir)
+    processing.create_short_tweet_df(city_memo)
+    processing.update_route_cube(cube_directory, sentiment_file=sentiment_file)
+
+
 def transform_csv(csv_file: str, separator: str, file_name: str):
     handler = DatasetHandler()
     handler.get_csv(csv_file, separator)
@@ -33,11 +56,14 @@ def transform_csv(csv_file: str, separator: str, file_name: str):
     handler.save_json(file_name)
 
 
-def merge_json(json1: str, json2: str, file_name: str):
+def transform_csv_ndjson(csv_file: str, separator: str, file_name: str):
     handler = DatasetHandler()
-    handler.append_json(json1, json2, file_name)
+    handler.csv_to_ndjson(csv_file, separator, file_name)
+
 
-    handler.remove_none(file_name + ".json")
+def merge_json(json_files: list, file_name: str):
+    handler = DatasetHandler()
+    handler.merge_json(json_files, file_name)
 
 
 def extract_geo_tweets(mapper: TweetMapper, locations: str):
@@ -47,58 +73,186 @@ def extract_geo_tweets(mapper: TweetMapper, locations: str):
 
 def add_locations(mapper: TweetMapper, locations: str):
     mapper.get_locations(locations)
-    mapper.add_locations()
+    unresolved = mapper.add_locations()
 
+    # Geocode only the places that are still missing and join again if new places were resolved
+    if unresolved:
+        resolved = mapper.update_locations(unresolved)
+        mapper.save_locations(locations)
+        if resolved:
+            mapper.add_locations()
 
-def plot_distribution(mapper: TweetMapper, geo_tweets: str, file_name: str):
-    mapper.plot_geo_data(geo_tweets, file_name)
 
+def plot_geo_file(geo_tweets: str, file_name: str):
+    import matplotlib
 
-def create_relationship_graph(mapper: TweetMapper, csv_file: str, separator: str):
-    mapper.plot_new_data(csv_file, separator)
+    # Pipeline stages run in worker threads, the figure is only written to a file
+    matplotlib.use("Agg")
+    TweetMapper.plot_geo_data(geo_tweets, file_name)
 
 
-def main():
-    """
-    config_file = "Data/config.ini"
+def plot_distribution(mapper: TweetMapper, geo_tweets: str, file_name: str):
+    mapper.plot_geo_data(geo_tweets, file_name)
 
-    query_nine_euro = "(#9EuroTicket OR #9EuroTickets OR #NeunEuroTicket OR #NeunEuroTickets OR neun-euro-ticket OR" \
-                      " neun-euro-tickets OR (9 euro ticket) OR (9 euro tickets)) (lang:en OR lang:de) -RT"
-    # query_db_general = "((@DB_Bahn OR @DB_Info OR @DB_Presse OR (deutsche bahn) OR #DeutscheBahn OR #DBNavigator) " \
-    #                    "-(RT OR #9EuroTicket OR #9EuroTickets OR #NeunEuroTicket OR #NeunEuroTickets OR #9euro OR " \
-    #                    "neun-euro OR (9 euro) OR 9€)) (lang:de OR lang:en)"
-    download_tweets_json(config_file, query_nine_euro)
 
-    tweet_data = "/Data/Nine/tweets_15-06_21-07_nine.json"
-    sentiment_analysis(tweet_data)
+def corridor_sentiment(mapper: TweetMapper, geo_tweets: str, stations: str, lines: str, file_name: str):
+    from rail_network import RailNetwork
 
-    database_file = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/Nine/geo_database_nine.json"
-    new_data = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/Nine/geo_tweets_15-06_21-07_nine.json"
-    create_user_database(database_file, new_data)
+    network = RailNetwork(stations, lines)
+    points = mapper.load_geo_points(geo_tweets)
+    corridors = network.corridor_sentiment(points['Latitude'], points['Longitude'], points['Sentiment'])
+    corridors.to_csv(file_name + ".csv", sep="$")
 
-    csv = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/15.06.2022/tweets_15-06-2022_21-48-general.csv"
-    transform_csv(csv, '$', "tweets_06-07-2022_nine")
 
-    json1 = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/tweets_15-06-2022_general.json"
-    json2 = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/tweets_22-06-2022_general.json"
-    merge_json(json1, json2, "json1_json2_combined")
+def plot_snapshots(geo_tweets: str, csv_file: str, separator: str, file_name: str, freq: str):
+    from snapshots import MapSnapshots, GraphSnapshots
 
-    json_file = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/tweets_15-06-2022_general.json"
-    geo_file = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/Nine/geo_tweets_15-06_21-07_nine.json"
+    MapSnapshots(freq).render(geo_tweets, file_name + "_map")
+    GraphSnapshots(freq).save(csv_file, separator, file_name + "_graph")
 
-    new_mapper = TweetMapper(json_file, geo_file)
 
-    locations = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/location_database.json"
-    extract_geo_tweets(new_mapper, locations)
+def create_relationship_graph(mapper: TweetMapper, csv_file: str, separator: str):
+    mapper.plot_new_data(csv_file, separator)
 
-    add_locations(new_mapper, locations)
 
-    plot_distribution(new_mapper, geo_file, "germany_distribution")
+def build_pipeline(config_file: str, workers: int):
+    """
+    Creates the pipeline from the [pipeline] section of a config file (see pipeline_example.ini).
 
-    csv_file = "/home/ubuntu/Projects/DeutscheBahnDataChallanges/Data/9euro-annotation.csv"
-    create_relationship_graph(new_mapper, csv_file, '$')
+    :param config_file: Path to pipeline config file
+    :param workers: Number of stages that run at the same time
+    :return: Pipeline
     """
 
+    config = configparser.RawConfigParser()
+    config.read(config_file)
+    section = config["pipeline"]
+
+    def paths(key):
+        return [path.strip() for path in section.get(key, "").split(",") if path.strip()]
+
+    twitter_config = section["twitter_config"]
+    merged_file = section["merged_file"]
+    sentiment_file = section["sentiment_file"]
+    geo_tweets = section["geo_tweets"]
+    geo_enriched = section["geo_enriched"]
+    locations = section["locations"]
+
+    pipeline = Pipeline(section.get("cache_file", ".pipeline_cache.json"), workers)
+
+    # Download: Cached per day, a new day triggers a new download
+    # Several named queries in a [queries] section are downloaded in one run and share the hydration
+    tweet_files = paths("json_files")
+    queries = dict(config["queries"]) if config.has_section("queries") else {}
+    if section.get("query") or queries:
+        download_file = section["download_file"]
+        batch_size = int(section.get("batch_size", 12000))
+
+        def download():
+            download_handler = DownloadHandler()
+            download_handler.read_config_file(twitter_config)
+            download_handler.create_api_interface()
+            if queries:
+                download_handler.get_tweets_json_queries(queries, batch_size)
+            else:
+                download_handler.get_tweets_json(section["query"], batch_size)
+            download_handler.save_tweets_json(file_name=download_file)
+
+        pipeline.add(Stage("download", download, [twitter_config], [download_file],
+                           {"query": queries or section["query"], "batch_size": batch_size,
+                            "day": str(date.today())}))
+        tweet_files.append(download_file)
+
+    # Convert: One stage per csv file
+    for csv_file in paths("csv_files"):
+        file_name = os.path.splitext(csv_file)[0]
+        pipeline.add(Stage("convert_" + os.path.basename(file_name),
+                           lambda csv_file=csv_file, file_name=file_name: transform_csv(csv_file, '$', file_name),
+                           [csv_file], [file_name + ".json"]))
+        tweet_files.append(file_name + ".json")
+
+    def merge():
+        DatasetHandler().merge_json_file(tweet_files, merged_file)
+
+    # Optional polarity lexicon instead of TextBlob
+    lexicon_file = section.get("sentiment_lexicon")
+
+    def sentiment():
+        analyser = SentimentAnalyser(merged_file, lexicon_file)
+        analyser.sentiment_analysis()
+        analyser.save_json(sentiment_file)
+
+    def extract_geo():
+        mapper = TweetMapper(twitter_config)
+        mapper.tweet_data = mapper.get_tweets(sentiment_file)
+        mapper.extract_geo()
+        json_io.dump(mapper.geo_tweets, geo_tweets)
+
+    # The locations database is read and extended, it is also an input, so a replaced file makes the stage stale
+    def geocode():
+        mapper = TweetMapper(twitter_config, geo_tweets_json_file=geo_tweets)
+        if os.path.exists(locations):
+            mapper.get_locations(locations)
+        mapper.update_locations()
+        mapper.save_locations(locations)
+
+    def enrich():
+        mapper = TweetMapper(twitter_config, geo_tweets_json_file=geo_tweets)
+        mapper.get_locations(locations)
+        mapper.add_locations(geo_enriched)
+
+    pipeline.add(Stage("merge", merge, tweet_files, [merged_file]))
+    pipeline.add(Stage("sentiment", sentiment, [merged_file] + ([lexicon_file] if lexicon_file else []),
+                       [sentiment_file]))
+    pipeline.add(Stage("geo", extract_geo, [sentiment_file], [geo_tweets]))
+    pipeline.add(Stage("geocode", geocode, [geo_tweets, locations], [locations]))
+    pipeline.add(Stage("enrich", enrich, [geo_tweets, locations], [geo_enriched]))
+
+    if section.get("database"):
+        pipeline.add(Stage("user_db", lambda: create_user_database(section["database"], geo_enriched),
+                           [geo_enriched], [section["database"]]))
+
+    # Route cube: The storage csv files are annotated with city keys, the cube skips Tweets it already counted. The
+    # city key memo is only a cache of the extraction and no input, it does not change the result
+    if section.get("storage_dir") and section.get("city_keys") and section.get("route_cube"):
+        pipeline.add(Stage("route_cube", lambda: update_route_cube(section["storage_dir"], section["city_keys"],
+                                                                   section["route_cube"], sentiment_file,
+                                                                   section.get("city_memo")),
+                           [section["storage_dir"], section["city_keys"], sentiment_file], [section["route_cube"]]))
+
+    if section.get("map_file"):
+        pipeline.add(Stage("plot", lambda: plot_geo_file(geo_enriched, section["map_file"]),
+                           [geo_enriched], [section["map_file"] + ".pdf"]))
+
+    if section.get("annotation_csv"):
+        graph_file = section.get("graph_file", "track_impact")
+        pipeline.add(Stage("graph", lambda: TweetMapper(twitter_config).plot_new_data(section["annotation_csv"], '$',
+                                                                                      file_name=graph_file),
+                           [section["annotation_csv"]], [graph_file + ".html"]))
+
+    return pipeline
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the Twitter pipeline, only stale stages are executed.")
+    parser.add_argument("config", help="Pipeline config file with a [pipeline] section")
+    parser.add_argument("stages", nargs="*", help="Stages to run (including their upstream stages), default all")
+    parser.add_argument("--force", action="store_true", help="Run the stages even if they are up to date")
+    parser.add_argument("--workers", type=int, default=4, help="Number of stages that run at the same time")
+    parser.add_argument("--list", action="store_true", help="List the stages and their status")
+    args = parser.parse_args()
+
+    pipeline = build_pipeline(args.config, args.workers)
+
+    if args.list:
+        for name, stage in pipeline.stages.items():
+            print(f"{name:<24}{'stale' if pipeline.is_stale(stage) else 'up to date':<12}"
+                  f"{', '.join(stage.inputs)} -> {', '.join(stage.outputs)}")
+        return
+
+    executed = pipeline.run(args.stages or None, args.force)
+    print("Executed stages:", executed)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,221 @@
+import os
+import hashlib
+import threading
+import json_io
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """
+    One step of the pipeline with declared input and output files.
+    """
+
+    def __init__(self, name: str, function, inputs: list, outputs: list, params=None):
+        """
+        Constructor.
+
+        :param name: Stage name
+        :param function: Function that is called without arguments
+        :param inputs: Paths of files / directories that are read
+        :param outputs: Paths of files / directories that are written
+        :param params: Dict with parameters that influence the result (part of the cache key)
+        """
+
+        self.name = name
+        self.function = function
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+
+
+class Pipeline:
+    """
+    Runs stages as DAG. A stage depends on the stages that write its inputs. Results are cached by the content hash
+    of the inputs and the parameters, so only stale stages are executed. Independent stages run in parallel.
+    """
+
+    def __init__(self, cache_file='.pipeline_cache.json', workers=4):
+        """
+        Constructor.
+
+        :param cache_file: Path to cache file with the stage and file hashes
+        :param workers: Number of stages that run at the same time
+        """
+
+        self.cache_file = cache_file
+        self.workers = workers
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.cache = {"stages": {}, "files": {}}
+
+        if os.path.exists(cache_file):
+            self.cache = json_io.load(cache_file)
+
+    def add(self, stage: Stage):
+        """
+        Adds a stage.
+
+        :param stage: Stage
+        """
+
+        self.stages[stage.name] = stage
+
+    def dependencies(self, stage: Stage):
+        """
+        Returns the names of the stages that write the inputs of a stage.
+
+        :param stage: Stage
+        :return: Set of stage names
+        """
+
+        return {other.name for other in self.stages.values()
+                if other is not stage and set(other.outputs) & set(stage.inputs)}
+
+    def file_hash(self, path: str):
+        """
+        Returns the content hash of a file or directory. Hashes are reused while size and modification time of a file
+        are unchanged.
+
+        :param path: Path to file or directory
+        :return: Hex digest, None if the path does not exist
+        """
+
+        if os.path.isdir(path):
+            digest = hashlib.sha256()
+            for root, _, files in sorted(os.walk(path)):
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+                    digest.update(self.file_hash(file_path).encode('utf-8'))
+            return digest.hexdigest()
+
+        if not os.path.exists(path):
+            return None
+
+        status = os.stat(path)
+        key = f"{status.st_size}:{status.st_mtime_ns}"
+        with self.lock:
+            cached = self.cache["files"].get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as in_file:
+            for block in iter(lambda: in_file.read(1 << 20), b''):
+                digest.update(block)
+
+        with self.lock:
+            self.cache["files"][path] = [key, digest.hexdigest()]
+
+        return digest.hexdigest()
+
+    def stage_hash(self, stage: Stage):
+        """
+        Returns the cache key of a stage.
+
+        :param stage: Stage
+        :return: Hex digest over parameters and input contents
+        """
+
+        digest = hashlib.sha256(json_io.dumps({"params": stage.params}).encode('utf-8'))
+        for path in stage.inputs:
+            digest.update(path.encode('utf-8'))
+            digest.update(str(self.file_hash(path)).encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def is_stale(self, stage: Stage):
+        """
+        Checks if a stage has to be executed.
+
+        :param stage: Stage
+        :return: True if an output is missing or inputs / parameters changed
+        """
+
+        if not all(os.path.exists(path) for path in stage.outputs):
+            return True
+
+        with self.lock:
+            cached = self.cache["stages"].get(stage.name)
+
+        return cached != self.stage_hash(stage)
+
+    def selection(self, targets):
+        """
+        Returns the target stages and all their upstream stages.
+
+        :param targets: Stage names, None selects all stages
+        :return: Set of stage names
+        """
+
+        if targets is None:
+            return set(self.stages)
+
+        selected = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.dependencies(self.stages[name]))
+
+        return selected
+
+    def execute(self, stage: Stage, force: bool):
+        """
+        Executes a stage if it is stale.
+
+        :param stage: Stage
+        :param force: Execute even if the stage is up to date
+        :return: True if the stage was executed
+        """
+
+        if not force and not self.is_stale(stage):
+            print(f"[{stage.name}] up to date")
+            return False
+
+        print(f"[{stage.name}] running")
+        stage.function()
+
+        stage_hash = self.stage_hash(stage)
+        with self.lock:
+            self.cache["stages"][stage.name] = stage_hash
+
+        return True
+
+    def run(self, targets=None, force=False):
+        """
+        Runs the selected stages in dependency order. A stage is started as soon as all its upstream stages finished.
+
+        :param targets: Stage names, None runs all stages
+        :param force: Execute all selected stages even if they are up to date
+        :return: List of executed stage names
+        """
+
+        selected = self.selection(targets)
+        remaining = {name: self.dependencies(self.stages[name]) & selected for name in selected}
+        executed = []
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                running = {}
+                while remaining or running:
+                    # Start all stages without unfinished dependencies
+                    for name in [name for name, dependencies in remaining.items() if not dependencies]:
+                        del remaining[name]
+                        running[pool.submit(self.execute, self.stages[name], force)] = name
+
+                    if not running:
+                        raise ValueError(f"Cyclic dependencies between stages: {sorted(remaining)}")
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        if future.result():
+                            executed.append(name)
+                        for dependencies in remaining.values():
+                            dependencies.discard(name)
+        finally:
+            json_io.dump(self.cache, self.cache_file, json_io.COMPACT)
+
+        return executed
@@ -0,0 +1,267 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximal query length of the recent search endpoint (Essential access)
+MAX_QUERY_LENGTH = 512
+
+
+def split_top_level(text: str, separator: str):
+    """
+    Splits a string at a separator that is not inside brackets or quotes.
+
+    :param text: Query text
+    :param separator: Separator, e.g. " OR " or " "
+    :return: List of parts
+    """
+
+    parts, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(text):
+        char = text[i]
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and text.startswith(separator, i):
+            parts.append(text[start:i])
+            i += len(separator)
+            start = i
+            continue
+        i += 1
+    parts.append(text[start:])
+
+    return [part.strip() for part in parts if part.strip()]
+
+
+def split_query(query: str, max_length=MAX_QUERY_LENGTH):
+    """
+    Splits a query that is too long into several queries. The longest OR group (e.g. the keyword list of
+    query_nine_euro) is divided into term groups, all other parts (language filter, -RT) are kept in every query.
+    The union of the results equals the result of the original query.
+
+    :param query: Search query
+    :param max_length: Maximal query length
+    :return: List of queries
+    """
+
+    if len(query) <= max_length:
+        return [query]
+
+    # Find the top-level clause with the most OR terms
+    clauses = split_top_level(query, " ")
+    terms_of = [split_top_level(clause[1:-1] if clause.startswith('(') and clause.endswith(')') else clause, " OR ")
+                for clause in clauses]
+    group = max(range(len(clauses)), key=lambda index: len(terms_of[index]))
+    terms = terms_of[group]
+    if len(terms) < 2:
+        raise ValueError(f"Query is longer than {max_length} characters and has no OR group to split: {query}")
+
+    def build(chunk):
+        group_clause = chunk[0] if len(chunk) == 1 and chunk[0].startswith('(') else "(" + " OR ".join(chunk) + ")"
+        return " ".join(clauses[:group] + [group_clause] + clauses[group + 1:])
+
+    queries, chunk = [], []
+    for term in terms:
+        if chunk and len(build(chunk + [term])) > max_length:
+            queries.append(build(chunk))
+            chunk = []
+        chunk.append(term)
+    queries.append(build(chunk))
+
+    for part in queries:
+        if len(part) > max_length:
+            raise ValueError(f"Query term does not fit into {max_length} characters: {part}")
+
+    return queries
+
+
+def time_shards(counts: list, shards: int):
+    """
+    Splits the count histogram into time windows with about the same number of Tweets.
+
+    :param counts: Count buckets with start, end and tweet_count (data of get_recent_tweets_count)
+    :param shards: Number of windows
+    :return: List of (start_time, end_time, tweet_count), the first start and the last end are None (full window)
+    """
+
+    total = sum(bucket["tweet_count"] for bucket in counts)
+    if total == 0:
+        return []
+
+    windows, start, count, cumulative = [], None, 0, 0
+    for index, bucket in enumerate(counts):
+        count += bucket["tweet_count"]
+        cumulative += bucket["tweet_count"]
+        # Cut as soon as the running total reaches the next share of the total
+        last = index == len(counts) - 1
+        if len(windows) < shards - 1 and not last and cumulative >= total * (len(windows) + 1) / shards:
+            windows.append((start, bucket["end"], count))
+            start, count = bucket["end"], 0
+
+    windows.append((start, None, count))
+
+    return [window for window in windows if window[2] > 0]
+
+
+def newest_windows(windows: list, limit: int):
+    """
+    Selects the newest time windows whose Tweets cover the limit, like a search that returns the newest Tweets first.
+    The oldest selected window is cut to the rest of the limit, the open newest window may contain Tweets that were
+    posted after the count.
+
+    :param windows: List of (start_time, end_time, tweet_count) of time_shards, oldest first
+    :param limit: Maximal number of Tweets
+    :return: List of (start_time, end_time, tweet_count, window limit), newest first
+    """
+
+    selected, remaining = [], limit
+    for start, end, count in reversed(windows):
+        if remaining <= 0:
+            break
+        selected.append((start, end, count, remaining if end is None else min(count, remaining)))
+        remaining -= count
+
+    return selected
+
+
+class QueryPlanner:
+    """
+    Plans a recent search as set of shards (term group x time window) from the count histogram and runs the shards
+    in parallel. Like a single paginated search, a limit keeps the newest Tweets.
+    """
+
+    def __init__(self, client, shards=4, workers=4, max_query_length=MAX_QUERY_LENGTH, granularity="hour"):
+        """
+        Constructor.
+
+        :param client: tweepy client
+        :param shards: Number of time windows per query
+        :param workers: Number of shards that are searched at the same time
+        :param max_query_length: Maximal query length
+        :param granularity: Granularity of the count histogram ("minute", "hour" or "day")
+        """
+
+        self.client = client
+        self.shards = shards
+        self.workers = workers
+        self.max_query_length = max_query_length
+        self.granularity = granularity
+        self.counts = {}
+
+    def plan(self, query: str, limit: int, counts=None):
+        """
+        Creates the shards of a query. The time windows are cut from the given count histogram of the query (e.g. the
+        daily counts of DownloadHandler.check_available), without histogram one is requested per term group.
+
+        :param query: Search query
+        :param limit: Maximal number of Tweets per term group, only the newest windows covering it are searched
+        :param counts: Optional count buckets of the query with start, end and tweet_count
+        :return: List of (query, start_time, end_time, expected Tweets, shard limit)
+        """
+
+        plan = []
+        for part in split_query(query, self.max_query_length):
+            if counts is not None:
+                # The histogram of the full query is used for all term groups
+                self.counts[part] = counts
+            else:
+                response = self.client.get_recent_tweets_count(query=part, granularity=self.granularity)
+                self.counts[part] = response.data or []
+            windows = newest_windows(time_shards(self.counts[part], self.shards), limit)
+            plan += [(part, start, end, count, window_limit) for start, end, count, window_limit in windows]
+
+        return plan
+
+    def shard_pages(self, query: str, start_time, end_time, limit: int):
+        """
+        Searches one shard page by page.
+
+        :param query: Search query
+        :param start_time: Start of the window, None for the oldest possible time
+        :param end_time: End of the window, None for now
+        :param limit: Maximal number of Tweets
+        :return: Generator of Tweet lists (one per page)
+        """
+
+        import tweepy
+
+        count = 0
+        for response in tweepy.Paginator(self.client.search_recent_tweets, query=query, start_time=start_time,
+                                         end_time=end_time, max_results=100):
+            tweets = (response.data or [])[:limit - count]
+            count += len(tweets)
+            yield tweets
+            if count >= limit:
+                break
+
+    def iter_pages(self, query: str, limit: int, counts=None, queue_size=16):
+        """
+        Runs all shards of a query in parallel and returns their pages as soon as they arrive. The shards wait if
+        more than queue_size pages are not consumed yet.
+
+        :param query: Search query
+        :param limit: Maximal number of Tweets, taken from the newest time windows
+        :param counts: Optional count histogram of the query, see plan()
+        :param queue_size: Maximal number of buffered pages
+        :return: Generator of Tweet lists, Tweets can occur in several pages if term groups overlap
+        """
+
+        plan = self.plan(query, limit, counts)
+        expected = sum(shard[3] for shard in plan)
+        if not expected:
+            return
+
+        print(f"Search plan: {len(plan)} shards for {expected} expected Tweets")
+        pages = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        finished = object()
+
+        def run(part, start, end, count, shard_limit):
+            try:
+                for page in self.shard_pages(part, start, end, shard_limit):
+                    if not put(pages, page, stop):
+                        return
+            except Exception as error:
+                put(pages, error, stop)
+            finally:
+                put(pages, finished, stop)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for shard in plan:
+                pool.submit(run, *shard)
+
+            try:
+                running = len(plan)
+                while running:
+                    page = pages.get()
+                    if page is finished:
+                        running -= 1
+                    elif isinstance(page, Exception):
+                        raise page
+                    else:
+                        yield page
+            finally:
+                # Stops the remaining shards if the consumer ends early
+                stop.set()
+
+
+def put(target: queue.Queue, item, stop: threading.Event):
+    """
+    Puts an item into a bounded queue and waits while it is full, unless the consumer stopped.
+
+    :param target: Queue
+    :param item: Item
+    :param stop: Event that is set when the consumer stopped
+    :return: False if the item was dropped because of the stop event
+    """
+
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+
+    return False
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import shapely
+import geopandas as gpd
+
+# Metric coordinate system for Germany (ETRS89 / UTM zone 32N), distances in meters
+METRIC_CRS = "EPSG:25832"
+
+
+class RailNetwork:
+    """
+    Spatial index over train stations and rail lines for snapping Geo Tweets to the rail network.
+    """
+
+    def __init__(self, stations_file: str, lines_file=None, corridor_column='strecke_nr', segment_length=1000.0,
+                 station_columns=('Name', 'Latitude', 'Longitude'), separator=';'):
+        """
+        Constructor.
+
+        :param stations_file: Path to stations file (GeoJSON / Shapefile / GeoPackage or csv with coordinates)
+        :param lines_file: Optional path to rail line file (GeoJSON / Shapefile / GeoPackage)
+        :param corridor_column: Column of the line file that identifies a corridor (e.g. the DB Streckennummer)
+        :param segment_length: Maximal length of the line segments in meters
+        :param station_columns: Name, latitude and longitude column of a csv stations file
+        :param separator: Seperator for csv file
+        """
+
+        self.stations = self.read_stations(stations_file, station_columns, separator)
+        self.segments = None
+        self.corridor_areas = {}
+
+        if lines_file is not None:
+            self.segments = self.segment_lines(gpd.read_file(lines_file), corridor_column, segment_length)
+
+    @staticmethod
+    def read_stations(stations_file: str, station_columns, separator: str):
+        """
+        Reads the stations and projects them to the metric coordinate system.
+
+        :param stations_file: Path to stations file
+        :param station_columns: Name, latitude and longitude column of a csv stations file
+        :param separator: Seperator for csv file
+        :return: Geodataframe with the columns Name and geometry
+        """
+
+        if stations_file.lower().endswith('.csv'):
+            name, latitude, longitude = station_columns
+            df = pd.read_csv(stations_file, sep=separator, decimal=',' if separator == ';' else '.')
+            stations = gpd.GeoDataFrame({'Name': df[name]},
+                                        geometry=gpd.points_from_xy(df[longitude], df[latitude]), crs="EPSG:4326")
+        else:
+            stations = gpd.read_file(stations_file)
+            if 'Name' not in stations.columns:
+                stations = stations.rename(columns={'name': 'Name', 'NAME': 'Name'})
+
+        return stations[['Name', 'geometry']].to_crs(METRIC_CRS).reset_index(drop=True)
+
+    @staticmethod
+    def segment_lines(lines, corridor_column: str, segment_length: float):
+        """
+        Splits the rail lines into short straight segments, so that the bounding boxes of the spatial index stay small.
+
+        :param lines: Geodataframe with (multi) line strings
+        :param corridor_column: Column that identifies a corridor
+        :param segment_length: Maximal length of the segments in meters
+        :return: Geodataframe with the columns Corridor and geometry
+        """
+
+        lines = lines.to_crs(METRIC_CRS).explode(index_parts=False).reset_index(drop=True)
+        corridors = lines[corridor_column].to_numpy() if corridor_column in lines.columns else lines.index.to_numpy()
+
+        # Densify the lines and connect consecutive vertices of the same line
+        geometries = shapely.segmentize(lines.geometry.values.data, segment_length)
+        coordinates, line_index = shapely.get_coordinates(geometries, return_index=True)
+        same_line = line_index[:-1] == line_index[1:]
+        starts, ends = coordinates[:-1][same_line], coordinates[1:][same_line]
+        segments = shapely.linestrings(np.stack([starts, ends], axis=1))
+
+        return gpd.GeoDataFrame({'Corridor': corridors[line_index[:-1][same_line]]}, geometry=segments,
+                                crs=METRIC_CRS)
+
+    @staticmethod
+    def points(latitude, longitude):
+        """
+        Creates projected points from coordinate arrays.
+
+        :param latitude: Array of latitudes
+        :param longitude: Array of longitudes
+        :return: GeoSeries in the metric coordinate system
+        """
+
+        return gpd.GeoSeries(gpd.points_from_xy(longitude, latitude), crs="EPSG:4326").to_crs(METRIC_CRS)
+
+    def nearest_station(self, latitude, longitude, max_distance=None):
+        """
+        Finds the nearest station for a batch of coordinates.
+
+        :param latitude: Array of latitudes
+        :param longitude: Array of longitudes
+        :param max_distance: Optional maximal distance in meters, points without station are left out
+        :return: Dataframe with the columns Point (position in the input), Station and Distance
+        """
+
+        (point, station), distance = self.stations.sindex.nearest(self.points(latitude, longitude).values,
+                                                                  return_all=False, max_distance=max_distance,
+                                                                  return_distance=True)
+
+        return pd.DataFrame({'Point': point, 'Station': self.stations['Name'].to_numpy()[station],
+                             'Distance': distance})
+
+    def near_lines(self, latitude, longitude, radius=2000.0):
+        """
+        Finds all corridors within a radius of a batch of coordinates.
+
+        :param latitude: Array of latitudes
+        :param longitude: Array of longitudes
+        :param radius: Radius in meters
+        :return: Dataframe with the columns Point (position in the input) and Corridor, one row per pair
+        """
+
+        if self.segments is None:
+            raise ValueError("No rail line file was given")
+
+        # The buffered segments are indexed once per radius, the points are queried in bulk
+        if radius not in self.corridor_areas:
+            self.corridor_areas[radius] = gpd.GeoDataFrame({'Corridor': self.segments['Corridor']},
+                                                           geometry=self.segments.buffer(radius), crs=METRIC_CRS)
+        areas = self.corridor_areas[radius]
+
+        point, area = areas.sindex.query(self.points(latitude, longitude).values, predicate='intersects')
+
+        pairs = pd.DataFrame({'Point': point, 'Corridor': areas['Corridor'].to_numpy()[area]})
+
+        return pairs.drop_duplicates()
+
+    def corridor_sentiment(self, latitude, longitude, sentiment, radius=2000.0):
+        """
+        Aggregates the sentiment of all points within a radius of each corridor.
+
+        :param latitude: Array of latitudes
+        :param longitude: Array of longitudes
+        :param sentiment: Array of sentiment values
+        :param radius: Radius in meters
+        :return: Dataframe indexed by corridor with the columns Count and Sentiment (mean)
+        """
+
+        pairs = self.near_lines(latitude, longitude, radius)
+        pairs['Sentiment'] = np.asarray(sentiment)[pairs['Point'].to_numpy()]
+
+        result = pairs.groupby('Corridor')['Sentiment'].agg(['count', 'mean'])
+        result.columns = ['Count', 'Sentiment']
+
+        return result.sort_values('Count', ascending=False)
@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+import json_io
+
+# Node types
+USER = 0
+PLACE = 1
+TRACK = 2
+USER_GROUP = 3
+TYPE_NAMES = {USER: 'user', PLACE: 'place', TRACK: 'track', USER_GROUP: 'user_group'}
+
+
+class RelationGraph:
+    """
+    Graph of users, places and tracks (start --> destination) with integer indexed node and edge arrays.
+    """
+
+    def __init__(self, node_names, node_weights, node_types, edge_source, edge_target, edge_weights):
+        """
+        Constructor.
+
+        :param node_names: Array of node names (user ids, place names, track names)
+        :param node_weights: Number of relations of each node
+        :param node_types: USER, PLACE, TRACK or USER_GROUP for each node
+        :param edge_source: Node index of the user of each edge
+        :param edge_target: Node index of the place / track of each edge
+        :param edge_weights: Number of occurrences of each edge
+        """
+
+        self.node_names = node_names
+        self.node_weights = node_weights
+        self.node_types = node_types
+        self.edge_source = edge_source
+        self.edge_target = edge_target
+        self.edge_weights = edge_weights
+        self.node_x = None
+        self.node_y = None
+
+    @staticmethod
+    def split_column(df, column: str):
+        """
+        Splits a column with space separated place names, "NaN" is treated as empty.
+
+        :param df: Annotation dataframe
+        :param column: Column name
+        :return: Series of lists
+        """
+
+        return df[column].astype(str).where(df[column] != "NaN", "").str.split()
+
+    @staticmethod
+    def relations(df):
+        """
+        Explodes the annotation dataframe to one row per user relation.
+        Tweets with only hometowns or only destinations are related to these places, Tweets with both (or none) to all
+        start --> destination tracks. Unassigned locations are always related as places.
+
+        :param df: Annotation dataframe with the columns user_id, hometowns, destinations and unassigned_locations
+        :return: Dataframe with the columns User, Target and Type
+        """
+
+        starting = RelationGraph.split_column(df, 'hometowns')
+        ending = RelationGraph.split_column(df, 'destinations')
+        unassigned = RelationGraph.split_column(df, 'unassigned_locations')
+
+        has_start = starting.str.len() > 0
+        has_end = ending.str.len() > 0
+
+        def explode(user, targets):
+            exploded = pd.DataFrame({'User': user, 'Target': targets}).explode('Target')
+            return exploded.dropna(subset=['Target'])
+
+        places = pd.concat([explode(df['user_id'][has_start & ~has_end], starting[has_start & ~has_end]),
+                            explode(df['user_id'][has_end & ~has_start], ending[has_end & ~has_start]),
+                            explode(df['user_id'], unassigned)])
+        places['Type'] = PLACE
+
+        # Cross product of hometowns and destinations
+        both = has_start & has_end
+        tracks = pd.DataFrame({'User': df['user_id'][both], 'Start': starting[both], 'End': ending[both]})
+        tracks = tracks.explode('Start').explode('End')
+        tracks = pd.DataFrame({'User': tracks['User'], 'Target': tracks['Start'] + " --> " + tracks['End'],
+                               'Type': TRACK})
+
+        return pd.concat([tracks, places], ignore_index=True)
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        Builds the graph with grouped counts.
+
+        :param df: Annotation dataframe with the columns user_id, hometowns, destinations and unassigned_locations
+        :return: RelationGraph
+        """
+
+        relations = cls.relations(df)
+
+        # Node weights: relations per place / track, Tweets per user
+        targets = relations.groupby(['Target', 'Type'], sort=False).size()
+        users = df['user_id'].value_counts(sort=False)
+
+        node_names = np.concatenate([targets.index.get_level_values('Target').to_numpy(dtype=object),
+                                     users.index.to_numpy(dtype=object)])
+        node_weights = np.concatenate([targets.to_numpy(), users.to_numpy()]).astype(np.int64)
+        node_types = np.concatenate([targets.index.get_level_values('Type').to_numpy(),
+                                     np.full(len(users), USER)]).astype(np.int8)
+
+        # Edge weights: occurrences of each (user, target) pair
+        edges = relations.groupby(['User', 'Target', 'Type'], sort=False).size().reset_index(name='Weight')
+
+        target_index = pd.MultiIndex.from_arrays([targets.index.get_level_values('Target'),
+                                                  targets.index.get_level_values('Type')])
+        edge_target = target_index.get_indexer(pd.MultiIndex.from_frame(edges[['Target', 'Type']]))
+        edge_source = len(targets) + pd.Index(users.index).get_indexer(edges['User'])
+
+        return cls(node_names, node_weights, node_types, edge_source.astype(np.int64), edge_target.astype(np.int64),
+                   edges['Weight'].to_numpy(dtype=np.int64))
+
+    def nodes(self):
+        """
+        Returns the nodes as dict.
+
+        :return: Dict node name -> weight
+        """
+
+        return dict(zip(self.node_names.tolist(), self.node_weights.tolist()))
+
+    def edges(self):
+        """
+        Returns the edges as dict.
+
+        :return: Dict (user, place / track) -> weight
+        """
+
+        names = self.node_names
+        return dict(zip(zip(names[self.edge_source].tolist(), names[self.edge_target].tolist()),
+                        self.edge_weights.tolist()))
+
+    def reduce(self, min_user_degree=2, top_tracks=None):
+        """
+        Creates a level of detail version of the graph. Only the top tracks by weight are kept and users with less than
+        min_user_degree edges are collapsed into one user group node per place / track.
+
+        :param min_user_degree: Users with fewer edges are collapsed
+        :param top_tracks: Number of tracks that are kept, None keeps all tracks
+        :return: Reduced RelationGraph
+        """
+
+        keep = np.ones(len(self.node_names), dtype=bool)
+        if top_tracks is not None:
+            tracks = np.flatnonzero(self.node_types == TRACK)
+            dropped = tracks[np.argsort(-self.node_weights[tracks], kind='stable')[top_tracks:]]
+            keep[dropped] = False
+
+        edge_mask = keep[self.edge_target]
+        source, target, weight = self.edge_source[edge_mask], self.edge_target[edge_mask], self.edge_weights[edge_mask]
+
+        # Users with a small degree are replaced by a group node of their target
+        degree = np.bincount(source, minlength=len(self.node_names))
+        collapsed = degree[source] < min_user_degree
+        users = self.node_types == USER
+        keep[users] = degree[users] >= min_user_degree
+
+        groups = pd.DataFrame({'Target': target[collapsed], 'User': source[collapsed], 'Weight': weight[collapsed]})
+        groups = groups.groupby('Target').agg(Users=('User', 'nunique'), Weight=('Weight', 'sum'))
+
+        # New node arrays: kept nodes followed by the group nodes
+        old_index = np.flatnonzero(keep)
+        new_index = np.full(len(self.node_names), -1, dtype=np.int64)
+        new_index[old_index] = np.arange(len(old_index))
+        group_targets = groups.index.to_numpy(dtype=np.int64)
+
+        node_names = np.concatenate([self.node_names[old_index],
+                                     np.array(["Users: " + str(name) for name in self.node_names[group_targets]],
+                                              dtype=object)])
+        node_weights = np.concatenate([self.node_weights[old_index], groups['Users'].to_numpy(dtype=np.int64)])
+        node_types = np.concatenate([self.node_types[old_index],
+                                     np.full(len(groups), USER_GROUP, dtype=np.int8)])
+
+        group_nodes = len(old_index) + np.arange(len(groups))
+        edge_source = np.concatenate([new_index[source[~collapsed]], group_nodes])
+        edge_target = np.concatenate([new_index[target[~collapsed]], new_index[group_targets]])
+        edge_weights = np.concatenate([weight[~collapsed], groups['Weight'].to_numpy(dtype=np.int64)])
+
+        return RelationGraph(node_names, node_weights, node_types, edge_source, edge_target, edge_weights)
+
+    def compute_layout(self, radius=1000.0, seed=0):
+        """
+        Precomputes node coordinates in O(nodes + edges). Places and tracks are placed on a circle ordered by weight,
+        users and user groups at the weighted center of their targets.
+
+        :param radius: Radius of the circle
+        :param seed: Seed for the random offset of the users
+        """
+
+        x = np.zeros(len(self.node_names))
+        y = np.zeros(len(self.node_names))
+
+        targets = np.flatnonzero(self.node_types != USER) if len(self.node_names) else np.array([], dtype=np.int64)
+        targets = targets[self.node_types[targets] != USER_GROUP]
+        order = targets[np.argsort(-self.node_weights[targets], kind='stable')]
+        angle = 2 * np.pi * np.arange(len(order)) / max(len(order), 1)
+        x[order] = radius * np.cos(angle)
+        y[order] = radius * np.sin(angle)
+
+        # Weighted mean of the target positions for every source node
+        total = np.bincount(self.edge_source, weights=self.edge_weights, minlength=len(x))
+        sum_x = np.bincount(self.edge_source, weights=self.edge_weights * x[self.edge_target], minlength=len(x))
+        sum_y = np.bincount(self.edge_source, weights=self.edge_weights * y[self.edge_target], minlength=len(x))
+        sources = total > 0
+        jitter = np.random.default_rng(seed).normal(scale=radius / 50, size=(2, int(sources.sum())))
+        x[sources] = 0.8 * sum_x[sources] / total[sources] + jitter[0]
+        y[sources] = 0.8 * sum_y[sources] / total[sources] + jitter[1]
+
+        self.node_x, self.node_y = x, y
+
+    def save_json(self, file_name: str):
+        """
+        Saves the graph as compact column oriented JSON with layout coordinates.
+
+        :param file_name: File name without ending
+        """
+
+        if self.node_x is None:
+            self.compute_layout()
+
+        graph = {"nodes": {"name": self.node_names.tolist(), "weight": self.node_weights.tolist(),
+                           "type": [TYPE_NAMES[node_type] for node_type in self.node_types.tolist()],
+                           "x": np.round(self.node_x, 1).tolist(), "y": np.round(self.node_y, 1).tolist()},
+                 "edges": {"source": self.edge_source.tolist(), "target": self.edge_target.tolist(),
+                           "weight": self.edge_weights.tolist()}}
+
+        json_io.dump(graph, file_name + ".json", json_io.COMPACT)
+
+    def save_edge_list(self, file_name: str, separator='$'):
+        """
+        Saves the edges as csv edge list with node names.
+
+        :param file_name: File name without ending
+        :param separator: Seperator for csv file
+        """
+
+        pd.DataFrame({'source': self.node_names[self.edge_source], 'target': self.node_names[self.edge_target],
+                      'weight': self.edge_weights}).to_csv(file_name + ".csv", sep=separator, index=False)
+
+    def save_graphml(self, file_name: str):
+        """
+        Saves the graph as GraphML file.
+
+        :param file_name: File name without ending
+        """
+
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_nodes_from((index, {'label': str(name), 'weight': int(weight), 'type': TYPE_NAMES[int(node_type)]})
+                             for index, (name, weight, node_type)
+                             in enumerate(zip(self.node_names, self.node_weights, self.node_types)))
+        graph.add_weighted_edges_from(zip(self.edge_source.tolist(), self.edge_target.tolist(),
+                                          self.edge_weights.tolist()))
+
+        nx.write_graphml(graph, file_name + ".graphml")
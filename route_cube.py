@@ -0,0 +1,204 @@
+import os
+import ast
+import pandas as pd
+
+
+class RouteCube:
+    """
+    Precomputed aggregates of city routes (hometown / destination combinations) keyed by route, day and language.
+    The cube is stored as parquet files in one directory and updated incrementally with new Tweets:
+
+        cells.parquet: Route, Day, Lang, Count, Sentiment_Sum, Sentiment_Count
+        users.parquet: Route, Day, Lang, User (distinct users per cell)
+        tweets.parquet: Tweet ids that are already counted
+    """
+
+    def __init__(self, directory: str):
+        """
+        Constructor.
+
+        :param directory: Path to cube directory, created on first save
+        """
+
+        self.directory = directory
+        self.cells = pd.DataFrame({'Route': pd.Series(dtype=object), 'Day': pd.Series(dtype='datetime64[ns]'),
+                                   'Lang': pd.Series(dtype=object), 'Count': pd.Series(dtype='int64'),
+                                   'Sentiment_Sum': pd.Series(dtype='float64'),
+                                   'Sentiment_Count': pd.Series(dtype='int64')})
+        self.users = pd.DataFrame({'Route': pd.Series(dtype=object), 'Day': pd.Series(dtype='datetime64[ns]'),
+                                   'Lang': pd.Series(dtype=object), 'User': pd.Series(dtype='int64')})
+        self.tweets = pd.Series(dtype='int64', name='Tweet')
+
+        if os.path.exists(os.path.join(directory, 'cells.parquet')):
+            self.cells = pd.read_parquet(os.path.join(directory, 'cells.parquet'))
+            self.users = pd.read_parquet(os.path.join(directory, 'users.parquet'))
+            self.tweets = pd.read_parquet(os.path.join(directory, 'tweets.parquet'))['Tweet']
+
+    @staticmethod
+    def city_list(value):
+        """
+        Converts a hometown / destination entry to a list. Entries can be lists, list strings read from csv files or
+        space separated names.
+
+        :param value: Entry
+        :return: List of city names
+        """
+
+        if isinstance(value, list):
+            return value
+        if not isinstance(value, str) or value in ("NaN", ""):
+            return []
+        if value.startswith('['):
+            return ast.literal_eval(value)
+
+        return value.split()
+
+    @staticmethod
+    def routes(df, sentiment_column='sentiment'):
+        """
+        Explodes the Tweets to one row per route. A route is the sorted combination of a hometown and a destination
+        ("Berlin$Hamburg"), equal cities are skipped.
+
+        :param df: Tweet dataframe with the columns tweet_id, tweet_created_at, user_id, hometowns, destinations and
+                   optionally tweet_lang and a sentiment column
+        :param sentiment_column: Column with the sentiment values
+        :return: Dataframe with the columns Tweet, Route, Day, Lang, User and Sentiment
+        """
+
+        routes = pd.DataFrame({
+            'Tweet': df['tweet_id'].to_numpy(), 'User': df['user_id'].to_numpy(),
+            'Day': pd.to_datetime(df['tweet_created_at'], utc=True).dt.tz_convert(None).dt.floor('D').to_numpy(),
+            'Lang': df['tweet_lang'].to_numpy() if 'tweet_lang' in df.columns else 'und',
+            'Sentiment': pd.to_numeric(df[sentiment_column], errors='coerce').to_numpy()
+            if sentiment_column in df.columns else float('nan'),
+            'Start': df['hometowns'].map(RouteCube.city_list).to_numpy(),
+            'End': df['destinations'].map(RouteCube.city_list).to_numpy()})
+
+        routes = routes.explode('Start').explode('End').dropna(subset=['Start', 'End'])
+        routes = routes[routes['Start'] != routes['End']]
+
+        first = routes['Start'].where(routes['Start'] < routes['End'], routes['End'])
+        second = routes['End'].where(routes['Start'] < routes['End'], routes['Start'])
+        routes['Route'] = first + "$" + second
+
+        routes = routes.drop(columns=['Start', 'End']).drop_duplicates(subset=['Tweet', 'Route'])
+
+        return routes.reset_index(drop=True)
+
+    def update(self, df, sentiment_column='sentiment'):
+        """
+        Adds new Tweets to the cube. Tweets that are already counted are skipped.
+
+        :param df: Tweet dataframe, see routes()
+        :param sentiment_column: Column with the sentiment values
+        :return: Number of new Tweets
+        """
+
+        df = df[~df['tweet_id'].isin(self.tweets)].drop_duplicates(subset='tweet_id')
+        if df.empty:
+            return 0
+
+        routes = self.routes(df, sentiment_column)
+        keys = ['Route', 'Day', 'Lang']
+
+        # Tweets without language are kept as own cells
+        new_cells = routes.groupby(keys, dropna=False).agg(
+            Count=('Tweet', 'size'), Sentiment_Sum=('Sentiment', 'sum'),
+            Sentiment_Count=('Sentiment', 'count')).reset_index()
+        self.cells = pd.concat([self.cells, new_cells]).groupby(keys, as_index=False, dropna=False).sum()
+
+        self.users = pd.concat([self.users, routes[keys + ['User']]]).drop_duplicates()
+        self.tweets = pd.concat([self.tweets, pd.Series(df['tweet_id'].to_numpy(), name='Tweet')],
+                                ignore_index=True)
+
+        self.save()
+
+        return len(df)
+
+    def save(self):
+        """
+        Writes the cube files.
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.cells.to_parquet(os.path.join(self.directory, 'cells.parquet'), index=False)
+        self.users.to_parquet(os.path.join(self.directory, 'users.parquet'), index=False)
+        self.tweets.to_frame().to_parquet(os.path.join(self.directory, 'tweets.parquet'), index=False)
+
+    def select(self, table, start=None, end=None, lang=None):
+        """
+        Filters a cube table by day range and language.
+
+        :param table: cells or users dataframe
+        :param start: Optional first day (inclusive)
+        :param end: Optional last day (inclusive)
+        :param lang: Optional language code
+        :return: Filtered dataframe
+        """
+
+        mask = pd.Series(True, index=table.index)
+        if start is not None:
+            mask &= table['Day'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= table['Day'] <= pd.Timestamp(end)
+        if lang is not None:
+            mask &= table['Lang'] == lang
+
+        return table[mask]
+
+    def top_routes(self, number=10, start=None, end=None, lang=None):
+        """
+        Returns the routes with the most Tweets.
+
+        :param number: Number of routes
+        :param start: Optional first day
+        :param end: Optional last day
+        :param lang: Optional language code
+        :return: Dataframe indexed by route with the columns Count, Users and Sentiment (mean)
+        """
+
+        cells = self.select(self.cells, start, end, lang).groupby('Route')[
+            ['Count', 'Sentiment_Sum', 'Sentiment_Count']].sum()
+        users = self.select(self.users, start, end, lang).groupby('Route')['User'].nunique()
+
+        result = pd.DataFrame({'Count': cells['Count'], 'Users': users.reindex(cells.index, fill_value=0),
+                               'Sentiment': cells['Sentiment_Sum'] / cells['Sentiment_Count']})
+
+        return result.nlargest(number, 'Count')
+
+    def route_series(self, route: str, freq='W', lang=None):
+        """
+        Returns the time series of a route.
+
+        :param route: Route name, e.g. "Berlin$Hamburg" (the order of the cities does not matter)
+        :param freq: Resampling frequency, e.g. 'D' or 'W'
+        :param lang: Optional language code
+        :return: Dataframe indexed by period with the columns Count, Users and Sentiment (mean)
+        """
+
+        route = "$".join(sorted(route.split("$")))
+        cells = self.select(self.cells, lang=lang)
+        cells = cells[cells['Route'] == route].set_index('Day')
+        users = self.select(self.users, lang=lang)
+        users = users[users['Route'] == route].set_index('Day')
+
+        sums = cells[['Count', 'Sentiment_Sum', 'Sentiment_Count']].resample(freq).sum()
+
+        return pd.DataFrame({'Count': sums['Count'],
+                             'Users': users['User'].resample(freq).nunique().reindex(sums.index, fill_value=0),
+                             'Sentiment': sums['Sentiment_Sum'] / sums['Sentiment_Count']})
+
+    def routes_above(self, min_count: int, start=None, end=None, lang=None):
+        """
+        Returns all routes with at least min_count Tweets.
+
+        :param min_count: Threshold
+        :param start: Optional first day
+        :param end: Optional last day
+        :param lang: Optional language code
+        :return: Dict route -> count
+        """
+
+        counts = self.select(self.cells, start, end, lang).groupby('Route')['Count'].sum()
+
+        return counts[counts >= min_count].sort_values(ascending=False).to_dict()
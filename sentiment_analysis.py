@@ -1,5 +1,7 @@
-import json
-from textblob_de import TextBlobDE as Blob
+import string
+import json_io
+from text_tokens import TokenizedTexts
+from tweet_table import TweetTable
 
 
 class SentimentAnalyser:
@@ -7,45 +9,89 @@ class SentimentAnalyser:
     Does a sentiment analysis for a given set of Tweets.
     """
 
-    def __init__(self, json_file: str):
+    def __init__(self, json_file: str, lexicon_file=None):
         """
         Constructor.
 
         :param json_file: Path to JSON file with Twitter data
+        :param lexicon_file: Optional polarity lexicon, the Tweets are scored with it instead of TextBlob
         """
 
         self.json_file = json_file
         self.data = self.read_json()
+        self.lexicon = self.read_lexicon(lexicon_file) if lexicon_file else None
 
     def read_json(self):
         """
-        Reads the JSON file.
+        Reads the JSON file into a columnar table.
 
-        :return: Dict object
+        :return: TweetTable
         """
 
-        # Opens JSON file
-        with open(self.json_file, 'r') as in_file:
-            data = json.load(in_file)
+        return TweetTable.load(self.json_file)
 
-        return data
+    @staticmethod
+    def read_lexicon(lexicon_file: str):
+        """
+        Reads a polarity lexicon with tab separated word and polarity per line. The SentiWS format (word|POS, polarity,
+        comma separated inflections) is supported as well.
+
+        :param lexicon_file: Path to lexicon file
+        :return: Dict case folded word -> polarity
+        """
+
+        lexicon = {}
+        with open(lexicon_file, 'r', encoding='utf-8') as in_file:
+            for line in in_file:
+                columns = line.rstrip("\n").split("\t")
+                if len(columns) < 2 or not columns[0] or columns[0].startswith("#"):
+                    continue
+                polarity = float(columns[1])
+                words = [columns[0].split("|")[0]] + (columns[2].split(",") if len(columns) > 2 else [])
+                for word in words:
+                    if word:
+                        lexicon[word.casefold()] = polarity
+
+        return lexicon
+
+    def lexicon_analysis(self):
+        """
+        Scores the Tweets with the lexicon, the sentiment is the mean polarity of the lexicon words in the text.
+        Every text is tokenized once and each distinct token is looked up once.
+        """
+
+        texts = TokenizedTexts.from_texts(self.data.column("Data", "Text"))
+
+        # Lexicon polarity per token id, punctuation around the word is ignored
+        polarity = {}
+        for token_id, token in enumerate(texts.vocabulary.tokens):
+            value = self.lexicon.get(token.strip(string.punctuation).casefold())
+            if value is not None:
+                polarity[token_id] = value
+
+        self.data.set_column("Data", "Sentiment", texts.score(polarity).tolist())
 
     def sentiment_analysis(self):
         """
-        Does sentiment analysis with Textblob and saves results in dict.
+        Does sentiment analysis with Textblob (or the lexicon if given) and saves results in dict.
         """
 
-        for tweet in self.data:
-            # Textblob analysis
-            analysis = Blob(self.data[tweet]["Data"]["Text"])
-            # Save sentiment in Tweet object
-            self.data[tweet]["Data"]["Sentiment"] = analysis.sentiment.polarity
+        if self.lexicon is not None:
+            self.lexicon_analysis()
+            return
 
-    def save_json(self):
+        from textblob_de import TextBlobDE as Blob
+
+        # Textblob analysis, the sentiments are saved as column of the Tweet table
+        self.data.set_column("Data", "Sentiment", [Blob(text).sentiment.polarity
+                                                   for text in self.data.column("Data", "Text")])
+
+    def save_json(self, out_file=None):
         """
         Saves the dict in a JSON file.
+
+        :param out_file: Optional path to output file, default overwrites the input file
         """
 
-        # Opens outgoing file
-        with open(self.json_file, 'w', encoding='utf-8') as out_file:
-            json.dump(self.data, out_file, ensure_ascii=False, indent=4, default=str)
+        out_file = out_file or self.json_file
+        json_io.dump(self.data, out_file, json_io.NDJSON if json_io.is_ndjson(out_file) else None)
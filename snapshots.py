@@ -0,0 +1,171 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from collections import Counter
+from matplotlib.animation import PillowWriter
+import json_io
+from tweet_mapper import TweetMapper, germany_basemap
+from relation_graph import RelationGraph
+
+
+def bucket_periods(created_at, freq: str):
+    """
+    Assigns timestamps to time buckets.
+
+    :param created_at: Array or series of timestamps
+    :param freq: Bucket size, e.g. 'D' for days or 'W' for weeks
+    :return: Series of periods
+    """
+
+    timestamps = pd.to_datetime(pd.Series(created_at), utc=True).dt.tz_convert(None)
+
+    return timestamps.dt.to_period(freq)
+
+
+class MapSnapshots:
+    """
+    Running point raster of Geo Tweets per time bucket. Every bucket only adds its own points to the aggregates of
+    the previous buckets.
+    """
+
+    def __init__(self, freq='D', extent=(5.5, 15.5, 47.0, 55.5), bins=(100, 120), cumulative=True):
+        """
+        Constructor.
+
+        :param freq: Bucket size, e.g. 'D' for days or 'W' for weeks
+        :param extent: Raster extent (min longitude, max longitude, min latitude, max latitude)
+        :param bins: Number of raster cells in longitude and latitude direction
+        :param cumulative: True for running totals, False for the bucket alone
+        """
+
+        self.freq = freq
+        self.extent = extent
+        self.bins = bins
+        self.cumulative = cumulative
+        self.count = np.zeros(bins)
+        self.sentiment_sum = np.zeros(bins)
+
+    def frames(self, points: dict):
+        """
+        Adds the points bucket by bucket to the raster.
+
+        :param points: Dict with the arrays Latitude, Longitude, Sentiment and Created_At (see load_geo_points)
+        :return: Generator of (period, count raster, mean sentiment raster)
+        """
+
+        periods = bucket_periods(points['Created_At'], self.freq)
+        order = np.argsort(periods.to_numpy(), kind='stable')
+        sorted_periods = periods.to_numpy()[order]
+        boundaries = np.flatnonzero(sorted_periods[1:] != sorted_periods[:-1]) + 1
+
+        value_range = [self.extent[:2], self.extent[2:]]
+        for bucket in np.split(order, boundaries) if len(order) else []:
+            if not self.cumulative:
+                self.count[:] = 0
+                self.sentiment_sum[:] = 0
+
+            count, _, _ = np.histogram2d(points['Longitude'][bucket], points['Latitude'][bucket], bins=self.bins,
+                                         range=value_range)
+            sentiment_sum, _, _ = np.histogram2d(points['Longitude'][bucket], points['Latitude'][bucket],
+                                                 bins=self.bins, range=value_range,
+                                                 weights=points['Sentiment'][bucket])
+            self.count += count
+            self.sentiment_sum += sentiment_sum
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = np.where(self.count > 0, self.sentiment_sum / self.count, np.nan)
+
+            yield periods.iloc[bucket[0]], self.count, mean
+
+    def render(self, geo_tweets_file: str, file_name: str, fps=2):
+        """
+        Renders one map per bucket into an animated GIF. The figure and the raster image are reused for all frames.
+
+        :param geo_tweets_file: Path to Geo Tweet file or store directory
+        :param file_name: File name for output without ending
+        :param fps: Frames per second
+        :return: Number of frames
+        """
+
+        points = TweetMapper.load_geo_points(geo_tweets_file, 'DE')
+
+        # Centimeters in inches
+        cm = 1 / 2.54
+        fig, ax = plt.subplots(figsize=(21*cm, 29*cm))
+        germany_basemap().plot(color="lightgrey", ax=ax)
+        image = ax.imshow(np.full(self.bins, np.nan).T, origin='lower', extent=self.extent, cmap="Blues", vmin=-1,
+                          vmax=1, aspect='auto', zorder=2)
+        fig.colorbar(image, ax=ax, label="Sentiment")
+
+        frames = 0
+        writer = PillowWriter(fps=fps)
+        with writer.saving(fig, file_name + ".gif", dpi=100):
+            for period, _, mean in self.frames(points):
+                image.set_data(mean.T)
+                ax.set_title(f"Distribution Germany {period}")
+                writer.grab_frame()
+                frames += 1
+
+        plt.close(fig)
+
+        return frames
+
+
+class GraphSnapshots:
+    """
+    Running edge counts of the relationship graph per time bucket.
+    """
+
+    def __init__(self, freq='D'):
+        """
+        Constructor.
+
+        :param freq: Bucket size, e.g. 'D' for days or 'W' for weeks
+        """
+
+        self.freq = freq
+        self.edge_counts = Counter()
+        self.node_counts = Counter()
+
+    def frames(self, df, time_column='tweet_created_at'):
+        """
+        Adds the relations bucket by bucket to the running counts.
+
+        :param df: Annotation dataframe
+        :param time_column: Column with the Tweet creation time
+        :return: Generator of (period, changed edges, changed nodes) with the running counts of the changed entries
+        """
+
+        periods = bucket_periods(df[time_column], self.freq)
+        for period, bucket in df.groupby(periods.to_numpy(), sort=True):
+            relations = RelationGraph.relations(bucket)
+            edges = relations.groupby(['User', 'Target'], sort=False).size()
+
+            self.edge_counts.update(dict(zip(edges.index, edges.to_numpy().tolist())))
+            targets = relations['Target'].value_counts()
+            self.node_counts.update(dict(zip(targets.index, targets.to_numpy().tolist())))
+
+            yield period, {edge: self.edge_counts[edge] for edge in edges.index}, \
+                {target: self.node_counts[target] for target in targets.index}
+
+    def save(self, csv_file: str, separator: str, file_name: str, time_column='tweet_created_at'):
+        """
+        Writes one NDJSON frame per bucket. Every frame only contains the places / tracks and edges that changed in the
+        bucket with their running counts, so the full graph of a bucket is the replay of all previous frames.
+
+        :param csv_file: Path to annotation csv file
+        :param separator: Seperator for csv file
+        :param file_name: File name for output without ending
+        :param time_column: Column with the Tweet creation time
+        :return: Number of frames
+        """
+
+        df = pd.read_csv(csv_file, sep=separator, na_values=" NaN")
+        df = df.fillna("NaN")
+
+        def frames():
+            for period, edges, nodes in self.frames(df, time_column):
+                yield str(period), {"Period": str(period), "Nodes": nodes,
+                                    "Edges": [[user, target, count] for (user, target), count in edges.items()]}
+
+        return json_io.dump_items(frames(), file_name + ".ndjson", json_io.NDJSON)
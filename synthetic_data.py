@@ -0,0 +1,219 @@
+import csv
+import random
+import json_io
+from tweet_records import STORAGE_COLUMNS
+from datetime import datetime, timedelta, timezone
+
+# Column order of the annotation csv files written by DataProcessing.check_overrepresented_city_combination
+ANNOTATION_COLUMNS = ["tweet_id", "tweet_created_at", "tweet_text", "tweet_lang", "user_id", "user_created_at",
+                      "hometowns", "destinations", "unassigned_locations", "sentiment"]
+
+# Cities with bounding box (min longitude, min latitude, max longitude, max latitude)
+CITIES = {"Berlin": (13.08, 52.33, 13.76, 52.67), "Hamburg": (9.73, 53.39, 10.32, 53.74),
+          "München": (11.36, 48.06, 11.72, 48.25), "Köln": (6.77, 50.83, 7.16, 51.08),
+          "Frankfurt": (8.47, 50.01, 8.80, 50.23), "Stuttgart": (9.04, 48.69, 9.32, 48.87),
+          "Düsseldorf": (6.69, 51.12, 6.94, 51.35), "Leipzig": (12.24, 51.24, 12.54, 51.45),
+          "Dresden": (13.58, 50.97, 13.97, 51.18), "Hannover": (9.60, 52.31, 9.92, 52.45),
+          "Rostock": (11.99, 54.05, 12.30, 54.24), "Kiel": (10.04, 54.26, 10.22, 54.43),
+          "Kassel": (9.35, 51.26, 9.57, 51.36), "Magdeburg": (11.52, 52.04, 11.73, 52.23),
+          "Nürnberg": (10.99, 49.33, 11.21, 49.54), "Bremen": (8.48, 53.01, 8.99, 53.23)}
+
+TEMPLATES = ["Mit dem #9EuroTicket von {start} nach {end}, {mood}",
+             "Heute von {start} nach {end} mit der Bahn. {mood}",
+             "{mood} Der Zug nach {end} ist wieder voll #9EuroTicket",
+             "Endlich in {end} angekommen, {mood} @DB_Bahn",
+             "Regionalexpress aus {start} hat 40 Minuten Verspätung. {mood}",
+             "Wochenende in {start} #NeunEuroTicket {mood}",
+             "Kann mir jemand sagen ob der RE nach {end} fährt? @DB_Info",
+             "Unterwegs von {start} to {end} with the 9 euro ticket, {mood}"]
+
+MOODS = ["super Sache!", "einfach toll.", "total überfüllt.", "schrecklich heute.", "ganz okay.", "nie wieder.",
+         "war schön.", "katastrophal wie immer.", "great trip!", ""]
+
+# Polarity of the mood words for a lexicon based sentiment analysis
+LEXICON = {"super": 0.8, "toll": 0.7, "überfüllt": -0.5, "schrecklich": -0.8, "okay": 0.2, "nie": -0.3,
+           "schön": 0.6, "katastrophal": -0.9, "great": 0.8, "Verspätung": -0.4}
+
+SOURCES = ["Twitter for Android", "Twitter for iPhone", "Twitter Web App"]
+
+LANGUAGES = ["de"] * 8 + ["en", "und"]
+
+
+class SyntheticCorpus:
+    """
+    Deterministic generator for Tweet datasets in the storage csv, nested JSON and annotation csv format. The same
+    seed and number of Tweets always create the same data, so benchmark results of different runs are comparable.
+    """
+
+    def __init__(self, seed=0, users=None, geo_share=0.05, start=datetime(2022, 6, 1, tzinfo=timezone.utc),
+                 days=90):
+        """
+        Constructor.
+
+        :param seed: Seed of the random generator
+        :param users: Number of distinct users, default is a tenth of the Tweets
+        :param geo_share: Share of Tweets with a place object
+        :param start: Creation time of the first Tweet
+        :param days: Number of days the Tweets are spread over
+        """
+
+        self.seed = seed
+        self.users = users
+        self.geo_share = geo_share
+        self.start = start
+        self.days = days
+
+    def records(self, number: int):
+        """
+        Creates the Tweets as flat records with native types.
+
+        :param number: Number of Tweets
+        :return: Generator of dicts with the storage column names as keys
+        """
+
+        rng = random.Random(self.seed)
+        users = self.users or max(number // 10, 1)
+        cities = list(CITIES)
+        seconds = self.days * 24 * 3600 / max(number, 1)
+
+        for i in range(number):
+            start, end = rng.sample(cities, 2)
+            user = rng.randrange(users)
+            text = rng.choice(TEMPLATES).format(start=start, end=end, mood=rng.choice(MOODS))
+            hashtags = None
+            if "#" in text:
+                tag = text[text.index("#") + 1:].split()[0]
+                hashtags = [{"start": text.index("#"), "end": text.index("#") + len(tag) + 1, "tag": tag}]
+
+            record = {"tweet.id": 1530000000000000000 + i * 7919,
+                      "tweet.created_at": self.start + timedelta(seconds=int(i * seconds)),
+                      "tweet.text": text, "tweet.source": rng.choice(SOURCES),
+                      "tweet.retweet_count": int(rng.expovariate(0.5)), "tweet.reply_count": int(rng.expovariate(1)),
+                      "tweet.like_count": int(rng.expovariate(0.1)), "tweet.quote_count": int(rng.expovariate(2)),
+                      "tweet.hashtags": hashtags, "tweet.lang": rng.choice(LANGUAGES),
+                      "user.id": 100000 + user, "user.name": f"Nutzer {user}",
+                      # Users keep their location over all Tweets
+                      "user.location": cities[user % len(cities)] if user % 3 else "Deutschland",
+                      "user.created_at": datetime(2010 + user % 12, 1 + user % 12, 1, tzinfo=timezone.utc),
+                      "place.id": None, "place.name": None, "place.country_code": None, "place.geo": None,
+                      "place.place_type": None}
+
+            if rng.random() < self.geo_share:
+                place = rng.randrange(len(cities))
+                record.update({"place.id": f"{place + 1:016x}", "place.name": cities[place],
+                               "place.country_code": "DE", "place.place_type": "city",
+                               "place.geo": {"type": "Feature", "bbox": list(CITIES[cities[place]]),
+                                             "properties": {}}})
+
+            yield record
+
+    def write_storage_csv(self, file_name: str, number: int):
+        """
+        Writes the Tweets as storage csv file ("$" separated, "$" in values replaced by "€", index column first).
+
+        :param file_name: Path to csv file
+        :param number: Number of Tweets
+        :return: Number of Tweets
+        """
+
+        with open(file_name, 'w', encoding='utf-8', newline='') as out_file:
+            writer = csv.writer(out_file, delimiter='$', lineterminator='\n')
+            writer.writerow([""] + STORAGE_COLUMNS)
+            for index, record in enumerate(self.records(number)):
+                writer.writerow([index] + [str(record[column]).replace("$", "€") for column in STORAGE_COLUMNS])
+
+        return number
+
+    @staticmethod
+    def nested(record: dict):
+        """
+        Converts a flat record to the nested JSON Tweet object of DownloadHandler.get_tweets_json.
+
+        :param record: Flat record
+        :return: Tweet dict
+        """
+
+        return {"Data": {"Id": record["tweet.id"], "Created_At": record["tweet.created_at"],
+                         "Text": record["tweet.text"], "Tweet_Source": record["tweet.source"],
+                         "Retweet_Count": record["tweet.retweet_count"], "Reply_Count": record["tweet.reply_count"],
+                         "Like_Count": record["tweet.like_count"], "Quote_Count": record["tweet.quote_count"],
+                         "Language": record["tweet.lang"]},
+                "User": {"Id": record["user.id"], "Name": record["user.name"], "Location": record["user.location"],
+                         "Created_At": record["user.created_at"]},
+                "Geo": {"Id": record["place.id"], "Name": record["place.name"],
+                        "Country_Code": record["place.country_code"], "Geo": record["place.geo"],
+                        "Type": record["place.place_type"]},
+                "Hashtags": record["tweet.hashtags"]}
+
+    def write_json(self, file_name: str, number: int, mode=None):
+        """
+        Writes the Tweets as nested JSON file.
+
+        :param file_name: Path to JSON / NDJSON file
+        :param number: Number of Tweets
+        :param mode: Output mode of json_io (pretty, compact or ndjson), default depends on the file ending
+        :return: Number of Tweets
+        """
+
+        if mode is None:
+            mode = json_io.NDJSON if json_io.is_ndjson(file_name) else json_io.COMPACT
+
+        items = ((str(record["tweet.id"]), self.nested(record)) for record in self.records(number))
+
+        return json_io.dump_items(items, file_name, mode)
+
+    def write_annotation_csv(self, file_name: str, number: int):
+        """
+        Writes an annotation csv file ("$" separated) with space separated place names and " NaN" for empty entries.
+
+        :param file_name: Path to csv file
+        :param number: Number of Tweets
+        :return: Number of Tweets
+        """
+
+        rng = random.Random(self.seed + 1)
+
+        def places(candidates):
+            return " ".join(candidates) if candidates else " NaN"
+
+        with open(file_name, 'w', encoding='utf-8', newline='') as out_file:
+            writer = csv.writer(out_file, delimiter='$', lineterminator='\n')
+            writer.writerow([""] + ANNOTATION_COLUMNS)
+            for index, record in enumerate(self.records(number)):
+                words = record["tweet.text"].replace(",", "").replace(".", "").split()
+                start = [word for previous, word in zip(words, words[1:]) if previous in ("von", "aus", "from")
+                         and word in CITIES]
+                end = [word for previous, word in zip(words, words[1:]) if previous in ("nach", "to")
+                       and word in CITIES]
+                unassigned = [record["place.name"]] if record["place.name"] else []
+
+                writer.writerow([index, record["tweet.id"], record["tweet.created_at"],
+                                 record["tweet.text"].replace("$", "€"), record["tweet.lang"], record["user.id"],
+                                 record["user.created_at"], places(start), places(end), places(unassigned),
+                                 rng.choice([-1, 0, 0, 1])])
+
+        return number
+
+    @staticmethod
+    def write_city_keys(file_name: str):
+        """
+        Writes a city key file for DataProcessing.load_city_key_data.
+
+        :param file_name: Path to text file
+        """
+
+        with open(file_name, 'w', encoding='utf-8') as out_file:
+            for city in CITIES:
+                out_file.write(city + "\n")
+
+    @staticmethod
+    def write_lexicon(file_name: str):
+        """
+        Writes a polarity lexicon of the mood words for SentimentAnalyser.
+
+        :param file_name: Path to text file
+        """
+
+        with open(file_name, 'w', encoding='utf-8') as out_file:
+            for word, polarity in LEXICON.items():
+                out_file.write(f"{word}\t{polarity}\n")
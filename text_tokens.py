@@ -0,0 +1,169 @@
+from array import array
+
+# Characters that are removed from every word (hashtags, dots and commas in front of or behind words)
+STRIP_CHARACTERS = str.maketrans("", "", "#.,")
+
+
+def normalize_word(word: str):
+    """
+    Normalizes one word of a text the same way for all consumers.
+
+    :param word: Word, e.g. "#Berlin,"
+    :return: Token, e.g. "Berlin"
+    """
+
+    return word.translate(STRIP_CHARACTERS)
+
+
+class Vocabulary:
+    """
+    Interns tokens, every distinct token is stored once and referenced by its id.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.ids = {}
+        self.tokens = []
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def intern(self, token: str):
+        """
+        Returns the id of a token, unknown tokens are added.
+
+        :param token: Token
+        :return: Token id
+        """
+
+        token_id = self.ids.get(token)
+        if token_id is None:
+            token_id = self.ids[token] = len(self.tokens)
+            self.tokens.append(token)
+
+        return token_id
+
+    def id_set(self, tokens):
+        """
+        Interns a set of key tokens, e.g. the city keys.
+
+        :param tokens: Iterable of tokens
+        :return: Set of token ids
+        """
+
+        return {self.intern(token) for token in tokens}
+
+
+class TokenizedTexts:
+    """
+    Token representation of many texts: the token ids of all texts in one flat array and the start offset of every
+    text (text i has the tokens token_ids[offsets[i]:offsets[i + 1]]). Each text is split and normalized once, all
+    consumers compare token ids instead of strings.
+    """
+
+    def __init__(self, vocabulary=None):
+        """
+        Constructor.
+
+        :param vocabulary: Shared vocabulary, so token ids of several columns can be compared
+        """
+
+        self.vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+        self.token_ids = array('q')
+        self.offsets = array('q', [0])
+
+    @classmethod
+    def from_texts(cls, texts, vocabulary=None):
+        """
+        Tokenizes texts.
+
+        :param texts: Iterable of texts, values that are no strings are empty texts
+        :param vocabulary: Optional shared vocabulary
+        :return: TokenizedTexts
+        """
+
+        tokenized = cls(vocabulary)
+        for text in texts:
+            tokenized.add(text)
+
+        return tokenized
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def add(self, text):
+        """
+        Splits a text at whitespace, normalizes the words and appends their token ids.
+
+        :param text: Text
+        :return: Row index of the text
+        """
+
+        if isinstance(text, str):
+            intern = self.vocabulary.intern
+            self.token_ids.extend([intern(normalize_word(word)) for word in text.split()])
+        self.offsets.append(len(self.token_ids))
+
+        return len(self) - 1
+
+    def ids(self, row: int):
+        """
+        Returns the token ids of one text.
+
+        :param row: Row index
+        :return: Array of token ids
+        """
+
+        return self.token_ids[self.offsets[row]:self.offsets[row + 1]]
+
+    def words(self, row: int):
+        """
+        Returns the normalized tokens of one text.
+
+        :param row: Row index
+        :return: List of tokens
+        """
+
+        tokens = self.vocabulary.tokens
+
+        return [tokens[token_id] for token_id in self.ids(row)]
+
+    def contains_any(self, key_ids: set):
+        """
+        Checks for every text if it contains one of the key tokens.
+
+        :param key_ids: Set of token ids
+        :return: List of booleans
+        """
+
+        return [not key_ids.isdisjoint(self.ids(row)) for row in range(len(self))]
+
+    def score(self, polarity: dict):
+        """
+        Scores every text with a lexicon as mean polarity of its tokens that are in the lexicon.
+
+        :param polarity: Dict token id -> polarity
+        :return: Array with one score per text, 0.0 for texts without lexicon token
+        """
+
+        import numpy as np
+
+        token_ids = np.frombuffer(self.token_ids, dtype=np.int64) if len(self.token_ids) else \
+            np.array([], dtype=np.int64)
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+
+        # Polarity per vocabulary entry, NaN for tokens that are not in the lexicon
+        weights = np.full(len(self.vocabulary), np.nan)
+        weights[list(polarity)] = list(polarity.values())
+        values = weights[token_ids]
+        hits = ~np.isnan(values)
+
+        # Row of every token, sums and counts per row
+        rows = np.repeat(np.arange(len(self)), np.diff(offsets))
+        sums = np.bincount(rows[hits], weights=values[hits], minlength=len(self))
+        counts = np.bincount(rows[hits], minlength=len(self))
+
+        return np.divide(sums, counts, out=np.zeros(len(self)), where=counts > 0)
@@ -1,11 +1,86 @@
-import json
+import os
+import math
+import json_io
 import configparser
-import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
+from array import array
 from datetime import datetime
-from pyvis.network import Network
-from geopy.geocoders import Nominatim
+from functools import lru_cache
+from geo_store import GeoTweetStore
+from tweet_table import TweetTable
+
+# Bounding box in the text of a place.geo payload (csv files store the repr of the dict)
+BBOX_PATTERN = r"""['"]bbox['"]:\s*\[\s*([-+.\deE]+)\s*,\s*([-+.\deE]+)\s*,\s*([-+.\deE]+)\s*,\s*([-+.\deE]+)\s*\]"""
+
+# Kilometers per degree latitude
+KM_PER_DEGREE = 111.2
+
+
+@lru_cache(maxsize=1)
+def germany_basemap():
+    """
+    Loads the outline of Germany from the Natural Earth dataset. The geometry is cached after the first call.
+
+    :return: Geodataframe with the geometry of Germany
+    """
+
+    import geopandas as gpd
+
+    countries = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
+
+    return countries[countries["name"] == "Germany"]
+
+
+def bbox_array(geos: list):
+    """
+    Parses the bounding boxes of place.geo payloads. Dicts (JSON files) are read directly, strings (csv files) are
+    parsed together with one vectorized regex.
+
+    :param geos: List of place.geo payloads (dict, string or None)
+    :return: Array of shape (n, 4) with west, south, east, north, NaN for payloads without bounding box
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    boxes = np.full((len(geos), 4), np.nan)
+    texts = {}
+    for row, geo in enumerate(geos):
+        if isinstance(geo, dict):
+            bbox = geo.get('bbox')
+            if bbox and len(bbox) == 4:
+                boxes[row] = bbox
+        elif isinstance(geo, str):
+            texts[row] = geo
+
+    if texts:
+        boxes[list(texts)] = pd.Series(list(texts.values()), dtype=object).str.extract(BBOX_PATTERN) \
+            .astype(float).to_numpy()
+
+    return boxes
+
+
+def bbox_centroids(geos: list):
+    """
+    Computes centroid and extent of the bounding boxes of place.geo payloads.
+
+    :param geos: List of place.geo payloads (dict, string or None)
+    :return: Arrays latitude, longitude and extent (diagonal in km), NaN for payloads without bounding box
+    """
+
+    import numpy as np
+
+    west, south, east, north = bbox_array(geos).T
+
+    # Boxes that cross the antimeridian
+    east = np.where(east < west, east + 360, east)
+    latitude = (south + north) / 2
+    longitude = (west + east) / 2
+    longitude = np.where(longitude > 180, longitude - 360, longitude)
+
+    width = (east - west) * KM_PER_DEGREE * np.cos(np.radians(latitude))
+    height = (north - south) * KM_PER_DEGREE
+
+    return latitude, longitude, np.hypot(width, height)
 
 
 class TweetMapper:
@@ -26,48 +101,72 @@ class TweetMapper:
         self.tweet_data = {}
         self.geo_tweets = []
         self.locations = {}
+        self.unresolved_locations = set()
         self.config = configparser.RawConfigParser()
         self.config.read(config_file)
+        self.geocoder = None
 
     @staticmethod
     def get_tweets(json_file: str):
         """
-        Gets a dataset filled with Tweets and saves them in a dictionary.
+        Gets a dataset filled with Tweets and saves them in a columnar table.
 
         :param json_file: JSON file containing Twitter data
+        :return: TweetTable
         """
 
-        with open(json_file, 'r', encoding='utf-8') as in_file:
-            data = json.load(in_file)
-
-        return data
+        return TweetTable.load(json_file)
 
     def extract_geo(self):
         """
         Extracts all Tweets from the dataset that have a Geo object attached.
         """
 
-        self.geo_tweets = {}
-        for tweet_id in self.tweet_data:
-            tweet = self.tweet_data[tweet_id]
+        if not isinstance(self.tweet_data, TweetTable):
+            self.tweet_data = TweetTable.from_items(self.tweet_data.items())
+
+        # Rows with a Geo object where all Geo fields are set, fields a Tweet does not have are not checked
+        present = self.tweet_data.section_mask('Geo')
+        geo = zip(present, *(self.tweet_data.column('Geo', field, True) for field in self.tweet_data.fields('Geo')))
+        self.geo_tweets = self.tweet_data.take([row for row, values in enumerate(geo) if all(values)])
+
+    @staticmethod
+    def load_geo_tweets(geo_tweets_file: str, country_code=None):
+        """
+        Loads Geo Tweets from a JSON file or a Geo Tweet store directory.
+
+        :param geo_tweets_file: Path to JSON / NDJSON file or store directory
+        :param country_code: Optional country code, only Tweets of this country are loaded
+        :return: Dict tweet_id -> Tweet
+        """
+
+        if GeoTweetStore.is_store(geo_tweets_file):
+            return GeoTweetStore(geo_tweets_file).load(country_code)
+        if country_code:
+            return dict(TweetMapper.iter_geo_tweets(geo_tweets_file, country_code))
 
-            if all(tweet['Geo'].values()):
-                self.geo_tweets[tweet_id] = tweet
+        return json_io.load(geo_tweets_file)
 
     def save_geo_tweets(self, data_file=None):
         """
-        Saves the extracted Tweets into a JSON file that can be expanded.
+        Saves the extracted Tweets into a JSON file or a Geo Tweet store that can be expanded.
 
-        :param data_file: If a data file is given, the values are attached to the file
+        :param data_file: If a store directory is given, the Tweets are appended to the store. NDJSON files are expanded
+                          by appending lines (readers keep the last line of a Tweet), new JSON files are written once
         """
 
-        if data_file is not None:
+        if data_file is not None and GeoTweetStore.is_store(data_file):
+            GeoTweetStore(data_file).append(self.geo_tweets)
+        elif data_file is not None and json_io.is_ndjson(data_file):
             with open(data_file, 'a', encoding='utf-8') as out_file:
-                json.dump(self.geo_tweets, out_file, ensure_ascii=False, indent=4)
+                json_io.write_lines(self.geo_tweets.values(), out_file)
+        elif data_file is not None:
+            if os.path.exists(data_file):
+                raise ValueError(f"Appending to a JSON file is not supported, use NDJSON or a store: {data_file}")
+            json_io.dump(self.geo_tweets, data_file)
         else:
             time = datetime.now().strftime("%d-%m-%Y_%H-%M")
-            with open('Geo_Tweets_' + time + '.json', 'w', encoding='utf-8') as out_file:
-                json.dump(self.geo_tweets, out_file, ensure_ascii=False, indent=4)
+            json_io.dump(self.geo_tweets, 'Geo_Tweets_' + time + '.json')
 
     def extract_geo_tweets(self):
         """
@@ -85,32 +184,102 @@ class TweetMapper:
         :param json_file: JSON file that contains the information
         """
 
-        with open(json_file, "r", encoding="utf-8") as in_file:
-            self.locations = json.load(in_file)
+        self.locations = json_io.load(json_file)
+
+    def collect_places(self, country_code='DE'):
+        """
+        Collects the distinct place names of the Geo Tweets.
+
+        :param country_code: Country code of the Tweets
+        :return: Set of place names
+        """
+
+        return {tweet['Geo']['Name'] for _, tweet in self.iter_geo_tweets(self.geo_tweets_json_file, country_code)
+                if tweet['Geo']['Country_Code'] == country_code}
+
+    def unresolved_places(self, places):
+        """
+        Returns the places that are not in the locations database or could not be resolved before.
+
+        :param places: Iterable of place names
+        :return: Set of place names
+        """
+
+        return {place for place in places
+                if self.locations.get(place) is None or self.locations[place]['Latitude'] == "n/a"}
+
+    def collect_place_geos(self, country_code='DE'):
+        """
+        Collects the distinct place names of the Geo Tweets with the place.geo payload of their first Tweet.
 
-    def update_locations(self):
+        :param country_code: Country code of the Tweets
+        :return: Dict place name -> place.geo payload
+        """
+
+        geos = {}
+        for _, tweet in self.iter_geo_tweets(self.geo_tweets_json_file, country_code):
+            if tweet['Geo']['Country_Code'] == country_code and not geos.get(tweet['Geo']['Name']):
+                geos[tweet['Geo']['Name']] = tweet['Geo'].get('Geo')
+
+        return geos
+
+    @staticmethod
+    def bbox_locations(geos: dict):
+        """
+        Derives the coordinates of places from the bounding boxes Twitter attaches to every place.
+
+        :param geos: Dict place name -> place.geo payload
+        :return: Dict place name -> location with latitude, longitude and extent of the box (km), only places with a
+                 bounding box
+        """
+
+        names = list(geos)
+        latitude, longitude, extent = bbox_centroids([geos[name] for name in names])
+
+        return {name: {"Latitude": round(float(lat), 6), "Longitude": round(float(lon), 6),
+                       "Extent_Km": round(float(km), 1)}
+                for name, lat, lon, km in zip(names, latitude, longitude, extent) if lat == lat and lon == lon}
+
+    def update_locations(self, places=None):
         """
         Creates a location file with latitude and longitude for all locations found in the geo Tweets.
+        Only places that are not resolved yet are resolved. The centroid of the place bounding box is used if the
+        Tweets have one, only the remaining places are geocoded.
+
+        :param places: Optional place names to resolve, e.g. the unresolved places of add_locations
+        :return: Set of places that got coordinates
         """
 
-        # Create dataframe with Geo Tweets
-        self.geo_tweets = pd.read_json(self.geo_tweets_json_file, orient='index', convert_axes=False)
+        # Places of all Tweets with country code = DE and their bounding boxes
+        geos = self.collect_place_geos('DE')
+        if places is None:
+            places = set(geos)
 
-        # Add locations to all Tweets with country code = DE
-        for i in range(len(self.geo_tweets['Geo'])):
-            if self.geo_tweets['Geo'][i]['Country_Code'] == 'DE':
-                if self.geo_tweets['Geo'][i]['Name'] not in self.locations:
-                    self.locations[self.geo_tweets['Geo'][i]['Name']] = None
+        # Unknown places and places that could not be resolved before
+        missing = self.unresolved_places(places)
 
-        # Get longitude / latitude from city name with Nominatim API
-        for place in self.locations.keys():
-            if self.locations[place] is None:
-                geolocator = Nominatim(user_agent=self.config["nominatim"]["user_agent"])
-                location = geolocator.geocode(place, country_codes='de')
-                if location is None:
-                    self.locations[place] = {"Latitude": "n/a", "Longitude": "n/a"}
-                else:
-                    self.locations[place] = {"Latitude": location.latitude, "Longitude": location.longitude}
+        # Centroids of the bounding boxes
+        boxes = self.bbox_locations({place: geos.get(place) for place in missing})
+        self.locations.update(boxes)
+        missing -= set(boxes)
+        print("Locations from bounding boxes:", len(boxes))
+
+        if not missing:
+            return set(boxes)
+
+        # Get longitude / latitude from city name with cache, gazetteer and Nominatim API
+        if self.geocoder is None:
+            from geocoding import Geocoder
+            self.geocoder = Geocoder.from_config(self.config)
+        results = self.geocoder.geocode_many(missing, country_codes='de')
+
+        for place in missing:
+            if results[place] is None:
+                self.locations[place] = {"Latitude": "n/a", "Longitude": "n/a"}
+            else:
+                self.locations[place] = results[place]
+
+        return set(boxes) | {place for place in missing if results[place] is not None}
 
     def save_locations(self, locations_database=None):
         """
@@ -118,28 +287,43 @@ class TweetMapper:
         """
 
         if locations_database is not None:
-            with open(locations_database, "w", encoding='utf-8') as out_file:
-                json.dump(self.locations, out_file, indent=4)
+            json_io.dump(self.locations, locations_database, json_io.COMPACT)
         else:
             time = datetime.now().strftime("%d-%m-%Y_%H-%M")
-            with open('locations_database_' + time + '.json', 'w', encoding='utf-8') as out_file:
-                json.dump(self.locations, out_file, ensure_ascii=False, indent=4)
+            json_io.dump(self.locations, 'locations_database_' + time + '.json', json_io.COMPACT)
 
-    def add_locations(self):
+    def add_locations(self, out_file=None, country_code='DE'):
         """
-        Adds longitude and latitude to the Geo Tweets.
+        Adds longitude and latitude to the Geo Tweets. The locations database is used as hash table that is probed once
+        per Tweet while the Tweets are streamed to the output. Place names of the country without coordinates are
+        collected in self.unresolved_locations.
+
+        :param out_file: Optional output file / store directory, default overwrites the Geo Tweets
+        :param country_code: Country code of the places that are geocoded, other places are not collected
+        :return: Set of unresolved place names
         """
 
-        with open(self.geo_tweets_json_file, "r", encoding="utf-8") as in_file:
-            self.geo_tweets = json.load(in_file)
+        out_file = out_file or self.geo_tweets_json_file
 
-            for entry in self.geo_tweets.keys():
-                location = self.geo_tweets[entry]['Geo']['Name']
-                if location in self.locations.keys():
-                    self.geo_tweets[entry]['Geo']['Place'] = self.locations[location]
+        self.unresolved_locations = set()
 
-        with open(self.geo_tweets_json_file, 'w', encoding="utf-8") as out_file:
-            json.dump(self.geo_tweets, out_file, indent=4)
+        def enriched():
+            for tweet_id, tweet in self.iter_geo_tweets(self.geo_tweets_json_file):
+                place = self.locations.get(tweet['Geo']['Name'])
+                if place is not None:
+                    tweet['Geo']['Place'] = place
+                if (place is None or place['Latitude'] == "n/a") and tweet['Geo'].get('Country_Code') == country_code:
+                    self.unresolved_locations.add(tweet['Geo']['Name'])
+                yield tweet_id, tweet
+
+        if GeoTweetStore.is_store(out_file):
+            GeoTweetStore(out_file).rewrite(enriched())
+        else:
+            json_io.dump_items(enriched(), out_file, json_io.NDJSON if json_io.is_ndjson(out_file) else None)
+
+        print("Unresolved locations:", len(self.unresolved_locations))
+
+        return self.unresolved_locations
 
     def extract_locations(self, locations_database):
         """
@@ -157,49 +341,107 @@ class TweetMapper:
             self.save_locations()
 
     @staticmethod
-    def plot_geo_data(json_file: str, file_name: str):
+    def iter_geo_tweets(geo_tweets_file: str, country_code=None):
         """
-        Plots the Geo Tweet data on a map of Germany.
+        Streams Geo Tweets from a JSON file or a Geo Tweet store directory.
 
-        :param json_file: Path to Geo Tweet file
-        :param file_name: File name for output
+        :param geo_tweets_file: Path to JSON / NDJSON file or store directory
+        :param country_code: Optional country code, only Tweets of this country are streamed
+        :return: Generator of (tweet_id, tweet) tuples
+        """
+
+        if GeoTweetStore.is_store(geo_tweets_file):
+            return GeoTweetStore(geo_tweets_file).iter_tweets(country_code)
+
+        tweets = json_io.iter_tweets(geo_tweets_file)
+        if json_io.is_ndjson(geo_tweets_file):
+            # Appended NDJSON files can contain a Tweet more than once, the last line wins
+            last = {tweet_id: position for position, (tweet_id, _) in enumerate(json_io.iter_tweets(geo_tweets_file))}
+            tweets = ((tweet_id, tweet) for position, (tweet_id, tweet) in enumerate(tweets)
+                      if last[tweet_id] == position)
+        if country_code:
+            return ((tweet_id, tweet) for tweet_id, tweet in tweets
+                    if GeoTweetStore.partition_name(tweet) == country_code)
+
+        return tweets
+
+    @staticmethod
+    def load_geo_points(geo_tweets_file: str, country_code='DE'):
+        """
+        Loads coordinates and sentiment of the Geo Tweets into typed arrays. Tweets without coordinates ("n/a") or
+        sentiment are dropped.
+
+        :param geo_tweets_file: Path to Geo Tweet file or store directory
+        :param country_code: Country code of the Tweets
+        :return: Dict with the arrays Latitude, Longitude, Sentiment (float) and Created_At (datetime64)
+        """
+
+        import numpy as np
+        import pandas as pd
+
+        def to_float(value):
+            # "n/a" and missing values become NaN
+            return value if isinstance(value, (int, float)) else math.nan
+
+        latitude, longitude, sentiment, created_at = array('d'), array('d'), array('d'), []
+        for _, tweet in TweetMapper.iter_geo_tweets(geo_tweets_file, country_code):
+            geo = tweet['Geo']
+            if geo['Country_Code'] != country_code:
+                continue
+            place = geo.get('Place') or {}
+            latitude.append(to_float(place.get('Latitude')))
+            longitude.append(to_float(place.get('Longitude')))
+            sentiment.append(to_float(tweet['Data'].get('Sentiment')))
+            created_at.append(tweet['Data']['Created_At'])
+
+        points = {'Latitude': np.frombuffer(latitude, dtype=np.float64),
+                  'Longitude': np.frombuffer(longitude, dtype=np.float64),
+                  'Sentiment': np.frombuffer(sentiment, dtype=np.float64),
+                  'Created_At': pd.to_datetime(pd.Series(created_at, dtype=object), utc=True).to_numpy()}
+
+        # Drops points with no location data
+        mask = np.isfinite(points['Latitude']) & np.isfinite(points['Longitude']) & np.isfinite(points['Sentiment'])
+
+        return {key: values[mask] for key, values in points.items()}
+
+    @staticmethod
+    def plot_geo_data(json_file: str, file_name: str, kind='auto', max_scatter_points=50000, gridsize=80):
         """
+        Plots the Geo Tweet data on a map of Germany. Large datasets are aggregated to hexagons with the mean sentiment
+        instead of one marker per Tweet.
 
-        with open(json_file, 'r', encoding='utf-8') as in_file:
-            data = json.load(in_file)
+        :param json_file: Path to Geo Tweet file or store directory
+        :param file_name: File name for output
+        :param kind: 'scatter', 'hexbin' or 'auto' (hexbin above max_scatter_points)
+        :param max_scatter_points: Number of points up to which 'auto' draws a scatter plot
+        :param gridsize: Number of hexagons in x-direction
+        """
 
-            # Creates dataframe with essential information
-            df = {}
-            for entry in data.keys():
-                values = data[entry]
-                if values['Geo']['Country_Code'] == 'DE':
-                    df[values['Data']['Id']] = {'User': values['User']['Id'],
-                                                'Latitude': values['Geo']['Place']['Latitude'],
-                                                'Longitude': values['Geo']['Place']['Longitude'],
-                                                'Sentiment': values['Data']['Sentiment'],
-                                                'Created_At': values['Data']['Created_At']}
+        import numpy as np
+        import matplotlib.pyplot as plt
 
-            df = pd.DataFrame.from_dict(df, orient='Index')
+        points = TweetMapper.load_geo_points(json_file, 'DE')
 
-            # Drops rows with no location data
-            to_drop = []
-            for index, row in df.iterrows():
-                if row['Latitude'] == "n/a" or row['Longitude'] == "n/a":
-                    to_drop.append(index)
-            df = df.drop(to_drop)
+        # Centimeters in inches
+        cm = 1 / 2.54
+        # Plots data
+        fig, ax = plt.subplots(figsize=(21*cm, 29*cm))
 
-            # Centimeters in inches
-            cm = 1 / 2.54
-            # Plots data
-            fig, ax = plt.subplots(figsize=(21*cm, 29*cm))
+        germany_basemap().plot(color="lightgrey", ax=ax)
 
-            countries = gpd.read_file(gpd.datasets.get_path("naturalearth_lowres"))
-            countries[countries["name"] == "Germany"].plot(color="lightgrey", ax=ax)
+        if kind == 'hexbin' or (kind == 'auto' and len(points['Sentiment']) > max_scatter_points):
+            image = ax.hexbin(points['Longitude'], points['Latitude'], C=points['Sentiment'], reduce_C_function=np.mean,
+                              gridsize=gridsize, cmap="Blues", mincnt=1)
+        else:
+            image = ax.scatter(points['Longitude'], points['Latitude'], c=points['Sentiment'], cmap="Blues", s=10)
 
-            df.plot(x="Longitude", y="Latitude", kind="scatter", c="Sentiment", colormap="Blues",
-                    title=f"Distribution Germany", ax=ax)
+        fig.colorbar(image, ax=ax, label="Sentiment")
+        ax.set_title("Distribution Germany")
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
 
-            plt.savefig(file_name + ".pdf")
+        plt.savefig(file_name + ".pdf")
+        plt.close(fig)
 
     @staticmethod
     def create_nodes_and_edges(df):
@@ -210,100 +452,56 @@ class TweetMapper:
         :return: Dict for all nodes and dict for all edges
         """
 
-        place_nodes, track_nodes, user_nodes = {}, {}, {}
-        edges = {}
-        for index, row in df.iterrows():
-            # Save user_id
-            user = row['user_id']
-
-            # Get starting points and destinations
-            starting, ending, unassigned = [], [], []
-            if row['hometowns'] != "NaN":
-                starting = row['hometowns'].split()
-            if row['destinations'] != "NaN":
-                ending = row['destinations'].split()
-
-            # Create all tracks
-            if starting and not ending:
-                for entry in starting:
-                    if entry in place_nodes.keys():
-                        place_nodes[entry] += 1
-                    else:
-                        place_nodes[entry] = 1
-                    # Save information as edge
-                    if entry in edges.keys():
-                        edges[(user, entry)] += 1
-                    else:
-                        edges[(user, entry)] = 1
-            elif ending and not starting:
-                for entry in ending:
-                    if entry in place_nodes.keys():
-                        place_nodes[entry] += 1
-                    else:
-                        place_nodes[entry] = 1
-                    # Save information as edge
-                    if entry in edges.keys():
-                        edges[(user, entry)] += 1
-                    else:
-                        edges[(user, entry)] = 1
-            else:
-                for start in starting:
-                    for end in ending:
-                        track = start + " --> " + end
-                        if track in track_nodes.keys():
-                            track_nodes[track] += 1
-                        else:
-                            track_nodes[track] = 1
-                        # Save information as edge
-                        if track in edges.keys():
-                            edges[(user, track)] += 1
-                        else:
-                            edges[(user, track)] = 1
-
-            if row['unassigned_locations'] != "NaN":
-                unassigned = row['unassigned_locations'].split()
-
-            if unassigned:
-                for entry in unassigned:
-                    if entry in place_nodes.keys():
-                        place_nodes[entry] += 1
-                    else:
-                        place_nodes[entry] = 1
-                    # Save information as edge
-                    if entry in edges.keys():
-                        edges[(user, entry)] += 1
-                    else:
-                        edges[(user, entry)] = 1
-
-            if user in user_nodes.keys():
-                user_nodes[user] += 1
-            else:
-                user_nodes[user] = 1
+        from relation_graph import RelationGraph
 
-        return {**track_nodes, **place_nodes, **user_nodes}, edges
+        graph = RelationGraph.from_dataframe(df)
 
-    def plot_new_data(self, csv_file: str, separator: str):
+        return graph.nodes(), graph.edges()
+
+    def plot_new_data(self, csv_file: str, separator: str, output='html', file_name='track_impact',
+                      min_user_degree=1, top_tracks=None):
         """
-        Creates the relationship graph for users and tracks.
+        Creates the relationship graph for users and tracks. For large graphs users with few edges can be collapsed
+        into user groups per place and only the top tracks kept. The layout is precomputed, so the browser does not
+        need to run the physics simulation.
 
         :param csv_file: Path to csv file
         :param separator: Seperator for csv file
+        :param output: 'html' (pyvis), 'json' (compact graph with layout), 'graphml' or 'edgelist'
+        :param file_name: File name for output without ending
+        :param min_user_degree: Users with fewer edges are collapsed into user groups
+        :param top_tracks: Number of tracks that are kept, None keeps all tracks
         """
 
+        import pandas as pd
+        from relation_graph import RelationGraph
+
         # Create dataframe from csv
         # Example row: 79$1543858536228290560$2022-07-04 07:25:33+00:00$Okay, ich pendle ...$159233006$
         # 2010-06-24 20:50:10+00:00$Augsburg München$München$Kissing
         df = pd.read_csv(csv_file, sep=separator, na_values=" NaN")
         df = df.fillna("NaN")
 
-        net = Network(height='100%', width='100%')
+        graph = RelationGraph.from_dataframe(df)
+        if min_user_degree > 1 or top_tracks is not None:
+            graph = graph.reduce(min_user_degree, top_tracks)
 
-        nodes, edges = self.create_nodes_and_edges(df)
+        if output == 'json':
+            graph.save_json(file_name)
+        elif output == 'graphml':
+            graph.save_graphml(file_name)
+        elif output == 'edgelist':
+            graph.save_edge_list(file_name)
+        else:
+            graph.compute_layout()
 
-        for node in nodes.keys():
-            net.add_node(node, value=nodes[node], label=str(node))
+            from pyvis.network import Network
 
-        for edge in edges.keys():
-            net.add_edge(edge[0], edge[1], weight=edges[edge])
+            net = Network(height='100%', width='100%')
+            net.add_nodes(list(range(len(graph.node_names))), value=graph.node_weights.tolist(),
+                          label=[str(name) for name in graph.node_names], x=graph.node_x.tolist(),
+                          y=graph.node_y.tolist())
+            net.add_edges(zip(graph.edge_source.tolist(), graph.edge_target.tolist(), graph.edge_weights.tolist()))
+            net.toggle_physics(False)
 
-        net.show("track_impact.html")
+            net.write_html(file_name + ".html")
@@ -0,0 +1,201 @@
+import csv
+from array import array
+
+# Column order of the storage csv files
+STORAGE_COLUMNS = ["tweet.id", "tweet.created_at", "tweet.text", "tweet.source", "tweet.retweet_count",
+                   "tweet.reply_count", "tweet.like_count", "tweet.quote_count", "tweet.hashtags", "tweet.lang",
+                   "user.id", "user.name", "user.location", "user.created_at", "place.id", "place.name",
+                   "place.country_code", "place.geo", "place.place_type"]
+
+# Column order of the user history files of HistorySearcher.pull_user_histories_deep
+HISTORY_COLUMNS = ["tweet.id", "tweet.created_at", "tweet.text", "user.id"]
+
+# Columns that are stored as 64 bit integers
+INT_COLUMNS = {"tweet.id", "tweet.retweet_count", "tweet.reply_count", "tweet.like_count", "tweet.quote_count",
+               "user.id"}
+
+
+class TweetRecords:
+    """
+    Column buffers for downloaded Tweets. Ids and metrics are kept as native integers in arrays, times as datetime
+    objects and all other fields as python objects. The conversion to separator safe text only happens when the
+    records are written to a storage file.
+    """
+
+    def __init__(self, columns=None):
+        """
+        Constructor.
+
+        :param columns: Column names, default are the storage csv columns
+        """
+
+        self.columns = list(columns or STORAGE_COLUMNS)
+        self.buffers = {column: array('q') if column in INT_COLUMNS else [] for column in self.columns}
+        # Rows of integer columns that are None, the buffer holds a 0 there
+        self.missing = {column: set() for column in self.columns if column in INT_COLUMNS}
+
+    def __len__(self):
+        return len(self.buffers[self.columns[0]])
+
+    def append(self, *values):
+        """
+        Appends one record with the values in column order.
+
+        :param values: Field values
+        """
+
+        row = len(self)
+        for column, value in zip(self.columns, values):
+            if column in self.missing:
+                if value is None:
+                    self.missing[column].add(row)
+                    value = 0
+                self.buffers[column].append(value)
+            else:
+                self.buffers[column].append(value)
+
+    def extend_column(self, column: str, values: list, start: int):
+        """
+        Appends the values of one column of a batch to the column buffer.
+
+        :param column: Column name
+        :param values: Values of the batch
+        :param start: First row of the batch
+        """
+
+        if column in self.missing:
+            missing = [index for index, value in enumerate(values) if value is None]
+            if missing:
+                self.missing[column].update(start + index for index in missing)
+                values = [0 if value is None else value for value in values]
+        self.buffers[column].extend(values)
+
+    def add_batch(self, tweets: list, users=None, places=None):
+        """
+        Adds a batch of Tweets of one API response column by column. The columns are built once and appended to the
+        buffers.
+
+        :param tweets: Tweet objects of the response
+        :param users: Dict user id -> user object of the response includes
+        :param places: Dict place id -> place object of the response includes
+        :return: Number of added Tweets
+        """
+
+        start, number = len(self), len(tweets)
+
+        batch_users = [users.get(tweet.author_id) if users else None for tweet in tweets]
+        batch_places = [places.get(tweet.geo["place_id"]) if tweet.geo and places else None for tweet in tweets]
+        metrics = [tweet.public_metrics or {} for tweet in tweets]
+
+        columns = {
+            "tweet.id": [tweet.id for tweet in tweets],
+            "tweet.created_at": [tweet.created_at for tweet in tweets],
+            "tweet.text": [tweet.text.strip().replace("\n", " ") for tweet in tweets],
+            "tweet.source": [tweet.source for tweet in tweets],
+            "tweet.retweet_count": [metric.get("retweet_count") for metric in metrics],
+            "tweet.reply_count": [metric.get("reply_count") for metric in metrics],
+            "tweet.like_count": [metric.get("like_count") for metric in metrics],
+            "tweet.quote_count": [metric.get("quote_count") for metric in metrics],
+            "tweet.hashtags": [tweet.entities.get("hashtags") if tweet.entities else None for tweet in tweets],
+            "tweet.lang": [tweet.lang for tweet in tweets]}
+
+        for column, field in (("user.id", "id"), ("user.name", "name"), ("user.location", "location"),
+                              ("user.created_at", "created_at")):
+            columns[column] = [getattr(user, field) if user else None for user in batch_users]
+
+        for column, field in (("place.id", "id"), ("place.name", "name"), ("place.country_code", "country_code"),
+                              ("place.geo", "geo"), ("place.place_type", "place_type")):
+            columns[column] = [getattr(place, field) if place else None for place in batch_places]
+
+        for column in self.columns:
+            self.extend_column(column, columns[column], start)
+
+        return number
+
+    def value(self, column: str, row: int):
+        """
+        Returns one field with its native type.
+
+        :param column: Column name
+        :param row: Row index
+        :return: Value, None for missing values
+        """
+
+        if column in self.missing and row in self.missing[column]:
+            return None
+
+        return self.buffers[column][row]
+
+    def rows(self):
+        """
+        Returns the records with native types.
+
+        :return: Generator of tuples in column order
+        """
+
+        for row in range(len(self)):
+            yield tuple(self.value(column, row) for column in self.columns)
+
+    def text_rows(self, separator='$', replacement='€'):
+        """
+        Returns the records as separator safe text. Integer columns are formatted without replacement.
+
+        :param separator: Seperator of the storage file
+        :param replacement: Replacement for the separator in the text
+        :return: Generator of string lists in column order
+        """
+
+        columns = []
+        for column in self.columns:
+            if column in self.missing:
+                missing = self.missing[column]
+                columns.append(["None" if row in missing else str(value)
+                                for row, value in enumerate(self.buffers[column])] if missing
+                               else list(map(str, self.buffers[column])))
+            else:
+                columns.append([str(value).replace(separator, replacement) for value in self.buffers[column]])
+
+        return map(list, zip(*columns))
+
+    def write_csv(self, file_name: str, separator='$', replacement='€', header=None):
+        """
+        Writes the records as storage csv file with index column (same layout as pandas.DataFrame.to_csv).
+
+        :param file_name: Path to csv file
+        :param separator: Seperator for csv file
+        :param replacement: Replacement for the separator in the text
+        :param header: Optional column names for the file, default are the record columns
+        :return: Number of written records
+        """
+
+        with open(file_name, 'w', encoding='utf-8', newline='') as out_file:
+            writer = csv.writer(out_file, delimiter=separator, lineterminator='\n')
+            writer.writerow([""] + list(header or self.columns))
+            writer.writerows([index] + row for index, row in enumerate(self.text_rows(separator, replacement)))
+
+        return len(self)
+
+    def to_dataframe(self):
+        """
+        Creates a dataframe with int64 columns for ids and metrics (nullable Int64 if values are missing).
+
+        :return: Dataframe
+        """
+
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for column in self.columns:
+            if column in self.missing:
+                values = np.frombuffer(self.buffers[column], dtype=np.int64) if len(self) else \
+                    np.array([], dtype=np.int64)
+                if self.missing[column]:
+                    mask = np.zeros(len(self), dtype=bool)
+                    mask[list(self.missing[column])] = True
+                    values = pd.arrays.IntegerArray(values.copy(), mask)
+                data[column] = values
+            else:
+                data[column] = self.buffers[column]
+
+        return pd.DataFrame(data, columns=self.columns)
@@ -0,0 +1,653 @@
+from array import array
+from itertools import islice
+from collections.abc import Mapping, MutableMapping
+import json_io
+from text_tokens import Vocabulary
+
+# Storage kinds of the columns
+INT = 'int'
+FLOAT = 'float'
+POOLED = 'pooled'
+OBJECT = 'object'
+
+# Kinds of the known fields, integers and floats are stored in native arrays, repeated strings are interned
+SCHEMA = {
+    "Data": {"Id": INT, "Created_At": OBJECT, "Text": OBJECT, "Tweet_Source": POOLED, "Retweet_Count": INT,
+             "Reply_Count": INT, "Like_Count": INT, "Quote_Count": INT, "Language": POOLED, "Sentiment": FLOAT},
+    "User": {"Id": INT, "Name": POOLED, "Location": POOLED, "Created_At": POOLED},
+    "Geo": {"Id": POOLED, "Name": POOLED, "Country_Code": POOLED, "Geo": OBJECT, "Type": POOLED, "Place": OBJECT}}
+
+# Marker for fields a Tweet does not have
+ABSENT = object()
+
+# Reserved codes of pooled columns, string codes start at RESERVED_CODES
+EXCEPTION_CODE = 0
+NONE_CODE = 1
+ABSENT_CODE = 2
+RESERVED_CODES = 3
+
+
+class Column:
+    """
+    Values of one field of all Tweets. Values that do not fit the kind of the column (NaN in an integer column, a
+    number in a string column, ...) are kept as exceptions, so every Tweet is returned exactly as it was added.
+    Pooled columns store None and ABSENT as reserved codes, the other kinds as exceptions.
+    """
+
+    def __init__(self, kind: str, pool: Vocabulary):
+        """
+        Constructor.
+
+        :param kind: INT, FLOAT, POOLED or OBJECT
+        :param pool: String pool of the table
+        """
+
+        self.kind = kind
+        self.pool = pool
+        self.values = array('q') if kind in (INT, POOLED) else array('d') if kind == FLOAT else []
+        # Row -> value that is not stored in the array
+        self.exceptions = {}
+        # Code -> value of pooled columns, rebuilt when the pool grew
+        self.decode = []
+
+    @classmethod
+    def from_values(cls, kind: str, pool: Vocabulary, values: list):
+        """
+        Creates a column from all values at once.
+
+        :param kind: INT, FLOAT, POOLED or OBJECT
+        :param pool: String pool of the table
+        :param values: List of values
+        :return: Column
+        """
+
+        # Columns where most values do not fit the kind (e.g. a float column of pandas) are stored as objects
+        if kind in (INT, FLOAT):
+            number_type = int if kind == INT else float
+            if sum(type(value) is number_type for value in values) * 2 < len(values):
+                kind = OBJECT
+
+        column = cls(kind, pool)
+        column.extend(values)
+
+        return column
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, row: int, value):
+        """
+        Converts a value to its array representation, values that do not fit are stored as exception.
+
+        :param row: Row index
+        :param value: Value
+        :return: Array value
+        """
+
+        kind = self.kind
+        self.exceptions.pop(row, None)
+        if kind == INT and type(value) is int and -2 ** 63 <= value < 2 ** 63 or kind == FLOAT and \
+                type(value) is float:
+            return value
+        if kind == POOLED:
+            if type(value) is str:
+                return self.pool.intern(value) + RESERVED_CODES
+            if value is None:
+                return NONE_CODE
+            if value is ABSENT:
+                return ABSENT_CODE
+
+        self.exceptions[row] = value
+        return EXCEPTION_CODE
+
+    def extend(self, values: list):
+        """
+        Appends the values of the next rows.
+
+        :param values: List of values
+        """
+
+        start = len(self.values)
+        kind = self.kind
+        if kind == OBJECT:
+            self.values.extend(values)
+        elif kind == INT and all(type(value) is int for value in values) or kind == FLOAT and \
+                all(type(value) is float for value in values):
+            try:
+                self.values.extend(array(self.values.typecode, values))
+            except OverflowError:
+                self.values.extend(self.encode(row, value) for row, value in enumerate(values, start))
+        elif kind == POOLED:
+            ids = self.pool.ids
+            self.values.extend([ids[value] + RESERVED_CODES if type(value) is str and value in ids else
+                                self.encode(row, value) for row, value in enumerate(values, start)])
+        else:
+            self.values.extend(self.encode(row, value) for row, value in enumerate(values, start))
+
+    def get(self, row: int):
+        """
+        Returns the value of a row.
+
+        :param row: Row index
+        :return: Value, ABSENT if the Tweet does not have the field
+        """
+
+        value = self.values[row]
+        if self.kind == OBJECT:
+            return value
+        if self.kind == POOLED:
+            if value >= RESERVED_CODES:
+                return self.pool.tokens[value - RESERVED_CODES]
+            return None if value == NONE_CODE else ABSENT if value == ABSENT_CODE else self.exceptions[row]
+        if self.exceptions and row in self.exceptions:
+            return self.exceptions[row]
+
+        return value
+
+    def set(self, row: int, value):
+        """
+        Replaces the value of a row.
+
+        :param row: Row index
+        :param value: Value
+        """
+
+        if self.kind == OBJECT:
+            self.values[row] = value
+        else:
+            self.values[row] = self.encode(row, value)
+
+    def tolist(self, default=ABSENT, start=0, stop=None):
+        """
+        Returns the values of a range of rows.
+
+        :param default: Value for Tweets that do not have the field
+        :param start: First row
+        :param stop: End of the range, default is the last row
+        :return: List of values
+        """
+
+        stop = len(self.values) if stop is None else stop
+        if self.kind == POOLED:
+            if len(self.decode) != RESERVED_CODES + len(self.pool.tokens):
+                self.decode = [None, None, ABSENT] + self.pool.tokens
+            decode = self.decode
+            values = [decode[code] for code in self.values[start:stop]]
+        else:
+            values = list(self.values[start:stop])
+
+        for row, value in self.exceptions.items():
+            if start <= row < stop:
+                values[row - start] = value
+
+        if default is not ABSENT:
+            values = [default if value is ABSENT else value for value in values]
+
+        return values
+
+    def take(self, rows: list):
+        """
+        Returns a column with the values of some rows.
+
+        :param rows: Row indices
+        :return: Column
+        """
+
+        column = Column(self.kind, self.pool)
+        values = self.values
+        column.values = type(values)(values.typecode, [values[row] for row in rows]) if self.kind != OBJECT \
+            else [values[row] for row in rows]
+        column.exceptions = {new: self.exceptions[row] for new, row in enumerate(rows) if row in self.exceptions}
+
+        return column
+
+
+class RecordView(MutableMapping):
+    """
+    Sub-record (Data, User or Geo) of one Tweet, reads and writes go directly to the columns of the table.
+    """
+
+    __slots__ = ('table', 'section', 'row')
+
+    def __init__(self, table, section: str, row: int):
+        self.table = table
+        self.section = section
+        self.row = row
+
+    def __getitem__(self, field):
+        column = self.table.columns.get((self.section, field))
+        value = ABSENT if column is None else column.get(self.row)
+        if value is ABSENT:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        self.table.set_value(self.section, field, self.row, value)
+
+    def __delitem__(self, field):
+        self[field]
+        self.table.set_value(self.section, field, self.row, ABSENT)
+
+    def __iter__(self):
+        for field in self.table.layout[self.section]:
+            if self.table.columns[(self.section, field)].get(self.row) is not ABSENT:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TweetView(MutableMapping):
+    """
+    One Tweet of the table with the sections Data, User, Geo, Hashtags, ... as keys.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row: int):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, section):
+        value = self.table.section_value(section, self.row)
+        if value is ABSENT:
+            raise KeyError(section)
+        return value
+
+    def __setitem__(self, section, value):
+        self.table.set_section(section, self.row, value)
+
+    def __delitem__(self, section):
+        self[section]
+        self.table.set_section(section, self.row, ABSENT)
+
+    def __iter__(self):
+        for section in self.table.layout:
+            if self.table.section_value(section, self.row) is not ABSENT:
+                yield section
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(self.table.record(self.row))
+
+
+class TweetTable(Mapping):
+    """
+    Columnar in-memory Tweet corpus. Every field of the nested Tweet objects is one column (struct of arrays): ids and
+    metrics in integer arrays, sentiments in float arrays and repeated strings as codes into one string pool. The
+    table behaves like the dict tweet_id -> Tweet of the JSON files, table[tweet_id]["Data"]["Text"] reads and writes
+    the columns through views without copying.
+    """
+
+    def __init__(self, pool=None):
+        """
+        Constructor.
+
+        :param pool: Optional string pool shared with another table
+        """
+
+        self.pool = pool if pool is not None else Vocabulary()
+        self.keys_list = []
+        self.index = {}
+        # Section -> field names (None for sections that are no dict, e.g. Hashtags)
+        self.layout = {}
+        # (section, field) -> Column, field is None for sections that are no dict
+        self.columns = {}
+        # (row, section) -> value of dict sections that are no dict in this Tweet
+        self.irregular = {}
+
+    @classmethod
+    def load(cls, path: str, chunk_size=10000):
+        """
+        Streams a JSON / NDJSON Tweet file into a table, only one chunk of parsed Tweets is held in memory at a time.
+
+        :param path: Path to Tweet file
+        :param chunk_size: Number of Tweets that are added at once
+        :return: TweetTable
+        """
+
+        return cls.from_items(json_io.iter_tweets(path), chunk_size)
+
+    @classmethod
+    def from_items(cls, items, chunk_size=10000):
+        """
+        Creates a table from a stream of Tweets, e.g. the items of a Tweet dict.
+
+        :param items: Iterable of (tweet_id, tweet) tuples
+        :param chunk_size: Number of Tweets that are added at once
+        :return: TweetTable
+        """
+
+        table = cls()
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return table
+            table.extend(chunk)
+
+    @classmethod
+    def from_columns(cls, keys: list, sections: dict):
+        """
+        Creates a table from complete columns, e.g. the columns of a storage csv file.
+
+        :param keys: Tweet ids
+        :param sections: Dict section -> (dict field -> list of values) or list of values
+        :return: TweetTable
+        """
+
+        table = cls()
+        table.keys_list = list(keys)
+        table.index = {key: row for row, key in enumerate(table.keys_list)}
+
+        for section, fields in sections.items():
+            if isinstance(fields, dict):
+                table.layout[section] = list(fields)
+                for field, values in fields.items():
+                    kind = SCHEMA.get(section, {}).get(field, OBJECT)
+                    table.columns[(section, field)] = Column.from_values(kind, table.pool, values)
+            else:
+                table.layout[section] = None
+                table.columns[(section, None)] = Column.from_values(OBJECT, table.pool, fields)
+
+        return table
+
+    def __getitem__(self, tweet_id):
+        return TweetView(self, self.index[tweet_id])
+
+    def __iter__(self):
+        return iter(self.keys_list)
+
+    def __len__(self):
+        return len(self.keys_list)
+
+    def __contains__(self, tweet_id):
+        return tweet_id in self.index
+
+    def add_column(self, section: str, field, kind=None):
+        """
+        Adds a column. Tweets that were added before do not have the field, so late columns store python objects.
+
+        :param section: Section name
+        :param field: Field name, None for sections that are no dict
+        :param kind: Storage kind, default from the schema for columns that start with the first Tweet
+        :return: Column
+        """
+
+        if section not in self.layout:
+            self.layout[section] = None if field is None else []
+        if field is not None:
+            self.layout[section].append(field)
+
+        if kind is None:
+            kind = SCHEMA.get(section, {}).get(field, OBJECT) if not self.keys_list else OBJECT
+        column = self.columns[(section, field)] = Column(kind, self.pool)
+        if self.keys_list:
+            column.values = [ABSENT] * len(self.keys_list)
+
+        return column
+
+    def append(self, tweet_id, tweet: dict):
+        """
+        Appends a Tweet.
+
+        :param tweet_id: Tweet id
+        :param tweet: Nested Tweet dict
+        :return: Row index
+        """
+
+        self.extend([(tweet_id, tweet)])
+
+        return len(self.keys_list) - 1
+
+    def extend(self, items):
+        """
+        Appends Tweets column by column.
+
+        :param items: List of (tweet_id, tweet) tuples
+        """
+
+        start = len(self.keys_list)
+        tweets = [tweet for _, tweet in items]
+
+        # New sections and fields, Tweets that were added before do not have them
+        known = {section: set(fields) for section, fields in self.layout.items() if fields is not None}
+        for tweet in tweets:
+            for section, value in tweet.items():
+                if section not in self.layout:
+                    if isinstance(value, dict):
+                        self.layout[section] = []
+                        known[section] = set()
+                        self.irregular.update(((row, section), ABSENT) for row in range(start))
+                    else:
+                        self.add_column(section, None)
+                if section in known and isinstance(value, dict) and not value.keys() <= known[section]:
+                    for field in value:
+                        if field not in known[section]:
+                            known[section].add(field)
+                            self.add_column(section, field)
+
+        for section, fields in self.layout.items():
+            values = [tweet.get(section, ABSENT) for tweet in tweets]
+            if fields is None:
+                self.columns[(section, None)].extend(values)
+                continue
+
+            for row, value in enumerate(values, start):
+                if type(value) is not dict:
+                    self.irregular[(row, section)] = value
+            values = [value if type(value) is dict else {} for value in values]
+            for field in fields:
+                self.columns[(section, field)].extend([value.get(field, ABSENT) for value in values])
+
+        for row, (tweet_id, _) in enumerate(items, start):
+            self.index[tweet_id] = row
+            self.keys_list.append(tweet_id)
+
+    def section_value(self, section: str, row: int):
+        """
+        Returns one section of a Tweet.
+
+        :param section: Section name
+        :param row: Row index
+        :return: RecordView for dict sections, the value otherwise, ABSENT if the Tweet does not have the section
+        """
+
+        if section not in self.layout:
+            return ABSENT
+        if self.layout[section] is None:
+            return self.columns[(section, None)].get(row)
+        if (row, section) in self.irregular:
+            return self.irregular[(row, section)]
+
+        return RecordView(self, section, row)
+
+    def set_section(self, section: str, row: int, value):
+        """
+        Replaces one section of a Tweet.
+
+        :param section: Section name
+        :param row: Row index
+        :param value: Dict for dict sections or any value
+        """
+
+        if section not in self.layout:
+            if isinstance(value, dict):
+                self.layout[section] = []
+                for other in range(len(self.keys_list)):
+                    self.irregular[(other, section)] = ABSENT
+            else:
+                self.add_column(section, None)
+
+        if self.layout[section] is None:
+            self.columns[(section, None)].set(row, value)
+            return
+
+        if isinstance(value, Mapping):
+            value = dict(value)
+            self.irregular.pop((row, section), None)
+            for field in list(self.layout[section]) + [field for field in value if field not in self.layout[section]]:
+                self.set_value(section, field, row, value.get(field, ABSENT))
+        else:
+            self.irregular[(row, section)] = value
+
+    def set_value(self, section: str, field: str, row: int, value):
+        """
+        Sets one field of a Tweet.
+
+        :param section: Section name
+        :param field: Field name
+        :param row: Row index
+        :param value: Value
+        """
+
+        column = self.columns.get((section, field))
+        if column is None:
+            column = self.add_column(section, field, OBJECT)
+        column.set(row, value)
+
+    def column(self, section: str, field=None, default=ABSENT):
+        """
+        Returns all values of a field.
+
+        :param section: Section name
+        :param field: Field name, None for sections that are no dict
+        :param default: Value for Tweets that do not have the field, default returns ABSENT
+        :return: List of values in row order
+        """
+
+        if (section, field) not in self.columns:
+            return [default] * len(self)
+
+        return self.columns[(section, field)].tolist(default)
+
+    def section_mask(self, section: str):
+        """
+        Returns for every Tweet if it has a section, dict sections only count where the value is a dict.
+
+        :param section: Section name
+        :return: List of bools in row order
+        """
+
+        if section not in self.layout:
+            return [False] * len(self)
+        if self.layout[section] is None:
+            return [value is not ABSENT for value in self.columns[(section, None)].tolist()]
+
+        return [(row, section) not in self.irregular for row in range(len(self))]
+
+    def set_column(self, section: str, field: str, values: list):
+        """
+        Replaces all values of a field, the column is stored with the kind of the schema.
+
+        :param section: Section name
+        :param field: Field name
+        :param values: List of values in row order
+        """
+
+        if (section, field) not in self.columns:
+            self.add_column(section, field)
+        kind = SCHEMA.get(section, {}).get(field, OBJECT)
+        self.columns[(section, field)] = Column.from_values(kind, self.pool, values)
+
+    def fields(self, section: str):
+        """
+        Returns the field names of a section.
+
+        :param section: Section name
+        :return: List of field names
+        """
+
+        return list(self.layout.get(section) or [])
+
+    def take(self, rows: list):
+        """
+        Returns a table with some Tweets, the string pool is shared.
+
+        :param rows: Row indices
+        :return: TweetTable
+        """
+
+        table = TweetTable(self.pool)
+        table.keys_list = [self.keys_list[row] for row in rows]
+        table.index = {key: new for new, key in enumerate(table.keys_list)}
+        table.layout = {section: None if fields is None else list(fields) for section, fields in self.layout.items()}
+        table.columns = {key: column.take(rows) for key, column in self.columns.items()}
+        table.irregular = {(new, section): self.irregular[(row, section)] for new, row in enumerate(rows)
+                           for section in self.layout if (row, section) in self.irregular}
+
+        return table
+
+    def record(self, row: int):
+        """
+        Builds the nested Tweet dict of one row.
+
+        :param row: Row index
+        :return: Tweet dict
+        """
+
+        tweet = {}
+        for section, fields in self.layout.items():
+            if fields is None or (row, section) in self.irregular:
+                value = self.section_value(section, row)
+                if value is not ABSENT:
+                    tweet[section] = value
+                continue
+
+            record = {}
+            for field in fields:
+                value = self.columns[(section, field)].get(row)
+                if value is not ABSENT:
+                    record[field] = value
+            tweet[section] = record
+
+        return tweet
+
+    def records(self, chunk_size=10000):
+        """
+        Streams the Tweets as nested dicts. The columns are decoded chunk by chunk.
+
+        :param chunk_size: Number of Tweets decoded at once
+        :return: Generator of (tweet_id, tweet) tuples
+        """
+
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            # Values per section: the plain values or the sub-records built column by column
+            sections = []
+            for section, fields in self.layout.items():
+                if fields is None:
+                    sections.append((section, self.columns[(section, None)].tolist(ABSENT, start, stop)))
+                    continue
+                columns = [self.columns[(section, field)].tolist(ABSENT, start, stop) for field in fields]
+                if any(ABSENT in column for column in columns):
+                    records = [{field: value for field, value in zip(fields, row) if value is not ABSENT}
+                               for row in zip(*columns)]
+                else:
+                    records = [dict(zip(fields, row)) for row in zip(*columns)]
+                if not fields:
+                    records = [{} for _ in range(stop - start)]
+                for row in range(start, stop) if self.irregular else ():
+                    if (row, section) in self.irregular:
+                        records[row - start] = self.irregular[(row, section)]
+                sections.append((section, records))
+
+            for offset, tweet_id in enumerate(self.keys_list[start:stop]):
+                yield tweet_id, {section: values[offset] for section, values in sections
+                                 if values[offset] is not ABSENT}
+
+    def dump(self, path: str, mode=None):
+        """
+        Writes the table as JSON / NDJSON Tweet file, one Tweet is built at a time.
+
+        :param path: Path to output file
+        :param mode: Output mode of json_io (pretty, compact or ndjson)
+        :return: Number of written Tweets
+        """
+
+        return json_io.dump_items(self.records(), path, mode)
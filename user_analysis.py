@@ -1,5 +1,6 @@
-import json
+import json_io
 from json.decoder import JSONDecodeError
+from tweet_table import TweetTable
 
 
 class Database:
@@ -17,17 +18,18 @@ class Database:
         self.database_file = database_file
         self.database = self.get_database()
         self.new_data = None
+        # User key -> set of stored Tweet ids, created on the first update of a user
+        self.tweet_ids = {}
 
     def get_database(self):
         """
         Opens the database file and extracts JSON information if included.
         """
 
-        with open(self.database_file, 'r') as in_file:
-            try:
-                database = json.load(in_file)
-            except JSONDecodeError:
-                database = {}
+        try:
+            database = json_io.load(self.database_file)
+        except (JSONDecodeError, FileNotFoundError):
+            database = {}
 
         return database
 
@@ -38,8 +40,7 @@ class Database:
         :param new_data_file: Path to data file
         """
 
-        with open(new_data_file, 'r') as in_file:
-            self.new_data = json.load(in_file)
+        self.new_data = TweetTable.load(new_data_file)
 
     def add_entry(self, user: dict, tweet_id: int, tweet_text: str):
         """
@@ -50,25 +51,36 @@ class Database:
         :param tweet_text: Tweet text
         """
 
-        self.database[user['Id']] = {"User_Data": {}}
-        self.database[user['Id']]['User_Data']['Id'] = user['Id']
-        self.database[user['Id']]['User_Data']['Name'] = user['Name']
-        self.database[user['Id']]['User_Data']['Location'] = user['Location']
-        self.database[user['Id']]['User_Data']['Created_At'] = user['Created_At']
+        # Keys are strings like the keys of a loaded database file
+        key = str(user['Id'])
+        self.database[key] = {"User_Data": {}}
+        self.database[key]['User_Data']['Id'] = user['Id']
+        self.database[key]['User_Data']['Name'] = user['Name']
+        self.database[key]['User_Data']['Location'] = user['Location']
+        self.database[key]['User_Data']['Created_At'] = user['Created_At']
 
-        self.database[user['Id']]['Tweets'] = [{"Tweet_Id": tweet_id, "Text": tweet_text}]
+        self.database[key]['Tweets'] = [{"Tweet_Id": tweet_id, "Text": tweet_text}]
 
-        self.database[user['Id']]['Count'] = len(self.database[user['Id']]['Tweets'])
+        self.database[key]['Count'] = len(self.database[key]['Tweets'])
+        self.tweet_ids[key] = {tweet_id}
 
     def update_entry(self, user_id, tweet_id, tweet_text):
         """
-        Updates the entry of an existing user.
+        Updates the entry of an existing user. Tweets that are already stored for the user are skipped, so the same
+        data can be added more than once.
 
-        :param user_id: User id
+        :param user_id: User key
         :param tweet_id: Tweet id
         :param tweet_text: Tweet text
         """
 
+        known = self.tweet_ids.get(user_id)
+        if known is None:
+            known = self.tweet_ids[user_id] = {tweet['Tweet_Id'] for tweet in self.database[user_id]['Tweets']}
+        if tweet_id in known:
+            return
+        known.add(tweet_id)
+
         self.database[user_id]['Tweets'].append({"Tweet_Id": tweet_id, "Text": tweet_text})
         self.database[user_id]['Count'] = len(self.database[user_id]['Tweets'])
 
@@ -77,19 +89,20 @@ class Database:
         Method for updating the whole database file.
         """
 
-        # Iterate through new data
-        for tweet in self.new_data:
-            entry = self.new_data[tweet]
+        # Iterate through the columns of the new data
+        users = zip(*(self.new_data.column('User', field, None) for field in ('Id', 'Name', 'Location', 'Created_At')))
+        for (user_id, name, location, created_at), tweet_id, tweet_text in zip(
+                users, self.new_data.column('Data', 'Id', None), self.new_data.column('Data', 'Text', None)):
             # Check if user entry exists
-            if entry['User']['Id'] in self.database:
-                self.update_entry(entry['User']['Id'], entry['Data']['Id'], entry['Data']['Text'])
+            if str(user_id) in self.database:
+                self.update_entry(str(user_id), tweet_id, tweet_text)
             else:
-                self.add_entry(entry['User'], entry['Data']['Id'], entry['Data']['Text'])
+                self.add_entry({'Id': user_id, 'Name': name, 'Location': location, 'Created_At': created_at},
+                               tweet_id, tweet_text)
 
     def save_database(self):
         """
         Saves the database file.
         """
 
-        with open(self.database_file, 'w', encoding='utf-8') as out_file:
-            json.dump(self.database, out_file, ensure_ascii=False, indent=4, default=str)
+        json_io.dump(self.database, self.database_file, json_io.COMPACT)